@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-18 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0004_report'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='ingest_metrics',
+            field=models.JSONField(blank=True, default=dict, verbose_name="Métriques d'extraction"),
+        ),
+    ]
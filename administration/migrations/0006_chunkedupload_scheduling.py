@@ -0,0 +1,35 @@
+# Generated by Django 5.2.10 on 2026-10-18 08:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0005_chunkedupload_ingest_metrics'),
+        ('catalog', '0019_page_color_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='bulk_job',
+            field=models.UUIDField(blank=True, db_index=True, null=True, verbose_name='Import groupé'),
+        ),
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='queued_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Mis en file le'),
+        ),
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalog.series', verbose_name='Série'),
+        ),
+        migrations.AlterField(
+            model_name='chunkedupload',
+            name='status',
+            field=models.CharField(choices=[('uploading', 'En cours'), ('processing', 'Assemblage'), ('queued', "En file d'attente"), ('dispatched', 'Envoyé au traitement'), ('completed', 'Terminé'), ('failed', 'Échec')], default='uploading', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-18 08:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0006_chunkedupload_scheduling'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='received_bitmap',
+            field=models.BinaryField(blank=True, default=bytes, verbose_name='Morceaux reçus'),
+        ),
+    ]
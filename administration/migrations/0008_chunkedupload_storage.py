@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-18 08:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0007_chunkedupload_received_bitmap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='storage_key',
+            field=models.CharField(blank=True, max_length=512, verbose_name='Objet de stockage'),
+        ),
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='storage_upload_id',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Upload multipart'),
+        ),
+    ]
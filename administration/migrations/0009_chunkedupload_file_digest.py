@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0008_chunkedupload_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='file_digest',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Empreinte du fichier'),
+        ),
+    ]
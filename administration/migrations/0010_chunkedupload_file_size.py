@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-18 08:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0009_chunkedupload_file_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='file_size',
+            field=models.BigIntegerField(default=0, verbose_name='Taille'),
+        ),
+    ]
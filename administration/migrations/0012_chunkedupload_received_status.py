@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-18 09:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0011_chunkedupload_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chunkedupload',
+            name='status',
+            field=models.CharField(choices=[('uploading', 'En cours'), ('received', 'Reçu'), ('processing', 'Extraction'), ('queued', "En file d'attente"), ('dispatched', 'Envoyé au traitement'), ('completed', 'Terminé'), ('failed', 'Échec')], default='uploading', max_length=20),
+        ),
+    ]
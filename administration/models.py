@@ -8,7 +8,11 @@ import os
 class ChunkedUpload(models.Model):
     STATUS_CHOICES = [
         ('uploading', 'En cours'),
-        ('processing', 'Assemblage'),
+        # Every chunk is on disk, waiting for the completion request
+        ('received', 'Reçu'),
+        ('processing', 'Extraction'),
+        ('queued', "En file d'attente"),
+        ('dispatched', 'Envoyé au traitement'),
         ('completed', 'Terminé'),
         ('failed', 'Échec'),
     ]
@@ -21,17 +25,45 @@ class ChunkedUpload(models.Model):
     upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     filename = models.CharField(max_length=255)
     total_chunks = models.IntegerField()
+    # Declared by the client at init: temp disk admission control (see ChunkedUploadService.admit)
+    file_size = models.BigIntegerField(default=0, verbose_name="Taille")
     received_chunks = models.IntegerField(default=0)
+    # Bit i set once chunk i is stored (database fallback of the Redis bitmap, see upload_service)
+    received_bitmap = models.BinaryField(default=bytes, blank=True, verbose_name="Morceaux reçus")
+    # SHA-256 over the chunk digests (see ChunkedUploadService.file_digest), set on completion
+    file_digest = models.CharField(max_length=64, blank=True, verbose_name="Empreinte du fichier")
+    # Direct-to-storage uploads: S3 multipart upload of the object (see DirectUploadService)
+    storage_key = models.CharField(max_length=512, blank=True, verbose_name="Objet de stockage")
+    storage_upload_id = models.CharField(max_length=255, blank=True, verbose_name="Upload multipart")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every save, status changes included (age of an upload for the temp janitor)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Mis à jour le")
     
     # Progress tracking for extraction
     total_files_to_process = models.IntegerField(default=0)
     processed_files = models.IntegerField(default=0)
+    # Per-stage timings and byte counters of the extraction (see FileProcessor)
+    ingest_metrics = models.JSONField(default=dict, blank=True, verbose_name="Métriques d'extraction")
+
+    # Fair-share scheduling of bulk uploads (see catalog.scheduling)
+    series = models.ForeignKey(
+        'catalog.Series', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', verbose_name="Série"
+    )
+    bulk_job = models.UUIDField(null=True, blank=True, db_index=True, verbose_name="Import groupé")
+    queued_at = models.DateTimeField(null=True, blank=True, verbose_name="Mis en file le")
 
     def get_temp_path(self):
         return os.path.join(settings.MEDIA_ROOT, 'temp_uploads', str(self.upload_id))
 
+    def save(self, *args, **kwargs):
+        # Partial saves (status changes mostly) still bump updated_at
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'updated_at' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'updated_at']
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Upload par morceaux"
         verbose_name_plural = "Uploads par morceaux"
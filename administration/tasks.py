@@ -0,0 +1,9 @@
+from celery import shared_task
+
+
+@shared_task
+def task_cleanup_expired_uploads():
+    """Periodic janitor of the temp upload folder (see CELERY_BEAT_SCHEDULE)."""
+    from .upload_service import ChunkedUploadService
+
+    return ChunkedUploadService.cleanup_expired_uploads()
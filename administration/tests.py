@@ -1,7 +1,20 @@
-from django.test import TestCase, Client
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from administration.models import SystemLog
+from django.utils import timezone
+from django.core.files.uploadedfile import SimpleUploadedFile
+from administration.models import SystemLog, ChunkedUpload
+from administration.upload_service import ChunkedUploadService, DirectUploadService
+from catalog.archives import open_source_file
+from botocore.stub import Stubber
+from unittest import mock
 from catalog.models import Series, Genre
 from social.models import Group
 
@@ -118,3 +131,320 @@ class ContentManagementTests(TestCase):
         
         # Check log
         self.assertTrue(SystemLog.objects.filter(action='SERIES_CREATE').exists())
+
+
+class IngestionMetricsTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin = User.objects.create_user(nickname='admin', email='admin@test.com', password='password', role_admin=True)
+        self.user = User.objects.create_user(nickname='user', email='user@test.com', password='password')
+        for pages, seconds in ((10, 2.0), (30, 3.0)):
+            ChunkedUpload.objects.create(
+                user=self.admin, filename=f"chapter_{pages}.cbz", total_chunks=1, status='completed',
+                ingest_metrics={
+                    'pages_total': pages, 'pages_saved': pages, 'bytes_read': pages * 1000,
+                    'seconds': seconds, 'stages': {'decode': 1.0, 'encode': seconds},
+                },
+            )
+        # Not extracted yet: no metrics
+        ChunkedUpload.objects.create(user=self.admin, filename='pending.cbz', total_chunks=1)
+
+    def test_metrics_are_aggregated(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('administration:upload_metrics'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['uploads'], 2)
+        self.assertEqual(data['pages_saved'], 40)
+        self.assertEqual(data['bytes_read'], 40000)
+        self.assertEqual(data['pages_per_second'], 8.0)
+        self.assertEqual(data['stages'], {'decode': 2.0, 'encode': 5.0})
+        self.assertEqual(len(data['recent']), 2)
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+        self.client = Client()
+        self.admin = User.objects.create_user(nickname='admin', email='admin@test.com', password='password', role_admin=True)
+        self.client.force_login(self.admin)
+
+    def _init(self, total_chunks):
+        response = self.client.post(reverse('administration:upload_init'), {
+            'filename': 'chapter_1.cbz', 'total_chunks': total_chunks,
+        })
+        return response.json()['upload_id']
+
+    def _send(self, upload_id, index, digest=None):
+        data = f"part{index};".encode()
+        return self.client.post(reverse('administration:upload_chunk'), {
+            'upload_id': upload_id, 'chunk_index': index,
+            'chunk': SimpleUploadedFile('chapter_1.cbz', data),
+            'chunk_sha256': digest or hashlib.sha256(data).hexdigest(),
+        })
+
+    def _missing(self, upload_id):
+        return self.client.get(reverse('administration:upload_resume'), {'upload_id': upload_id}).json()
+
+    def test_chunks_in_any_order_with_retries(self):
+        with self.settings(MEDIA_ROOT=self.media_root):
+            upload_id = self._init(3)
+            self._send(upload_id, 2)
+            self._send(upload_id, 0)
+            # A retried chunk is only counted once
+            self.assertEqual(self._send(upload_id, 2).json()['received_chunks'], 2)
+
+            upload = ChunkedUpload.objects.get(upload_id=upload_id)
+            self.assertEqual(upload.status, 'uploading')
+            resume = self._missing(upload_id)
+            self.assertEqual(resume['missing'], [1])
+            self.assertEqual(resume['received_chunks'], 2)
+
+            self._send(upload_id, 1)
+            upload.refresh_from_db()
+            self.assertEqual(upload.status, 'received')
+            self.assertEqual(upload.received_chunks, 3)
+            self.assertEqual(self._missing(upload_id)['missing'], [])
+
+            path = self.client.post(reverse('administration:upload_complete'), {'upload_id': upload_id}).json()['final_path']
+            # The chunks are read in place, not assembled
+            self.assertFalse(os.path.exists(path))
+            with open_source_file(path) as f:
+                self.assertEqual(f.read(), b'part0;part1;part2;')
+            # A retried completion returns the assembled file
+            response = self.client.post(reverse('administration:upload_complete'), {'upload_id': upload_id})
+            self.assertEqual(response.json()['final_path'], path)
+
+    def test_corrupted_chunk_is_refused_and_file_digest_recorded(self):
+        with self.settings(MEDIA_ROOT=self.media_root):
+            upload_id = self._init(2)
+            response = self._send(upload_id, 0, digest='0' * 64)
+            self.assertEqual(response.status_code, 400)
+            self.assertTrue(response.json()['resend'])
+            self.assertEqual(self._missing(upload_id)['missing'], [0, 1])
+
+            self._send(upload_id, 0)
+            self._send(upload_id, 1)
+            self.client.post(reverse('administration:upload_complete'), {'upload_id': upload_id})
+
+        expected = hashlib.sha256(b''.join(
+            hashlib.sha256(f"part{i};".encode()).digest() for i in range(2)
+        )).hexdigest()
+        self.assertEqual(ChunkedUpload.objects.get(upload_id=upload_id).file_digest, expected)
+
+    def test_unreachable_redis_falls_back_to_database(self):
+        with self.settings(MEDIA_ROOT=self.media_root, UPLOAD_REDIS_URL='redis://127.0.0.1:1/0'):
+            upload_id = self._init(2)
+            self._send(upload_id, 1)
+            self.assertEqual(self._missing(upload_id)['missing'], [0])
+            self._send(upload_id, 0)
+            self.assertEqual(ChunkedUpload.objects.get(upload_id=upload_id).status, 'received')
+
+    def test_out_of_range_chunk_is_refused(self):
+        with self.settings(MEDIA_ROOT=self.media_root):
+            upload_id = self._init(2)
+            self.assertEqual(self._send(upload_id, 2).status_code, 400)
+            self.assertEqual(self._missing(upload_id)['missing'], [0, 1])
+
+
+@override_settings(
+    UPLOAD_DIRECT_TO_STORAGE=True, UPLOAD_S3_PART_SIZE=5 * 1024 * 1024,
+    AWS_STORAGE_BUCKET_NAME='uploads', AWS_S3_ENDPOINT_URL='http://127.0.0.1:9000',
+    AWS_ACCESS_KEY_ID='minio', AWS_SECRET_ACCESS_KEY='minio-secret',
+)
+class DirectUploadTests(TestCase):
+    """Against a local S3-compatible stand-in: botocore's Stubber answers the client's calls."""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin = User.objects.create_user(nickname='admin', email='admin@test.com', password='password', role_admin=True)
+        self.client.force_login(self.admin)
+        self.s3 = DirectUploadService.client()
+        self.stubber = Stubber(self.s3)
+        self.stubber.activate()
+        patcher = mock.patch.object(DirectUploadService, 'client', return_value=self.s3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _init(self, size):
+        self.stubber.add_response('create_multipart_upload', {'UploadId': 'mpu-1'})
+        return self.client.post(reverse('administration:upload_direct_init'), {
+            'filename': 'chapter_1.cbz', 'size': size,
+        }).json()
+
+    def _list_parts(self, upload, numbers):
+        self.stubber.add_response(
+            'list_parts', {'Parts': [{'PartNumber': n, 'ETag': f'"etag{n}"'} for n in numbers], 'IsTruncated': False},
+            {'Bucket': 'uploads', 'Key': upload.storage_key, 'UploadId': 'mpu-1'},
+        )
+
+    def test_init_returns_presigned_part_urls(self):
+        data = self._init(12 * 1024 * 1024)
+
+        upload = ChunkedUpload.objects.get(upload_id=data['upload_id'])
+        self.assertEqual(upload.total_chunks, 3)
+        self.assertEqual(upload.storage_key, f"uploads/{upload.upload_id}/chapter_1.cbz")
+        self.assertEqual([part['part_number'] for part in data['parts']], [1, 2, 3])
+        url = data['parts'][1]['url']
+        self.assertTrue(url.startswith('http://127.0.0.1:9000/uploads/uploads/'))
+        self.assertIn('partNumber=2', url)
+        self.assertIn('uploadId=mpu-1', url)
+
+    def test_complete_assembles_parts_in_storage(self):
+        upload = ChunkedUpload.objects.get(upload_id=self._init(12 * 1024 * 1024)['upload_id'])
+
+        # A part is missing: the client is told to resume
+        self._list_parts(upload, [1, 3])
+        response = self.client.post(reverse('administration:upload_direct_complete'), {'upload_id': upload.upload_id})
+        self.assertEqual(response.status_code, 400)
+
+        self._list_parts(upload, [1, 2, 3])
+        self.stubber.add_response('complete_multipart_upload', {}, {
+            'Bucket': 'uploads', 'Key': upload.storage_key, 'UploadId': 'mpu-1',
+            'MultipartUpload': {'Parts': [{'PartNumber': n, 'ETag': f'"etag{n}"'} for n in (1, 2, 3)]},
+        })
+        response = self.client.post(reverse('administration:upload_direct_complete'), {'upload_id': upload.upload_id})
+        self.assertEqual(response.status_code, 200)
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'completed')
+        self.stubber.assert_no_pending_responses()
+
+    def test_resume_lists_missing_parts(self):
+        upload = ChunkedUpload.objects.get(upload_id=self._init(12 * 1024 * 1024)['upload_id'])
+        self._list_parts(upload, [2])
+
+        data = self.client.get(reverse('administration:upload_direct_resume'), {'upload_id': upload.upload_id}).json()
+        self.assertEqual([part['part_number'] for part in data['parts']], [1, 3])
+
+    @override_settings(UPLOAD_DIRECT_TO_STORAGE=False)
+    def test_disabled_without_setting(self):
+        response = self.client.post(reverse('administration:upload_direct_init'), {'filename': 'c.cbz', 'size': 10})
+        self.assertEqual(response.status_code, 400)
+
+
+class TempUploadJanitorTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+        self.root = os.path.join(self.media_root, 'manga_temp_uploads')
+        self.admin = User.objects.create_user(nickname='admin', email='admin@test.com', password='password', role_admin=True)
+
+    def _folder(self, name, age_hours):
+        chunk_dir = os.path.join(self.root, name, 'chunks')
+        os.makedirs(chunk_dir)
+        with open(os.path.join(chunk_dir, 'part_0'), 'wb') as f:
+            f.write(b'x' * 100)
+        past = time.time() - age_hours * 3600
+        for path in (os.path.join(chunk_dir, 'part_0'), chunk_dir, os.path.dirname(chunk_dir)):
+            os.utime(path, (past, past))
+        return os.path.dirname(chunk_dir)
+
+    def _upload(self, status, age_hours, **fields):
+        upload = ChunkedUpload.objects.create(user=self.admin, filename='chapter_1.cbz', total_chunks=1, status=status, **fields)
+        ChunkedUpload.objects.filter(pk=upload.pk).update(updated_at=timezone.now() - timedelta(hours=age_hours))
+        return upload, self._folder(str(upload.upload_id), age_hours)
+
+    def test_expired_and_orphaned_folders_are_removed(self):
+        with self.settings(MEDIA_ROOT=self.media_root, UPLOAD_ABANDONED_AFTER_HOURS=24, UPLOAD_TEMP_MAX_AGE_HOURS=72):
+            abandoned, abandoned_dir = self._upload('uploading', 30)
+            active, active_dir = self._upload('uploading', 1)
+            queued, queued_dir = self._upload('queued', 30)
+            orphan_dir = self._folder(str(uuid.uuid4()), 2)
+            # No folder at all: nothing was received for a day
+            empty = ChunkedUpload.objects.create(user=self.admin, filename='chapter_2.cbz', total_chunks=1)
+            ChunkedUpload.objects.filter(pk=empty.pk).update(
+                created_at=timezone.now() - timedelta(hours=30), updated_at=timezone.now() - timedelta(hours=30),
+            )
+
+            result = ChunkedUploadService.cleanup_expired_uploads()
+
+        self.assertEqual(result['removed'], 2)
+        self.assertEqual(result['freed'], 200)
+        self.assertFalse(os.path.exists(abandoned_dir))
+        self.assertFalse(os.path.exists(orphan_dir))
+        self.assertTrue(os.path.exists(active_dir))
+        self.assertTrue(os.path.exists(queued_dir))
+        statuses = dict(ChunkedUpload.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[abandoned.pk], 'failed')
+        self.assertEqual(statuses[empty.pk], 'failed')
+        self.assertEqual(statuses[active.pk], 'uploading')
+        self.assertEqual(statuses[queued.pk], 'queued')
+
+    def test_uploads_being_processed_survive(self):
+        with self.settings(MEDIA_ROOT=self.media_root, UPLOAD_ABANDONED_AFTER_HOURS=24, UPLOAD_TEMP_MAX_AGE_HOURS=72):
+            # Waited two days in the bulk queue, extraction just started: the chunks are old
+            processing, processing_dir = self._upload('processing', 48)
+            ChunkedUpload.objects.filter(pk=processing.pk).update(updated_at=timezone.now())
+            # Extraction slow or waiting for a retry for longer than the abandon delay
+            retrying, retrying_dir = self._upload('processing', 30)
+            # Dispatched a minute ago after a long wait in the queue
+            dispatched, dispatched_dir = self._upload('dispatched', 80)
+            ChunkedUpload.objects.filter(pk=dispatched.pk).update(updated_at=timezone.now())
+
+            result = ChunkedUploadService.cleanup_expired_uploads()
+
+        self.assertEqual(result['removed'], 0)
+        for path in (processing_dir, retrying_dir, dispatched_dir):
+            self.assertTrue(os.path.exists(path))
+        statuses = dict(ChunkedUpload.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[processing.pk], 'processing')
+        self.assertEqual(statuses[retrying.pk], 'processing')
+        self.assertEqual(statuses[dispatched.pk], 'dispatched')
+
+    def test_killed_extractions_and_uncompleted_uploads_expire(self):
+        with self.settings(MEDIA_ROOT=self.media_root, UPLOAD_ABANDONED_AFTER_HOURS=24, UPLOAD_TEMP_MAX_AGE_HOURS=72):
+            # Task killed (OOM, hard time limit): the row stays 'processing'
+            killed, killed_dir = self._upload('processing', 80)
+            # Every chunk received, but the client never asked for completion
+            received, received_dir = self._upload('received', 30)
+            waiting, waiting_dir = self._upload('received', 1)
+
+            result = ChunkedUploadService.cleanup_expired_uploads()
+
+        self.assertEqual(result['removed'], 2)
+        self.assertFalse(os.path.exists(killed_dir))
+        self.assertFalse(os.path.exists(received_dir))
+        self.assertTrue(os.path.exists(waiting_dir))
+        statuses = dict(ChunkedUpload.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[killed.pk], 'failed')
+        self.assertEqual(statuses[received.pk], 'failed')
+        self.assertEqual(statuses[waiting.pk], 'received')
+
+    def test_received_chunks_are_not_counted_twice(self):
+        # 100 of the 1000 declared bytes are already on disk
+        self._upload('uploading', 0, file_size=1000)
+        with self.settings(MEDIA_ROOT=self.media_root, UPLOAD_TEMP_QUOTA_MB=1, UPLOAD_MIN_FREE_MB=0):
+            self.assertIsNone(ChunkedUploadService.admit(1024 * 1024 - 1000))
+            self.assertIsNotNone(ChunkedUploadService.admit(1024 * 1024 - 999))
+
+    def test_init_rejects_invalid_size(self):
+        client = Client()
+        client.force_login(self.admin)
+        with self.settings(MEDIA_ROOT=self.media_root):
+            for size in ('abc', '-1'):
+                response = client.post(reverse('administration:upload_init'), {
+                    'filename': 'chapter_2.cbz', 'total_chunks': 1, 'size': size,
+                })
+                self.assertEqual(response.status_code, 400)
+            response = client.post(reverse('administration:upload_init'), {
+                'filename': 'chapter_2.cbz', 'total_chunks': 'x',
+            })
+            self.assertEqual(response.status_code, 400)
+
+    def test_init_is_refused_over_the_temp_quota(self):
+        client = Client()
+        client.force_login(self.admin)
+        self._upload('completed', 1)
+        with self.settings(MEDIA_ROOT=self.media_root, UPLOAD_TEMP_QUOTA_MB=1, UPLOAD_MIN_FREE_MB=0):
+            response = client.post(reverse('administration:upload_init'), {
+                'filename': 'chapter_2.cbz', 'total_chunks': 1, 'size': 1024 * 1024,
+            })
+            self.assertEqual(response.status_code, 507)
+            self.assertEqual(response['Retry-After'], '30')
+
+            response = client.post(reverse('administration:upload_init'), {
+                'filename': 'chapter_2.cbz', 'total_chunks': 1, 'size': 1000,
+            })
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(ChunkedUploadService.temp_usage()['bytes'], 100)
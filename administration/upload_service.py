@@ -1,10 +1,87 @@
+import hashlib
+import logging
+import math
 import os
 import shutil
 import tempfile
+import uuid
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from catalog.archives import source_exists
 from .models import ChunkedUpload
 
+logger = logging.getLogger(__name__)
+
+_redis_clients = {}
+
+
+def _redis():
+    """Redis client recording received chunks, or None (UPLOAD_REDIS_URL unset)."""
+    url = getattr(settings, 'UPLOAD_REDIS_URL', '')
+    if not url:
+        return None
+    if url not in _redis_clients:
+        import redis
+        _redis_clients[url] = redis.Redis.from_url(url, socket_connect_timeout=1, socket_timeout=2)
+    return _redis_clients[url]
+
+
+def _redis_keys(upload_id):
+    return f"upload:{upload_id}:chunks", f"upload:{upload_id}:total"
+
+
+def set_chunk_bit(bitmap, index):
+    """Return `bitmap` with chunk `index` set (Redis SETBIT layout: bit 0 is the first byte's MSB)."""
+    bitmap = bytearray(bitmap or b'')
+    byte = index >> 3
+    if byte >= len(bitmap):
+        bitmap.extend(bytes(byte + 1 - len(bitmap)))
+    bitmap[byte] |= 0x80 >> (index & 7)
+    return bytes(bitmap)
+
+
+def chunk_indices(bitmap, total):
+    """Indices below `total` whose bit is set in `bitmap`."""
+    bitmap = bytes(bitmap or b'')
+    return [
+        i for i in range(min(total, len(bitmap) * 8))
+        if bitmap[i >> 3] & (0x80 >> (i & 7))
+    ]
+
+
+class ChunkDigestMismatch(ValueError):
+    """A chunk's bytes do not match the digest sent by the client: it must be sent again."""
+
+
+def _write_atomically(path, data):
+    partial_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(partial_path, 'w') as f:
+        f.write(data)
+    os.replace(partial_path, path)
+
+
 class ChunkedUploadService:
+    """
+    Chunks may arrive concurrently, in any order and more than once: each
+    received index is a bit of a bitmap (in Redis when UPLOAD_REDIS_URL is set,
+    else on the ChunkedUpload row), so a retried chunk is counted once and the
+    upload is only complete when every index has been received.
+    """
+
+    @staticmethod
+    def create_upload(user, filename, total_chunks, file_size=0):
+        upload = ChunkedUpload.objects.create(
+            user=user, filename=filename, total_chunks=total_chunks, file_size=file_size,
+        )
+        client = _redis()
+        if client is not None:
+            try:
+                client.set(_redis_keys(upload.upload_id)[1], total_chunks, ex=settings.UPLOAD_CHUNK_TTL)
+            except Exception as exc:
+                logger.warning(f"Redis unavailable, tracking chunks of {upload.upload_id} in the database: {exc}")
+        return upload
+
     @staticmethod
     def get_upload_dir(upload_id):
         """Returns the directory where chunks for a specific upload are stored."""
@@ -16,69 +93,475 @@ class ChunkedUploadService:
         return path
 
     @staticmethod
-    def save_chunk(upload_id, chunk_file, index):
-        """Saves a single chunk to the temporary directory."""
+    def save_chunk(upload_id, chunk_file, index, digest=None):
+        """
+        Saves a single chunk to the temporary directory and records its index;
+        returns the number of distinct chunks received so far. `digest` is the
+        chunk's SHA-256 (hex) computed by the client: a chunk damaged in transit
+        is refused (ChunkDigestMismatch) before it is recorded.
+        """
+        if index < 0:
+            raise ValueError(f"Invalid chunk index {index}")
         upload_dir = ChunkedUploadService.get_upload_dir(upload_id)
         chunk_path = os.path.join(upload_dir, f"part_{index}")
-        
-        with open(chunk_path, 'wb+') as destination:
-            for chunk in chunk_file.chunks():
-                destination.write(chunk)
-        
-        # Update progress in DB atomically to avoid race conditions
-        from django.db.models import F
-        upload_qs = ChunkedUpload.objects.filter(upload_id=upload_id)
-        upload_qs.update(received_chunks=F('received_chunks') + 1)
-        
-        # Refresh to check status
-        upload_obj = ChunkedUpload.objects.get(upload_id=upload_id)
-        if upload_obj.received_chunks >= upload_obj.total_chunks:
-            upload_obj.status = 'processing'
-            upload_obj.save(update_fields=['status'])
-        
-        return upload_obj
-
-    @staticmethod
-    def assemble_file(upload_id):
-        """Assembles all chunks into a final file."""
-        upload = ChunkedUpload.objects.get(upload_id=upload_id)
-        chunk_dir = ChunkedUploadService.get_upload_dir(upload_id)
-        
+
+        # Concurrent retries of the same chunk each write their own file; the rename is atomic
+        partial_path = f"{chunk_path}.{uuid.uuid4().hex}.tmp"
+        sha256 = hashlib.sha256()
+        try:
+            with open(partial_path, 'wb') as destination:
+                for chunk in chunk_file.chunks():
+                    sha256.update(chunk)
+                    destination.write(chunk)
+            if digest and sha256.hexdigest() != digest.lower():
+                raise ChunkDigestMismatch(f"Chunk {index} of {upload_id} does not match its digest")
+            # Kept for the whole-file digest (see file_digest)
+            _write_atomically(f"{chunk_path}.sha256", sha256.hexdigest())
+            os.replace(partial_path, chunk_path)
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.unlink(partial_path)
+            raise
+
+        try:
+            received = ChunkedUploadService._mark_chunk_redis(upload_id, index)
+            if received is None:
+                received = ChunkedUploadService._mark_chunk_db(upload_id, index)
+        except ValueError:
+            # Out of range: the part must not be read as part of the file
+            os.unlink(chunk_path)
+            os.unlink(f"{chunk_path}.sha256")
+            raise
+        return received
+
+    @staticmethod
+    def _mark_chunk_redis(upload_id, index):
+        """Record the chunk in Redis (no database query until the last one); None to fall back."""
+        client = _redis()
+        if client is None:
+            return None
+        bits_key, total_key = _redis_keys(upload_id)
+        try:
+            total = client.get(total_key)
+            if total is None:
+                # Not initialized in Redis (or expired): the row is authoritative
+                return None
+            total = int(total)
+            if index >= total:
+                raise ValueError(f"Invalid chunk index {index} ({total} chunks)")
+            pipe = client.pipeline()
+            pipe.setbit(bits_key, index, 1)
+            pipe.bitcount(bits_key)
+            pipe.expire(bits_key, settings.UPLOAD_CHUNK_TTL)
+            pipe.expire(total_key, settings.UPLOAD_CHUNK_TTL)
+            _previous, received, _bits_ttl, _total_ttl = pipe.execute()
+            if received >= total:
+                ChunkedUpload.objects.filter(upload_id=upload_id).update(
+                    received_chunks=received, received_bitmap=client.get(bits_key), status='received',
+                    updated_at=timezone.now(),
+                )
+            return received
+        except ValueError:
+            raise
+        except Exception as exc:
+            logger.warning(f"Redis unavailable, tracking chunk {index} of {upload_id} in the database: {exc}")
+            return None
+
+    @staticmethod
+    def _mark_chunk_db(upload_id, index):
+        """Record the chunk on the row; the row lock serializes concurrent chunks."""
+        with transaction.atomic():
+            upload = ChunkedUpload.objects.select_for_update().get(upload_id=upload_id)
+            if index >= upload.total_chunks:
+                raise ValueError(f"Invalid chunk index {index} ({upload.total_chunks} chunks)")
+            upload.received_bitmap = set_chunk_bit(upload.received_bitmap, index)
+            upload.received_chunks = len(chunk_indices(upload.received_bitmap, upload.total_chunks))
+            fields = ['received_bitmap', 'received_chunks']
+            if upload.received_chunks >= upload.total_chunks and upload.status == 'uploading':
+                upload.status = 'received'
+                fields.append('status')
+            upload.save(update_fields=fields)
+        return upload.received_chunks
+
+    @staticmethod
+    def received_chunks(upload):
+        """Sorted indices received for `upload`, from Redis and the row (chunks fall back per request)."""
+        received = set(chunk_indices(upload.received_bitmap, upload.total_chunks))
+        client = _redis()
+        if client is not None:
+            try:
+                received.update(chunk_indices(client.get(_redis_keys(upload.upload_id)[0]), upload.total_chunks))
+            except Exception as exc:
+                logger.warning(f"Redis unavailable, reading chunks of {upload.upload_id} from the database: {exc}")
+        return sorted(received)
+
+    @staticmethod
+    def missing_chunks(upload):
+        """Indices the client still has to send."""
+        received = set(ChunkedUploadService.received_chunks(upload))
+        return [i for i in range(upload.total_chunks) if i not in received]
+
+    @staticmethod
+    def get_final_path(upload):
+        """Path the upload's file is known by; it exists as its chunks until a reader needs a real file."""
         base_dir = getattr(settings, 'MEDIA_ROOT', tempfile.gettempdir())
         # Final file sits in the upload_id root, NOT in chunks/
-        final_dir = os.path.join(base_dir, 'manga_temp_uploads', str(upload_id))
-        os.makedirs(final_dir, exist_ok=True)
-        
-        safe_filename = os.path.basename(upload.filename)
-        final_file_path = os.path.join(final_dir, safe_filename)
-
-        with open(final_file_path, 'wb') as final_file:
-            for i in range(upload.total_chunks):
-                chunk_path = os.path.join(chunk_dir, f"part_{i}")
-                if not os.path.exists(chunk_path):
-                    upload.status = 'failed'
-                    upload.save(update_fields=['status'])
-                    raise FileNotFoundError(f"Chunk {i} missing for upload {upload_id}")
-                
-                with open(chunk_path, 'rb') as chunk:
-                    # Write in blocks to save memory
-                    while True:
-                        data = chunk.read(1024 * 1024) # 1MB blocks
-                        if not data:
-                            break
-                        final_file.write(data)
-        
+        final_dir = os.path.join(base_dir, 'manga_temp_uploads', str(upload.upload_id))
+        return os.path.join(final_dir, os.path.basename(upload.filename))
+
+    @staticmethod
+    def file_digest(upload):
+        """
+        Whole-file digest: SHA-256 over the SHA-256 of each chunk, in order.
+        The chunk digests are computed while the chunks are received, so the
+        file is not read again; it identifies the file for a given chunk size.
+        """
+        chunk_dir = ChunkedUploadService.get_upload_dir(upload.upload_id)
+        digest = hashlib.sha256()
+        for i in range(upload.total_chunks):
+            chunk_path = os.path.join(chunk_dir, f"part_{i}")
+            try:
+                with open(f"{chunk_path}.sha256") as f:
+                    chunk_digest = f.read().strip()
+            except FileNotFoundError:
+                # Received before chunk digests were kept
+                with open(chunk_path, 'rb') as f:
+                    chunk_digest = hashlib.file_digest(f, 'sha256').hexdigest()
+            digest.update(bytes.fromhex(chunk_digest))
+        return digest.hexdigest()
+
+    @staticmethod
+    def complete_upload(upload_id):
+        """
+        Checks every chunk is on disk and marks the upload completed. The chunks
+        are not copied into a final file: the archive readers consume them in
+        place (catalog.archives.open_source_file), and only formats needing a
+        real path (unrar) assemble them, at extraction time.
+        """
+        upload = ChunkedUpload.objects.get(upload_id=upload_id)
+        final_file_path = ChunkedUploadService.get_final_path(upload)
+
+        # Retried completion request
+        if upload.status == 'completed' and source_exists(final_file_path):
+            return final_file_path
+
+        chunk_dir = ChunkedUploadService.get_upload_dir(upload_id)
+        for i in range(upload.total_chunks):
+            if not os.path.exists(os.path.join(chunk_dir, f"part_{i}")):
+                upload.status = 'failed'
+                upload.save(update_fields=['status'])
+                raise FileNotFoundError(f"Chunk {i} missing for upload {upload_id}")
+
+        upload.file_digest = ChunkedUploadService.file_digest(upload)
         upload.status = 'completed'
-        upload.save(update_fields=['status'])
-        
-        # Cleanup ONLY the chunks folder, leaving the assembled file safe in final_dir
-        if os.path.exists(chunk_dir):
-            shutil.rmtree(chunk_dir)
-        
+        upload.save(update_fields=['file_digest', 'status'])
+
+        client = _redis()
+        if client is not None:
+            try:
+                client.delete(*_redis_keys(upload_id))
+            except Exception:
+                pass  # The keys expire on their own (UPLOAD_CHUNK_TTL)
+
         return final_file_path
 
     @staticmethod
-    def cleanup_expired_uploads():
-        """Removes old temp files (to be called by a task)."""
-        # Logic to delete folders older than 24h
-        pass
+    def temp_root():
+        base_dir = getattr(settings, 'MEDIA_ROOT', tempfile.gettempdir())
+        return os.path.join(base_dir, 'manga_temp_uploads')
+
+    @staticmethod
+    def temp_usage():
+        """
+        Disk used by the temp uploads: {'bytes', 'folders', 'free', 'quota'}
+        (free space of the temp disk, quota in bytes or 0), plus 'sizes', the
+        bytes of each top-level folder or file by name.
+        """
+        root = ChunkedUploadService.temp_root()
+        os.makedirs(root, exist_ok=True)
+        folders = 0
+        sizes = {}
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    folders += 1
+                sizes[entry.name] = _tree_size(entry)
+        return {
+            'bytes': sum(sizes.values()),
+            'folders': folders,
+            'free': shutil.disk_usage(root).free,
+            'quota': settings.UPLOAD_TEMP_QUOTA_MB * 1024 * 1024,
+            'sizes': sizes,
+        }
+
+    @staticmethod
+    def admit(size):
+        """
+        Admission control of a new `size` bytes upload: returns None when it
+        fits, else the reason it is refused. Uploads still receiving chunks
+        count for the part of their declared size not yet on disk (the
+        received chunks are already in the temp usage).
+        """
+        usage = ChunkedUploadService.temp_usage()
+        incoming = 0
+        for upload_id, file_size in ChunkedUpload.objects.filter(status='uploading').values_list('upload_id', 'file_size'):
+            incoming += max(0, file_size - usage['sizes'].get(str(upload_id), 0))
+        if usage['free'] - incoming - size < settings.UPLOAD_MIN_FREE_MB * 1024 * 1024:
+            return "Espace disque insuffisant pour un nouvel upload"
+        if usage['quota'] and usage['bytes'] + incoming + size > usage['quota']:
+            return "Quota des uploads temporaires atteint"
+        return None
+
+    @staticmethod
+    def cleanup_expired_uploads(now=None):
+        """
+        Janitor of the temp upload folder (run periodically by a task). Removes:
+        - folders of unknown uploads idle for an hour, of failed ones an hour
+          after they failed;
+        - uploads still receiving chunks with no chunk for UPLOAD_ABANDONED_AFTER_HOURS,
+          and received or completed uploads never processed for as long, marked failed;
+        - queued, dispatched and processing uploads after UPLOAD_TEMP_MAX_AGE_HOURS
+          in that status (a task killed mid-extraction never moves on), marked failed;
+        - stray files (older flat layout, interrupted temp copies) past the idle delay.
+        Ages come from the status timestamp (updated_at): chunk mtimes stop
+        changing once the last chunk is received.
+        Abandoned direct-to-storage uploads are aborted in the bucket.
+        Returns {'removed': folders and files removed, 'freed': bytes}.
+        """
+        import time
+
+        now = now or time.time()
+        abandoned_after = settings.UPLOAD_ABANDONED_AFTER_HOURS * 3600
+        max_age = settings.UPLOAD_TEMP_MAX_AGE_HOURS * 3600
+        root = ChunkedUploadService.temp_root()
+        os.makedirs(root, exist_ok=True)
+
+        entries = {}
+        with os.scandir(root) as it:
+            for entry in it:
+                entries[entry.name] = entry
+        uploads = {}
+        for upload in ChunkedUpload.objects.filter(upload_id__in=[_as_uuid(name) for name in entries if _as_uuid(name)]):
+            uploads[str(upload.upload_id)] = upload
+
+        removed = freed = 0
+        expired_ids = []
+        for name, entry in entries.items():
+            upload = uploads.get(name)
+            if upload is None:
+                # Orphan: an hour of grace for rows being created
+                expired = now - _last_activity(entry) > 3600
+            else:
+                age = now - upload.updated_at.timestamp()
+                if upload.status == 'failed':
+                    expired = age > 3600
+                elif upload.status in ('queued', 'dispatched', 'processing'):
+                    # Waiting for an ingestion slot, possibly behind a long backlog, or
+                    # extracting (retries included): only a killed task gets this old
+                    # Waiting for an ingestion slot, possibly behind a long backlog
+                    expired = age > max_age
+                elif upload.status == 'uploading':
+                    # Chunks arrive without touching the row: the last one counts too
+                    expired = now - max(upload.updated_at.timestamp(), _last_activity(entry)) > abandoned_after
+                else:
+                    expired = age > abandoned_after
+            if not expired:
+                continue
+            freed += _tree_size(entry)
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    continue
+            removed += 1
+            if upload is not None and upload.status != 'failed':
+                expired_ids.append(upload.pk)
+
+        # Never-finished uploads without a folder (direct-to-storage, or no chunk received)
+        cutoff = timezone.now() - timezone.timedelta(seconds=abandoned_after)
+        stale = ChunkedUpload.objects.filter(status='uploading', updated_at__lt=cutoff).exclude(pk__in=expired_ids)
+        for upload in stale:
+            if str(upload.upload_id) in entries:
+                continue  # Still receiving chunks (recent activity)
+            if upload.storage_key:
+                try:
+                    DirectUploadService.delete_stored(upload)
+                except Exception as exc:
+                    logger.warning(f"Could not abort stored upload {upload.storage_key}: {exc}")
+                    continue
+            expired_ids.append(upload.pk)
+
+        ChunkedUpload.objects.filter(pk__in=expired_ids).update(status='failed', updated_at=timezone.now())
+        if removed or expired_ids:
+            logger.info(f"Temp upload janitor: removed {removed} entries ({freed} bytes), {len(expired_ids)} uploads expired")
+        return {'removed': removed, 'freed': freed, 'expired': len(expired_ids)}
+
+
+def _as_uuid(name):
+    try:
+        return uuid.UUID(name)
+    except ValueError:
+        return None
+
+
+def _tree_size(entry):
+    """Bytes used by a scandir entry, recursively for directories."""
+    try:
+        if not entry.is_dir(follow_symlinks=False):
+            return entry.stat(follow_symlinks=False).st_size
+        with os.scandir(entry.path) as it:
+            return sum(_tree_size(child) for child in it)
+    except OSError:
+        return 0  # Removed meanwhile
+
+
+def _last_activity(entry):
+    """Latest mtime of an entry and of its direct children (a new chunk bumps chunks/)."""
+    try:
+        latest = entry.stat(follow_symlinks=False).st_mtime
+        if entry.is_dir(follow_symlinks=False):
+            with os.scandir(entry.path) as it:
+                for child in it:
+                    latest = max(latest, child.stat(follow_symlinks=False).st_mtime)
+        return latest
+    except OSError:
+        return 0
+
+
+class DirectUploadService:
+    """
+    Uploads sent by the browser straight to the bucket as an S3 multipart
+    upload, through presigned part URLs: the archive never goes through the
+    web workers. Once complete, the ingestion worker downloads the object
+    (catalog.tasks.task_process_chapter) and deletes it when done.
+    Works with any S3-compatible storage (R2, MinIO) via AWS_S3_ENDPOINT_URL.
+    """
+
+    @staticmethod
+    def is_enabled():
+        return settings.UPLOAD_DIRECT_TO_STORAGE and bool(settings.AWS_STORAGE_BUCKET_NAME)
+
+    @staticmethod
+    def client():
+        import boto3
+        from botocore.config import Config
+
+        return boto3.client(
+            's3',
+            endpoint_url=settings.AWS_S3_ENDPOINT_URL or None,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID or None,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY or None,
+            region_name=settings.AWS_S3_REGION_NAME,
+            config=Config(
+                signature_version='s3v4',
+                s3={'addressing_style': getattr(settings, 'AWS_S3_ADDRESSING_STYLE', None) or 'auto'},
+            ),
+        )
+
+    @staticmethod
+    def create_upload(user, filename, size):
+        """Start the multipart upload of a `size` bytes file; returns the ChunkedUpload (one chunk per part)."""
+        total_parts = max(1, math.ceil(size / settings.UPLOAD_S3_PART_SIZE))
+        if total_parts > 10000:
+            raise ValueError(f"{filename} needs {total_parts} parts (max 10000): raise UPLOAD_S3_PART_SIZE")
+
+        upload = ChunkedUpload(user=user, filename=filename, total_chunks=total_parts)
+        upload.storage_key = f"{settings.UPLOAD_S3_PREFIX}{upload.upload_id}/{os.path.basename(filename)}"
+        response = DirectUploadService.client().create_multipart_upload(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=upload.storage_key,
+        )
+        upload.storage_upload_id = response['UploadId']
+        upload.save()
+        return upload
+
+    @staticmethod
+    def part_urls(upload, part_numbers, client=None):
+        """Presigned PUT URLs of the given (1-based) parts."""
+        client = client or DirectUploadService.client()
+        return [
+            {
+                'part_number': number,
+                'url': client.generate_presigned_url('upload_part', Params={
+                    'Bucket': settings.AWS_STORAGE_BUCKET_NAME, 'Key': upload.storage_key,
+                    'UploadId': upload.storage_upload_id, 'PartNumber': number,
+                }, ExpiresIn=settings.UPLOAD_PRESIGNED_EXPIRY),
+            }
+            for number in part_numbers
+        ]
+
+    @staticmethod
+    def uploaded_parts(upload, client=None):
+        """Map part number -> ETag of the parts already in storage."""
+        client = client or DirectUploadService.client()
+        parts = {}
+        pages = client.get_paginator('list_parts').paginate(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=upload.storage_key, UploadId=upload.storage_upload_id,
+        )
+        for page in pages:
+            for part in page.get('Parts', []):
+                parts[part['PartNumber']] = part['ETag']
+        return parts
+
+    @staticmethod
+    def missing_parts(upload, client=None):
+        uploaded = DirectUploadService.uploaded_parts(upload, client)
+        return [number for number in range(1, upload.total_chunks + 1) if number not in uploaded]
+
+    @staticmethod
+    def complete_upload(upload_id):
+        """
+        Assemble the object from its parts (in storage, no byte goes through
+        here) and mark the upload completed; returns the object key. The part
+        list comes from storage, so the browser does not need to read ETags.
+        """
+        upload = ChunkedUpload.objects.get(upload_id=upload_id)
+        if upload.status == 'completed':
+            return upload.storage_key
+
+        client = DirectUploadService.client()
+        uploaded = DirectUploadService.uploaded_parts(upload, client)
+        missing = [number for number in range(1, upload.total_chunks + 1) if number not in uploaded]
+        if missing:
+            raise ValueError(f"Parts missing for upload {upload_id}: {missing}")
+
+        client.complete_multipart_upload(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=upload.storage_key, UploadId=upload.storage_upload_id,
+            MultipartUpload={'Parts': [
+                {'PartNumber': number, 'ETag': uploaded[number]} for number in range(1, upload.total_chunks + 1)
+            ]},
+        )
+        upload.received_chunks = upload.total_chunks
+        upload.status = 'completed'
+        upload.save(update_fields=['received_chunks', 'status'])
+        return upload.storage_key
+
+    @staticmethod
+    def download(upload, dest_path):
+        """Download the upload's object to `dest_path` (worker side, ranged GETs in parallel)."""
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        partial_path = f"{dest_path}.{uuid.uuid4().hex}.part"
+        try:
+            DirectUploadService.client().download_file(
+                settings.AWS_STORAGE_BUCKET_NAME, upload.storage_key, partial_path,
+            )
+            os.replace(partial_path, dest_path)
+        finally:
+            if os.path.exists(partial_path):
+                os.unlink(partial_path)
+        return dest_path
+
+    @staticmethod
+    def delete_stored(upload):
+        """Remove the upload's object, or abort its multipart upload when it was never completed."""
+        client = DirectUploadService.client()
+        if upload.status in ('uploading', 'failed') and upload.storage_upload_id:
+            try:
+                client.abort_multipart_upload(
+                    Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=upload.storage_key,
+                    UploadId=upload.storage_upload_id,
+                )
+            except client.exceptions.NoSuchUpload:
+                pass  # Already completed: the object is deleted below
+        client.delete_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=upload.storage_key)
@@ -43,9 +43,14 @@ urlpatterns = [
     # Chunked Upload API
     path('upload/init/', views.InitChunkedUploadView.as_view(), name='upload_init'),
     path('upload/chunk/', views.UploadChunkView.as_view(), name='upload_chunk'),
+    path('upload/resume/', views.ResumeChunkedUploadView.as_view(), name='upload_resume'),
     path('upload/complete/', views.CompleteChunkedUploadView.as_view(), name='upload_complete'),
+    path('upload/direct/init/', views.InitDirectUploadView.as_view(), name='upload_direct_init'),
+    path('upload/direct/resume/', views.ResumeDirectUploadView.as_view(), name='upload_direct_resume'),
+    path('upload/direct/complete/', views.CompleteDirectUploadView.as_view(), name='upload_direct_complete'),
     path('upload/process/', views.ProcessChapterFromUploadView.as_view(), name='upload_process'),
     path('upload/progress/', views.UploadProgressStatusView.as_view(), name='upload_process_status'),
+    path('upload/metrics/', views.IngestionMetricsView.as_view(), name='upload_metrics'),
 
     # Gamification Management - Badges
     path('gamification/badges/', views.AdminBadgeListView.as_view(), name='badge_list'),
@@ -55,6 +55,12 @@ class AdminDashboardView(TemplateView):
         adsterra_api_key = getattr(settings, 'ADSTERRA_API_KEY', None)
         context['adsterra_data'] = fetch_adsterra_dashboard_data(adsterra_api_key)
 
+        # Temp upload disk (chunks waiting for extraction)
+        temp_uploads = ChunkedUploadService.temp_usage()
+        limit = temp_uploads['quota'] or temp_uploads['bytes'] + temp_uploads['free']
+        temp_uploads['percent'] = round(100 * temp_uploads['bytes'] / limit) if limit else 0
+        context['temp_uploads'] = temp_uploads
+
         context['active_tab'] = 'dashboard'
         return context
 
@@ -228,6 +234,8 @@ class AdminSeriesCreateView(CreateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['active_tab'] = 'series'
+        context['direct_upload'] = DirectUploadService.is_enabled()
+        context['direct_upload_part_size'] = settings.UPLOAD_S3_PART_SIZE
         return context
 
 @method_decorator(requires_admin, name='dispatch')
@@ -263,6 +271,8 @@ class AdminSeriesUpdateView(UpdateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['active_tab'] = 'series'
+        context['direct_upload'] = DirectUploadService.is_enabled()
+        context['direct_upload_part_size'] = settings.UPLOAD_S3_PART_SIZE
         return context
 
 @method_decorator(requires_admin, name='dispatch')
@@ -359,8 +369,11 @@ class AdminChapterCreateView(CreateView):
             # Process in background — thread wraps Celery dispatch
             # (needed because CELERY_TASK_ALWAYS_EAGER makes .delay() synchronous)
             def _dispatch():
-                from catalog.tasks import task_process_chapter
-                task_process_chapter.delay(self.object.series.id, None, temp_path)
+                from catalog.tasks import task_process_chapter, ingestion_options
+                task_process_chapter.apply_async(
+                    (self.object.series.id, None, temp_path), {'interactive': True},
+                    **ingestion_options(True)
+                )
             threading.Thread(target=_dispatch, daemon=True).start()
             
         create_system_log(self.request, 'CHAPTER_CREATE', details=f"Chapitre créé : {self.object.number} pour {self.object.series.title}")
@@ -423,8 +436,11 @@ class AdminChapterUpdateView(UpdateView):
             
             # Process in background — thread wraps Celery dispatch
             def _dispatch():
-                from catalog.tasks import task_process_chapter
-                task_process_chapter.delay(self.object.series.id, None, temp_path)
+                from catalog.tasks import task_process_chapter, ingestion_options
+                task_process_chapter.apply_async(
+                    (self.object.series.id, None, temp_path), {'interactive': True},
+                    **ingestion_options(True)
+                )
             threading.Thread(target=_dispatch, daemon=True).start()
             msg = "Chapitre mis à jour. Extraction des nouvelles pages en cours..."
         else:
@@ -633,7 +649,10 @@ class AdminEventDeleteView(DeleteView):
 
 from django.http import JsonResponse
 from .models import ChunkedUpload
-from .upload_service import ChunkedUploadService
+from .upload_service import ChunkedUploadService, DirectUploadService, ChunkDigestMismatch
+
+# Seconds before a client refused for lack of temp disk space tries again
+UPLOAD_ADMISSION_RETRY = 30
 
 @method_decorator(requires_admin, name='dispatch')
 class InitChunkedUploadView(View):
@@ -644,11 +663,22 @@ class InitChunkedUploadView(View):
         if not filename or not total_chunks:
             return JsonResponse({'error': 'Missing parameters'}, status=400)
             
-        upload = ChunkedUpload.objects.create(
-            user=request.user,
-            filename=filename,
-            total_chunks=int(total_chunks)
-        )
+        try:
+            total_chunks = int(total_chunks)
+            # Clients that don't send the size: 2 MB chunks (series_form.html)
+            size = int(request.POST.get('size') or total_chunks * 2 * 1024 * 1024)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid parameters'}, status=400)
+        if total_chunks < 1 or size < 0:
+            return JsonResponse({'error': 'Invalid parameters'}, status=400)
+        refused = ChunkedUploadService.admit(size)
+        if refused:
+            # The client waits and asks again: uploads in progress free space as they are extracted
+            response = JsonResponse({'error': refused, 'retry_after': UPLOAD_ADMISSION_RETRY}, status=507)
+            response['Retry-After'] = str(UPLOAD_ADMISSION_RETRY)
+            return response
+
+        upload = ChunkedUploadService.create_upload(request.user, filename, total_chunks, size)
         
         return JsonResponse({
             'upload_id': str(upload.upload_id),
@@ -666,11 +696,43 @@ class UploadChunkView(View):
             return JsonResponse({'error': 'Missing parameters'}, status=400)
             
         try:
-            ChunkedUploadService.save_chunk(upload_id, chunk_file, int(chunk_index))
-            return JsonResponse({'status': 'chunk_saved'})
+            received = ChunkedUploadService.save_chunk(
+                upload_id, chunk_file, int(chunk_index), digest=request.POST.get('chunk_sha256'),
+            )
+            return JsonResponse({'status': 'chunk_saved', 'received_chunks': received})
+        except ChunkDigestMismatch as e:
+            # Only this chunk is sent again
+            return JsonResponse({'error': str(e), 'resend': True}, status=400)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
+@method_decorator(requires_admin, name='dispatch')
+class ResumeChunkedUploadView(View):
+    """Chunks of an interrupted upload the client still has to send (any order)."""
+    def get(self, request, *args, **kwargs):
+        upload_id = request.GET.get('upload_id')
+        if not upload_id:
+            return JsonResponse({'error': 'Missing upload_id'}, status=400)
+
+        from django.core.exceptions import ValidationError
+        try:
+            upload = ChunkedUpload.objects.filter(upload_id=upload_id, user=request.user).first()
+        except ValidationError:
+            upload = None
+        if upload is None:
+            return JsonResponse({'error': 'Upload not found'}, status=404)
+
+        missing = ChunkedUploadService.missing_chunks(upload)
+        return JsonResponse({
+            'upload_id': str(upload.upload_id),
+            'status': upload.status,
+            'total_chunks': upload.total_chunks,
+            'received_chunks': upload.total_chunks - len(missing),
+            'missing': missing,
+        })
+
 @method_decorator(requires_admin, name='dispatch')
 class CompleteChunkedUploadView(View):
     def post(self, request, *args, **kwargs):
@@ -680,7 +742,7 @@ class CompleteChunkedUploadView(View):
             return JsonResponse({'error': 'Missing upload_id'}, status=400)
             
         try:
-            final_path = ChunkedUploadService.assemble_file(upload_id)
+            final_path = ChunkedUploadService.complete_upload(upload_id)
             return JsonResponse({
                 'status': 'completed',
                 'final_path': final_path
@@ -689,6 +751,77 @@ class CompleteChunkedUploadView(View):
             return JsonResponse({'error': str(e)}, status=500)
 
 
+@method_decorator(requires_admin, name='dispatch')
+class InitDirectUploadView(View):
+    """Start a direct-to-storage upload: presigned URLs of every part of the file."""
+    def post(self, request, *args, **kwargs):
+        if not DirectUploadService.is_enabled():
+            return JsonResponse({'error': 'Direct upload disabled'}, status=400)
+
+        filename = request.POST.get('filename')
+        size = request.POST.get('size')
+        if not filename or not size:
+            return JsonResponse({'error': 'Missing parameters'}, status=400)
+
+        try:
+            upload = DirectUploadService.create_upload(request.user, filename, int(size))
+            return JsonResponse({
+                'upload_id': str(upload.upload_id),
+                'part_size': settings.UPLOAD_S3_PART_SIZE,
+                'parts': DirectUploadService.part_urls(upload, range(1, upload.total_chunks + 1)),
+                'status': 'initiated',
+            })
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Exception as e:
+            logger.error(f"Could not start direct upload of {filename}: {e}")
+            return JsonResponse({'error': str(e)}, status=500)
+
+@method_decorator(requires_admin, name='dispatch')
+class ResumeDirectUploadView(View):
+    """Parts of a direct-to-storage upload still missing from the bucket, with fresh URLs."""
+    def get(self, request, *args, **kwargs):
+        from django.core.exceptions import ValidationError
+        try:
+            upload = ChunkedUpload.objects.filter(
+                upload_id=request.GET.get('upload_id'), user=request.user,
+            ).exclude(storage_key='').first()
+        except ValidationError:
+            upload = None
+        if upload is None:
+            return JsonResponse({'error': 'Upload not found'}, status=404)
+        if upload.status != 'uploading':
+            return JsonResponse({'upload_id': str(upload.upload_id), 'status': upload.status, 'parts': []})
+
+        try:
+            client = DirectUploadService.client()
+            missing = DirectUploadService.missing_parts(upload, client)
+            return JsonResponse({
+                'upload_id': str(upload.upload_id),
+                'status': upload.status,
+                'total_chunks': upload.total_chunks,
+                'parts': DirectUploadService.part_urls(upload, missing, client),
+            })
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+@method_decorator(requires_admin, name='dispatch')
+class CompleteDirectUploadView(View):
+    def post(self, request, *args, **kwargs):
+        upload_id = request.POST.get('upload_id')
+        if not upload_id:
+            return JsonResponse({'error': 'Missing upload_id'}, status=400)
+
+        try:
+            key = DirectUploadService.complete_upload(upload_id)
+            return JsonResponse({'status': 'completed', 'storage_key': key})
+        except ValueError as e:
+            # Parts still missing: the client resumes them
+            return JsonResponse({'error': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+
 @method_decorator(requires_admin, name='dispatch')
 class ProcessChapterFromUploadView(View):
     def post(self, request, *args, **kwargs):
@@ -702,8 +835,10 @@ class ProcessChapterFromUploadView(View):
             upload_ids = [uid.strip() for uid in upload_ids_str.split(',') if uid.strip()]
             
             if upload_ids:
-                from catalog.tasks import task_bulk_process_chapters
-                task_bulk_process_chapters.delay(series_id, upload_ids)
+                from catalog.tasks import task_bulk_process_chapters, ingestion_options, is_interactive_upload
+                task_bulk_process_chapters.apply_async(
+                    (series_id, upload_ids), **ingestion_options(is_interactive_upload(len(upload_ids)))
+                )
                 
             return JsonResponse({
                 'status': 'processing_started',
@@ -774,16 +909,89 @@ class UploadProgressStatusView(View):
                         'message': f"{failed_count} upload(s) ont échoué."
                     })
             
-            return JsonResponse({
+            data = {
                 'status': status,
                 'percentage': percentage,
                 'total_files': total_files,
                 'processed_files': processed_files
-            })
+            }
+
+            # Bulk chapters still waiting for the fair-share scheduler
+            queued_ids = list(uploads.filter(status='queued').values_list('upload_id', flat=True))
+            if queued_ids:
+                from catalog.scheduling import queue_positions, estimate_wait_seconds
+                positions = queue_positions()
+                position = min((positions[uid] for uid in queued_ids if uid in positions), default=None)
+                data.update({
+                    'queued_chapters': len(queued_ids),
+                    'queue_position': position,
+                    'eta_seconds': estimate_wait_seconds(position) if position else None,
+                })
+            return JsonResponse(data)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
 
+@method_decorator(requires_admin, name='dispatch')
+class IngestionMetricsView(View):
+    """
+    Aggregated chapter ingestion metrics of the recent uploads (?hours=24):
+    seconds per stage, pages and bytes, the highest peak memory, plus the last
+    uploads' own summaries.
+    """
+    COUNTERS = (
+        'pages_total', 'pages_saved', 'pages_reused', 'pages_passthrough', 'pages_too_large',
+        'bytes_read', 'bytes_stored',
+    )
+
+    def get(self, request, *args, **kwargs):
+        from collections import Counter
+        from datetime import timedelta
+
+        try:
+            hours = max(1, int(request.GET.get('hours', 24)))
+        except ValueError:
+            return JsonResponse({'error': 'Paramètre hours invalide'}, status=400)
+
+        uploads = list(
+            ChunkedUpload.objects
+            .filter(created_at__gte=timezone.now() - timedelta(hours=hours))
+            .exclude(ingest_metrics={})
+            .order_by('-created_at')
+            .values('upload_id', 'filename', 'status', 'created_at', 'ingest_metrics')
+        )
+
+        totals, stages = Counter(), Counter()
+        seconds = 0.0
+        peak_rss = 0
+        for upload in uploads:
+            metrics = upload['ingest_metrics']
+            totals.update({key: metrics.get(key, 0) for key in self.COUNTERS})
+            stages.update(metrics.get('stages', {}))
+            seconds += metrics.get('seconds', 0)
+            peak_rss = max(peak_rss, metrics.get('peak_rss_bytes') or 0)
+
+        return JsonResponse({
+            'hours': hours,
+            'uploads': len(uploads),
+            'seconds': round(seconds, 3),
+            'pages_per_second': round(totals['pages_saved'] / seconds, 2) if seconds else 0,
+            **{key: totals[key] for key in self.COUNTERS},
+            'peak_rss_bytes': peak_rss or None,
+            'stages': {stage: round(value, 3) for stage, value in stages.items()},
+            'recent': [
+                {
+                    'upload_id': str(upload['upload_id']),
+                    'filename': upload['filename'],
+                    'status': upload['status'],
+                    'created_at': upload['created_at'].isoformat(),
+                    'metrics': upload['ingest_metrics'],
+                }
+                for upload in uploads[:20]
+            ],
+        })
+
+
 # --- Gamification Management (Badges) ---
 @method_decorator(requires_admin, name='dispatch')
 class AdminBadgeListView(ListView):
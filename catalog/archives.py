@@ -0,0 +1,436 @@
+"""
+Single-pass page sources for chapter archives.
+
+Each source opens its container once, lists the page images in reading order
+and streams their bytes, instead of re-opening the archive for every page.
+"""
+import bisect
+import io
+import os
+import hashlib
+import queue
+import shutil
+import tempfile
+import threading
+import zipfile
+import logging
+
+import pypdf
+
+try:
+    import rarfile
+    # Configure rarfile to find UnRAR.exe on Windows
+    import platform
+    if platform.system() == 'Windows':
+        _unrar_paths = [
+            r'C:\Program Files\WinRAR\UnRAR.exe',
+            r'C:\Program Files (x86)\WinRAR\UnRAR.exe',
+        ]
+        for _p in _unrar_paths:
+            if os.path.exists(_p):
+                rarfile.UNRAR_TOOL = _p
+                break
+    HAS_RARFILE = True
+except ImportError:
+    rarfile = None
+    HAS_RARFILE = False
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+def is_page_image(name):
+    """True for image entries, ignoring macOS resource forks."""
+    return name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('__MACOSX')
+
+
+class ConcatenatedReader(io.RawIOBase):
+    """
+    Read-only, seekable stream over files read back to back: the chunks of an
+    upload consumed in place, as one file, without assembling them first.
+    """
+
+    def __init__(self, paths):
+        super().__init__()
+        self._paths = list(paths)
+        self._offsets = [0]
+        for path in self._paths:
+            self._offsets.append(self._offsets[-1] + os.path.getsize(path))
+        self._pos = 0
+        self._part = None
+        self._part_index = None
+
+    @property
+    def size(self):
+        return self._offsets[-1]
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        elif whence != io.SEEK_SET:
+            raise ValueError(f"Invalid whence: {whence}")
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._pos = offset
+        return self._pos
+
+    def readinto(self, buffer):
+        """Fill `buffer` across part boundaries (short only at the end of the stream)."""
+        view = memoryview(buffer).cast('B')
+        filled = 0
+        while filled < len(view) and self._pos < self.size:
+            index = bisect.bisect_right(self._offsets, self._pos) - 1
+            if index != self._part_index:
+                if self._part is not None:
+                    self._part.close()
+                self._part = open(self._paths[index], 'rb')
+                self._part_index = index
+            self._part.seek(self._pos - self._offsets[index])
+            wanted = min(len(view) - filled, self._offsets[index + 1] - self._pos)
+            read = self._part.readinto(view[filled:filled + wanted])
+            if not read:
+                raise IOError(f"{self._paths[index]} is shorter than when the stream was opened")
+            filled += read
+            self._pos += read
+        return filled
+
+    def close(self):
+        if self._part is not None:
+            self._part.close()
+            self._part = None
+        super().close()
+
+
+def chunk_part_paths(file_path):
+    """
+    Chunks of an upload not assembled into `file_path` (chunks/part_0..N in its
+    directory, see administration.upload_service), or None.
+    """
+    chunk_dir = os.path.join(os.path.dirname(file_path), 'chunks')
+    if not os.path.isdir(chunk_dir):
+        return None
+    # In-flight chunk writes (part_N.<id>.tmp) are not parts
+    indices = sorted(
+        int(name[5:]) for name in os.listdir(chunk_dir) if name.startswith('part_') and name[5:].isdigit()
+    )
+    if not indices or indices != list(range(len(indices))):
+        return None
+    return [os.path.join(chunk_dir, f"part_{i}") for i in indices]
+
+
+def source_exists(file_path):
+    return os.path.exists(file_path) or chunk_part_paths(file_path) is not None
+
+
+def open_source_file(file_path):
+    """Binary, seekable stream of a chapter file, read from its upload chunks when it was not assembled."""
+    if os.path.exists(file_path):
+        return open(file_path, 'rb')
+    parts = chunk_part_paths(file_path)
+    if parts is None:
+        raise FileNotFoundError(f"No such file or upload chunks: {file_path}")
+    return ConcatenatedReader(parts)
+
+
+def source_size(file_path):
+    if os.path.exists(file_path):
+        return os.path.getsize(file_path)
+    with open_source_file(file_path) as f:
+        return f.size
+
+
+def _copy_file(src, dst):
+    """Copy `src` to the end of `dst` in the kernel (copy_file_range) when possible."""
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    if copy_file_range is not None:
+        remaining = os.fstat(src.fileno()).st_size
+        try:
+            while remaining > 0:
+                copied = copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if not copied:
+                    break
+                remaining -= copied
+            return
+        except OSError:
+            pass  # Unsupported here (filesystem, kernel): copy what is left in user space
+    shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def materialize_source(file_path):
+    """
+    Make sure `file_path` exists on disk, assembling it from its upload chunks
+    if needed: for readers that only take a path (unrar). Returns the path.
+    """
+    if os.path.exists(file_path):
+        return file_path
+    parts = chunk_part_paths(file_path)
+    if parts is None:
+        raise FileNotFoundError(f"No such file or upload chunks: {file_path}")
+    # Assembled under a private name: concurrent readers never see a partial file
+    partial_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        with open(partial_path, 'wb') as dst:
+            for path in parts:
+                with open(path, 'rb') as src:
+                    _copy_file(src, dst)
+        os.replace(partial_path, file_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+    return file_path
+
+
+def source_fingerprint(file_path, sample_size=1024 * 1024):
+    """
+    Cheap identity of a source file: SHA-256 over its size and its first and
+    last `sample_size` bytes, so multi-hundred-MB archives aren't read in full.
+    """
+    size = source_size(file_path)
+    digest = hashlib.sha256(str(size).encode())
+    with open_source_file(file_path) as f:
+        digest.update(f.read(sample_size))
+        if size > sample_size:
+            f.seek(max(sample_size, size - sample_size))
+            digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+
+class PageSource:
+    """
+    Base class for page sources. Subclasses open the container in `open()`,
+    fill `self.entries` (in reading order) and implement `open_entry()`, a
+    seekable binary stream of the entry. Iterating yields (index, image_data,
+    filename) tuples; `pages(start, stop)` only reads the entries of that range.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.entries = []
+
+    def open(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def open_entry(self, entry):
+        raise NotImplementedError
+
+    def read_entry(self, entry, check=None):
+        """
+        Read an entry's bytes. `check(stream)` is called on the entry's stream
+        first (e.g. to inspect the image header) and may raise to skip it
+        before it is read in full.
+        """
+        with self.open_entry(entry) as stream:
+            if check is not None:
+                check(stream)
+                stream.seek(0)
+            return stream.read()
+
+    def entry_filename(self, entry):
+        return os.path.basename(entry)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return self.pages()
+
+    def pages(self, start=0, stop=None, check=None):
+        for i, entry in enumerate(self.entries[start:stop], start):
+            try:
+                image_data = self.read_entry(entry, check)
+            except Exception as e:
+                logger.error(f"Failed to read page {i} from {self.file_path}: {e}")
+                continue
+            yield i, image_data, self.entry_filename(entry)
+
+
+class ZipPageSource(PageSource):
+    """Pages of a ZIP/CBZ/EPUB archive, read from a single open ZipFile."""
+
+    def open(self):
+        # Unassembled uploads are read from their chunks in place
+        self._file = open_source_file(self.file_path)
+        try:
+            self._zf = zipfile.ZipFile(self._file, 'r')
+        except Exception:
+            self._file.close()
+            raise
+        self.entries = sorted(f for f in self._zf.namelist() if is_page_image(f))
+
+    def close(self):
+        self._zf.close()
+        self._file.close()
+
+    def open_entry(self, entry):
+        # Seekable in Python 3.7+ (seeking back re-inflates from the start,
+        # cheap for a header peek)
+        return self._zf.open(entry)
+
+
+class RarPageSource(PageSource):
+    """
+    Pages of a RAR/CBR archive. Every `RarFile.open()` spawns an unrar process
+    (and re-decompresses solid archives from the start), so the page images are
+    extracted with a single unrar call into a scratch directory and read from there.
+    """
+
+    def open(self):
+        if not HAS_RARFILE:
+            raise ImportError(
+                "Le paquet 'rarfile' est requis pour traiter les fichiers .cbr. "
+                "Installez-le avec: pip install rarfile"
+            )
+        # unrar needs a real file: assemble an upload's chunks first
+        materialize_source(self.file_path)
+        with rarfile.RarFile(self.file_path, 'r') as rf:
+            self.entries = sorted(f for f in rf.namelist() if is_page_image(f))
+            self._extract_dir = tempfile.mkdtemp(dir=os.path.dirname(self.file_path) or None)
+            try:
+                if self.entries:
+                    rf.extractall(self._extract_dir, members=self.entries)
+            except Exception:
+                self.close()
+                raise
+
+    def close(self):
+        shutil.rmtree(getattr(self, '_extract_dir', ''), ignore_errors=True)
+
+    def open_entry(self, entry):
+        return open(os.path.join(self._extract_dir, entry), 'rb')
+
+
+class PdfPageSource(PageSource):
+    """
+    Embedded images of a PDF, parsed once with a single PdfReader. Entries
+    are listed from the pages' image ids: each image is decoded once, when
+    its entry is read.
+    """
+
+    def open(self):
+        self._file = open_source_file(self.file_path)
+        try:
+            self._reader = pypdf.PdfReader(self._file)
+        except Exception:
+            self._file.close()
+            raise
+        self.entries = [
+            (page_num, img_idx, image_id)
+            for page_num, page in enumerate(self._reader.pages)
+            for img_idx, image_id in enumerate(page.images.keys())
+        ]
+        # Decoded names carry the extension of the image's format (see open_entry)
+        self._names = {}
+
+    def close(self):
+        self._file.close()
+
+    def open_entry(self, entry):
+        # pypdf decodes embedded images into memory
+        page_num, img_idx, _image_id = entry
+        image = self._reader.pages[page_num].images[img_idx]
+        self._names[entry[:2]] = image.name
+        return io.BytesIO(image.data)
+
+    def entry_filename(self, entry):
+        page_num, img_idx, image_id = entry
+        if (page_num, img_idx) in self._names:
+            return self._names[(page_num, img_idx)]
+        if isinstance(image_id, list):
+            image_id = image_id[-1]
+        return image_id.lstrip('/')
+
+
+def open_page_source(file_path):
+    """
+    Open the page source matching the file's extension; the caller closes it.
+    CBR files that are actually ZIP archives (mislabeled) are opened as ZIP.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == '.pdf':
+        source = PdfPageSource(file_path)
+    elif ext == '.cbr':
+        source = RarPageSource(file_path)
+        try:
+            source.open()
+            return source
+        except Exception as e:
+            if not HAS_RARFILE or not isinstance(e, rarfile.BadRarFile):
+                raise
+            logger.warning(f"CBR file {file_path} is not a valid RAR, trying as ZIP...")
+            source = ZipPageSource(file_path)
+    elif ext in ('.cbz', '.zip', '.epub'):
+        source = ZipPageSource(file_path)
+    else:
+        raise ValueError(f"Unsupported chapter file: {file_path}")
+    source.open()
+    return source
+
+
+class _PrefetchEnd:
+    def __init__(self, error=None):
+        self.error = error
+
+
+def prefetch(iterable, size=4):
+    """
+    Iterate `iterable` from a background thread, keeping at most `size` items
+    buffered ahead of the consumer. Exceptions are re-raised in the consumer.
+    """
+    buffer = queue.Queue(maxsize=max(1, size))
+    stop = threading.Event()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for item in iterable:
+                if not _put(item):
+                    return
+        except BaseException as e:
+            _put(_PrefetchEnd(e))
+            return
+        _put(_PrefetchEnd())
+
+    thread = threading.Thread(target=_produce, name='page-prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if isinstance(item, _PrefetchEnd):
+                if item.error is not None:
+                    raise item.error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,147 @@
+"""
+Synthetic chapter generators for the ingestion benchmark (`benchmark_ingestion`).
+
+Pages imitate scanlation output (panel borders, ink strokes, screentone dots,
+speech bubbles with text lines) so encoders see realistic detail, and are
+deterministic for a given seed. No Django imports: usable from tests and scripts.
+"""
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import zipfile
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+CHAPTER_FORMATS = ('cbz', 'epub', 'pdf', 'cbr')
+
+
+def synthetic_page(width=1600, height=2400, grayscale=True, seed=0):
+    """Draw one page: 'L' image for B&W pages, 'RGB' with coloured fills otherwise."""
+    rng = random.Random(seed)
+    img = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(img)
+    margin = width // 20
+    ink = (15, 15, 15)
+
+    # Panel grid
+    y = margin
+    while y < height - margin:
+        panel_height = rng.randint(height // 6, height // 3)
+        bottom = min(y + panel_height, height - margin)
+        split = rng.randint(width // 3, 2 * width // 3) if rng.random() < 0.6 else None
+        panels = [(margin, split - margin // 4), (split + margin // 4, width - margin)] if split else [(margin, width - margin)]
+        for left, right in panels:
+            if not grayscale and rng.random() < 0.7:
+                fill = tuple(rng.randint(60, 240) for _ in range(3))
+                draw.rectangle([left, y, right, bottom], fill=fill)
+            draw.rectangle([left, y, right, bottom], outline=ink, width=max(2, width // 400))
+
+            # Screentone
+            if rng.random() < 0.5:
+                step = max(4, width // 200)
+                tone_top = rng.randint(y, max(y, bottom - panel_height // 2))
+                for ty in range(tone_top, bottom, step):
+                    for tx in range(left, right, step):
+                        draw.point((tx + (ty // step % 2) * step // 2, ty), fill=(90, 90, 90))
+
+            # Ink strokes
+            for _ in range(rng.randint(15, 40)):
+                points = [
+                    (rng.randint(left, right), rng.randint(y, bottom))
+                    for _ in range(rng.randint(2, 5))
+                ]
+                draw.line(points, fill=ink, width=rng.randint(1, max(2, width // 300)))
+
+            # Speech bubble with text lines
+            if rng.random() < 0.6 and right - left > width // 4:
+                bubble_width = (right - left) // 3
+                bubble_left = rng.randint(left, right - bubble_width)
+                bubble_top = y + (bottom - y) // 8
+                draw.ellipse(
+                    [bubble_left, bubble_top, bubble_left + bubble_width, bubble_top + bubble_width * 2 // 3],
+                    fill='white', outline=ink, width=3,
+                )
+                for line in range(3):
+                    line_y = bubble_top + bubble_width // 6 + line * bubble_width // 8
+                    draw.line(
+                        [bubble_left + bubble_width // 5, line_y, bubble_left + bubble_width * 4 // 5, line_y],
+                        fill=ink, width=max(2, width // 250),
+                    )
+        y = bottom + margin // 2
+
+    return img.convert('L') if grayscale else img
+
+
+def synthetic_pages(count, width=1600, height=2400, mode='gray', page_format='JPEG', quality=90, seed=0):
+    """
+    Yield (filename, bytes) for `count` pages. `mode` is 'gray', 'color' or
+    'mixed' (one colour page in four, like colour inserts).
+    """
+    for i in range(count):
+        grayscale = mode == 'gray' or (mode == 'mixed' and i % 4)
+        page = synthetic_page(width, height, grayscale=grayscale, seed=seed + i)
+        buffer = BytesIO()
+        if page_format == 'JPEG':
+            page.save(buffer, format='JPEG', quality=quality)
+            extension = 'jpg'
+        else:
+            page.save(buffer, format='PNG')
+            extension = 'png'
+        yield f"{i + 1:03d}.{extension}", buffer.getvalue()
+
+
+def rar_available():
+    return shutil.which('rar') is not None
+
+
+def write_chapter(path, chapter_format, pages):
+    """
+    Package (filename, bytes) pages as a chapter file. PDFs embed the pages as
+    JPEG (DCTDecode) images, one per PDF page. CBR needs the `rar` tool.
+    """
+    if chapter_format == 'cbz':
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as zf:
+            for filename, data in pages:
+                zf.writestr(filename, data)
+
+    elif chapter_format == 'epub':
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+            zf.writestr(
+                'META-INF/container.xml',
+                '<?xml version="1.0"?><container version="1.0" '
+                'xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+                '<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+                '</rootfiles></container>',
+            )
+            for filename, data in pages:
+                zf.writestr(f"OEBPS/images/{filename}", data)
+
+    elif chapter_format == 'pdf':
+        images = [Image.open(BytesIO(data)) for _filename, data in pages]
+        images = [img if img.mode in ('L', 'RGB') else img.convert('RGB') for img in images]
+        images[0].save(path, format='PDF', save_all=True, append_images=images[1:], quality=90)
+        for img in images:
+            img.close()
+
+    elif chapter_format == 'cbr':
+        if not rar_available():
+            raise RuntimeError("The 'rar' tool is required to generate CBR chapters")
+        work_dir = tempfile.mkdtemp()
+        try:
+            for filename, data in pages:
+                with open(os.path.join(work_dir, filename), 'wb') as f:
+                    f.write(data)
+            subprocess.run(
+                ['rar', 'a', '-ep1', '-idq', os.path.abspath(path), os.path.join(work_dir, '*')],
+                check=True,
+            )
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    else:
+        raise ValueError(f"Unknown chapter format: {chapter_format}")
+    return path
@@ -0,0 +1,535 @@
+"""
+Pillow helpers for page transcoding.
+
+This module must stay free of Django imports: its functions run inside the
+page transcoding process pool, whose spawned workers only import this file.
+"""
+import base64
+import math
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from io import BytesIO
+
+from PIL import Image, features
+
+# Default width ladder: the largest width is the main page image
+# (standard manga reader width), smaller ones are responsive derivatives.
+DEFAULT_WIDTHS = (480, 800, 1400)
+# JPEG quality giving ~200-400KB per page
+JPEG_QUALITY = 82
+
+# Encoder settings per output format: (Pillow format, quality, extra save options).
+# WebP/AVIF qualities are picked to look like JPEG at JPEG_QUALITY on manga pages.
+FORMATS = {
+    'jpeg': ('JPEG', JPEG_QUALITY, {'optimize': True}),
+    'webp': ('WEBP', 78, {'method': 4}),
+    'avif': ('AVIF', 55, {'speed': 6}),
+}
+# A source JPEG is kept as-is when its estimated quality is at most this much
+# above the target: re-encoding would only add generation loss.
+PASSTHROUGH_QUALITY_MARGIN = 5
+# Minimum decoded size, relative to the target width, when JPEG pages are
+# decoded at reduced DCT scale (same gap as Pillow's thumbnail): closer to 1.0
+# loses 2-3.5 dB PSNR on thin line art.
+DRAFT_OVERSAMPLING = 2.0
+# Grayscale detection: a page is B&W when at most GRAYSCALE_MAX_COLOUR_RATIO of
+# its (downsampled) pixels have a chroma deviation above GRAYSCALE_TOLERANCE.
+GRAYSCALE_SAMPLE_SIZE = (256, 256)
+GRAYSCALE_TOLERANCE = 6
+GRAYSCALE_MAX_COLOUR_RATIO = 0.005
+GRAYSCALE_MODES = ('1', 'L', 'LA', 'I', 'I;16', 'F')
+# Dominant colour (reader placeholder): most common of DOMINANT_COLORS
+# quantized colours of a sample of at most DOMINANT_SAMPLE_SIZE
+DOMINANT_SAMPLE_SIZE = (64, 64)
+DOMINANT_COLORS = 8
+# Low-quality image placeholder: a preview fitting in PLACEHOLDER_SIZE, inlined
+# as a WebP (JPEG without WebP support) data URI of a few hundred bytes
+PLACEHOLDER_SIZE = (20, 64)
+PLACEHOLDER_QUALITY = 40
+# Tall strips are cut into segments of the profile's 'segment_height'; the last
+# segment absorbs a remainder shorter than SEGMENT_MIN_TAIL x that height, so no
+# segment exceeds (1 + SEGMENT_MIN_TAIL) x segment_height.
+SEGMENT_MIN_TAIL = 0.5
+# Decoded pixels a page may have (after JPEG DCT scaling) unless the profile
+# sets 'max_pixels'. Pillow's own DecompressionBombError (2 x MAX_IMAGE_PIXELS)
+# still applies above that.
+DEFAULT_MAX_PIXELS = 100_000_000
+# Decoded images larger than this are converted and resized band by band, so
+# no full-size intermediate copy exists next to the decoded source.
+BAND_PIXELS = 16_000_000
+# IJG standard luminance quantization table (quality 50)
+_STD_LUMINANCE_TABLE = (
+    16, 11, 10, 16, 24, 40, 51, 61, 12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56, 14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77, 24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101, 72, 92, 95, 98, 112, 100, 103, 99,
+)
+
+FORMAT_EXTENSIONS = {'jpeg': '.jpg', 'webp': '.webp', 'avif': '.avif'}
+FORMAT_MIME_TYPES = {'jpeg': 'image/jpeg', 'webp': 'image/webp', 'avif': 'image/avif'}
+
+
+class ImageTooLarge(ValueError):
+    """A source image would decode to more pixels than the profile allows."""
+
+
+def supported_formats(formats):
+    """Keep only the extra formats this Pillow build can encode."""
+    return tuple(f for f in formats if f in FORMATS and f != 'jpeg' and features.check(f))
+
+
+def default_profile():
+    return {
+        'widths': DEFAULT_WIDTHS, 'quality': JPEG_QUALITY, 'formats': (), 'passthrough': True, 'grayscale': True,
+        'segment_height': 0, 'max_pixels': DEFAULT_MAX_PIXELS,
+    }
+
+
+def profile_key(profile):
+    """Short signature of what `transcode_page` produces for a profile."""
+    widths = '-'.join(str(w) for w in sorted(set(profile['widths'])))
+    formats = '+'.join(('jpeg',) + supported_formats(profile.get('formats', ())))
+    passthrough = '.pt' if profile.get('passthrough', True) else ''
+    grayscale = '.gray' if profile.get('grayscale', True) else ''
+    segments = f".seg{profile['segment_height']}" if profile.get('segment_height') else ''
+    return f"w{widths}.q{profile['quality']}.{formats}{passthrough}{grayscale}{segments}"
+
+
+def segment_bounds(height, segment_height):
+    """
+    (top, bottom) pixel rows of the segments a strip `height` px tall is cut
+    into, or [] when it stays a single image.
+    """
+    if not segment_height or height <= segment_height * (1 + SEGMENT_MIN_TAIL):
+        return []
+    count = -(-height // segment_height)
+    if height - (count - 1) * segment_height < segment_height * SEGMENT_MIN_TAIL:
+        count -= 1
+    tops = [i * segment_height for i in range(count)]
+    return list(zip(tops, tops[1:] + [height]))
+
+
+def open_image(source):
+    """
+    Open raw image bytes or a seekable binary stream; only the header is read.
+    Pillow's decompression bomb error is reported as ImageTooLarge.
+    """
+    fp = BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    try:
+        return Image.open(fp)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e)) from e
+
+
+def decoded_size(img, max_width):
+    """
+    Size an opened image will be decoded at for a `max_width` output: wide
+    JPEGs are set up for reduced DCT-scale decoding (see DRAFT_OVERSAMPLING).
+    """
+    if img.format == 'JPEG' and img.width > max_width:
+        draft_width = int(max_width * DRAFT_OVERSAMPLING)
+        img.draft(img.mode, (draft_width, max(1, img.height * draft_width // img.width)))
+    return img.size
+
+
+def check_pixel_budget(source, profile=None):
+    """
+    Raise ImageTooLarge when a source (bytes or stream) would decode to more
+    than the profile's 'max_pixels', from its header alone.
+    """
+    profile = profile or default_profile()
+    with open_image(source) as img:
+        width, height = decoded_size(img, max(profile['widths']))
+    max_pixels = profile.get('max_pixels') or DEFAULT_MAX_PIXELS
+    if width * height > max_pixels:
+        raise ImageTooLarge(f"{width}x{height} decoded pixels exceed the budget of {max_pixels}")
+
+
+def _color_mode_of(sample):
+    sample = sample.convert('RGB')
+    _y, cb, cr = sample.convert('YCbCr').split()
+    coloured = 0
+    for band in (cb, cr):
+        histogram = band.histogram()
+        coloured = max(
+            coloured,
+            sum(histogram[:128 - GRAYSCALE_TOLERANCE]) + sum(histogram[128 + GRAYSCALE_TOLERANCE + 1:]),
+        )
+    pixels = sample.width * sample.height
+    return 'gray' if coloured <= pixels * GRAYSCALE_MAX_COLOUR_RATIO else 'color'
+
+
+def detect_color_mode(image_data):
+    """
+    'gray' for effectively black-and-white pages, 'color' otherwise. Works on a
+    small copy (JPEGs are decoded at reduced DCT scale by thumbnail()).
+    """
+    with open_image(image_data) as sample:
+        if sample.mode in GRAYSCALE_MODES:
+            return 'gray'
+        sample.thumbnail(GRAYSCALE_SAMPLE_SIZE)
+        return _color_mode_of(sample)
+
+
+def _sample(img, size):
+    """Box-filtered copy of a decoded image fitting in `size`."""
+    ratio = max(img.width / size[0], img.height / size[1], 1)
+    return img.resize((max(1, round(img.width / ratio)), max(1, round(img.height / ratio))), Image.BOX)
+
+
+def placeholder_data_uri(img):
+    """Tiny inline preview of an image: 'data:image/webp;base64,...' (decodes it if needed)."""
+    sample = _sample(img, PLACEHOLDER_SIZE)
+    if sample.mode not in ('RGB', 'L'):
+        sample = sample.convert('RGB')
+    fmt = 'webp' if features.check('webp') else 'jpeg'
+    data = encode(sample, fmt, PLACEHOLDER_QUALITY)
+    return f"data:{FORMAT_MIME_TYPES[fmt]};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def placeholder_from_source(source):
+    """`placeholder_data_uri` of raw image bytes or a stream, decoded at reduced scale when possible."""
+    with open_image(source) as img:
+        img.draft('RGB', DOMINANT_SAMPLE_SIZE)
+        return placeholder_data_uri(img)
+
+
+def _decoded_color_mode(img):
+    """`detect_color_mode` of an already decoded image, without decoding it again."""
+    if img.mode in GRAYSCALE_MODES:
+        return 'gray'
+    return _color_mode_of(_sample(img, GRAYSCALE_SAMPLE_SIZE))
+
+
+def dominant_color(img):
+    """Most common colour of an image as '#rrggbb' (decodes it if needed)."""
+    sample = _sample(img, DOMINANT_SAMPLE_SIZE).convert('RGB').quantize(colors=DOMINANT_COLORS)
+    _count, index = max(sample.getcolors())
+    red, green, blue = sample.getpalette()[index * 3:index * 3 + 3]
+    return f"#{red:02x}{green:02x}{blue:02x}"
+
+
+def estimate_jpeg_quality(img):
+    """
+    Estimate the IJG quality a JPEG was saved with, from its luminance
+    quantization table (header only, no decoding). None if unknown.
+    """
+    tables = getattr(img, 'quantization', None)
+    if not tables or 0 not in tables or len(tables[0]) != 64:
+        return None
+    scale = sum(tables[0]) * 100 / sum(_STD_LUMINANCE_TABLE)
+    if scale <= 100:
+        quality = (200 - scale) / 2
+    else:
+        quality = 5000 / scale
+    return max(1, min(100, round(quality)))
+
+
+def can_pass_through(img, max_width, quality):
+    """
+    True when an opened (not yet decoded) image is a JPEG that already meets
+    the profile: RGB or grayscale, not wider than `max_width`, and not encoded
+    at a noticeably higher quality than the target.
+    """
+    if img.format != 'JPEG' or img.mode not in ('RGB', 'L') or img.width > max_width:
+        return False
+    estimated = estimate_jpeg_quality(img)
+    return estimated is not None and estimated <= quality + PASSTHROUGH_QUALITY_MARGIN
+
+
+def _resize_to_width(img, width):
+    ratio = width / img.width
+    new_height = max(1, int(img.height * ratio))
+    # Cheap box reduction first for large ratios, keeping at least 2x the target
+    # for the final LANCZOS pass (same quality, a fraction of the filter work)
+    factor = img.width // (width * 2)
+    if factor >= 2:
+        img = img.reduce(factor)
+    return img.resize((width, new_height), Image.LANCZOS)
+
+
+def _convert_and_resize_in_bands(img, mode, width):
+    """
+    Convert a decoded image to `mode` and scale it down to `width`, band by
+    band: next to the source and the output, only one band-sized copy exists
+    at a time. Bands overlap by the filter's support, so there are no seams.
+    """
+    out_width = min(width, img.width)
+    scale = out_width / img.width
+    out_height = max(1, int(img.height * scale))
+    output = Image.new(mode, (out_width, out_height))
+    out_band = max(1, int(BAND_PIXELS // img.width * scale))
+    # LANCZOS reads 3 output pixels around each row
+    margin = math.ceil(3 / scale) + 1
+    for out_top in range(0, out_height, out_band):
+        out_bottom = min(out_height, out_top + out_band)
+        src_top, src_bottom = out_top / scale, min(img.height, out_bottom / scale)
+        crop_top = max(0, math.floor(src_top) - margin)
+        crop_bottom = min(img.height, math.ceil(src_bottom) + margin)
+        band = img.crop((0, crop_top, img.width, crop_bottom))
+        if band.mode != mode:
+            band = band.convert(mode)
+        if out_width != img.width:
+            band = band.resize(
+                (out_width, out_bottom - out_top), Image.LANCZOS,
+                box=(0, src_top - crop_top, img.width, src_bottom - crop_top), reducing_gap=2.0,
+            )
+        else:
+            band = band.crop((0, out_top - crop_top, out_width, out_bottom - crop_top))
+        output.paste(band, (0, out_top))
+        band.close()
+    return output
+
+
+def encode(img, fmt='jpeg', quality=None):
+    """Encode an image in one of FORMATS and return the bytes."""
+    pil_format, default_quality, options = FORMATS[fmt]
+    buffer = BytesIO()
+    img.save(buffer, format=pil_format, quality=quality or default_quality, **options)
+    data = buffer.getvalue()
+    buffer.close()
+    return data
+
+
+def _add_timing(timings, stage, started):
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+
+def render_variants(img, widths, formats, quality=JPEG_QUALITY, main_jpeg=None, timings=None):
+    """
+    Encode the variants of an already-capped page image.
+
+    Returns a list of {'format', 'width', 'height', 'data'}: JPEGs for every
+    ladder width narrower than the image, and each extra format at those widths
+    plus the image's own width. An extra-format variant is dropped when it is
+    not smaller than the JPEG of the same width. Seconds spent resizing and
+    encoding are added to `timings` when given.
+    """
+    variants = []
+    rungs = [w for w in sorted(set(widths)) if w < img.width] + [img.width]
+    for width in rungs:
+        started = time.perf_counter()
+        resized = img if width == img.width else _resize_to_width(img, width)
+        _add_timing(timings, 'resize', started)
+        started = time.perf_counter()
+        if width == img.width:
+            jpeg = main_jpeg if main_jpeg is not None else encode(img, 'jpeg', quality)
+        else:
+            jpeg = encode(resized, 'jpeg', quality)
+            variants.append({'format': 'jpeg', 'width': resized.width, 'height': resized.height, 'data': jpeg})
+        for fmt in formats:
+            data = encode(resized, fmt)
+            if len(data) < len(jpeg):
+                variants.append({'format': fmt, 'width': resized.width, 'height': resized.height, 'data': data})
+        _add_timing(timings, 'encode', started)
+        if resized is not img:
+            resized.close()
+    return variants
+
+
+def transcode_page(image_data, profile=None):
+    """
+    Decode, resize and JPEG-encode a raw page image.
+
+    Returns a dict with the main JPEG ('data', 'width', 'height',
+    'dominant_color', 'placeholder') capped at the largest profile width, and 'derivatives': the smaller JPEG widths and the
+    extra-format variants from `render_variants`. JPEGs that already meet the
+    profile are kept byte for byte ('passthrough': True). 'timings' holds the
+    seconds spent per stage (decode, resize, encode) and 'peak_rss' the
+    process' peak memory. Raises on undecodable input, and ImageTooLarge
+    (before decoding) beyond the profile's 'max_pixels'.
+
+    With a profile 'segment_height', strips taller than that (after resizing)
+    are cut into 'segments': a list of {'data', 'width', 'height',
+    'dominant_color', 'placeholder', 'derivatives'} in reading order, the top-level image fields then being
+    those of the first segment.
+    """
+    profile = profile or default_profile()
+    widths = sorted(set(profile['widths']))
+    quality = profile['quality']
+    formats = supported_formats(profile.get('formats', ()))
+    timings = {'decode': 0.0, 'resize': 0.0, 'encode': 0.0}
+
+    started = time.perf_counter()
+    max_width = widths[-1]
+    img = open_image(image_data)
+    width, height = decoded_size(img, max_width)
+    max_pixels = profile.get('max_pixels') or DEFAULT_MAX_PIXELS
+    if width * height > max_pixels:
+        img.close()
+        raise ImageTooLarge(f"{width}x{height} decoded pixels exceed the budget of {max_pixels}")
+    # JPEG colour detection is cheap (DCT-scaled sample); other formats are
+    # checked on the decoded image instead of being decoded twice
+    color_mode = detect_color_mode(image_data) if img.format == 'JPEG' else None
+    # B&W pages are stored as single-channel JPEGs (smaller, cheaper to decode)
+    to_grayscale = profile.get('grayscale', True) and color_mode == 'gray'
+    _add_timing(timings, 'decode', started)
+
+    output_height = img.height if img.width <= max_width else max(1, img.height * max_width // img.width)
+    segmented = bool(segment_bounds(output_height, profile.get('segment_height', 0)))
+
+    if (
+        not segmented
+        and profile.get('passthrough', True)
+        and can_pass_through(img, widths[-1], quality)
+        and not (to_grayscale and img.mode != 'L')
+    ):
+        # Only the header has been read so far; pixels are decoded only if
+        # derivatives are needed.
+        if formats or any(w < img.width for w in widths[:-1]):
+            started = time.perf_counter()
+            img.load()
+            _add_timing(timings, 'decode', started)
+            color, placeholder = dominant_color(img), placeholder_data_uri(img)
+        else:
+            with open_image(image_data) as sample:
+                # DCT-scaled decode: colour and preview need a few pixels only
+                sample.draft(sample.mode, DOMINANT_SAMPLE_SIZE)
+                color, placeholder = dominant_color(sample), placeholder_data_uri(sample)
+        result = {
+            'data': image_data,
+            'width': img.width,
+            'height': img.height,
+            'color_mode': color_mode,
+            'dominant_color': color,
+            'placeholder': placeholder,
+            'passthrough': True,
+            'derivatives': render_variants(img, widths[:-1], formats, quality, main_jpeg=image_data, timings=timings),
+            'timings': timings,
+        }
+        img.close()
+        result['peak_rss'] = peak_rss_bytes()
+        return result
+
+    # Free the raw data immediately
+    del image_data
+
+    started = time.perf_counter()
+    # Wide JPEGs were set up by decoded_size() to decode at 1/2, 1/4 or 1/8
+    # scale (DCT domain) instead of decoding pixels we throw away
+    img.load()
+    if color_mode is None:
+        color_mode = _decoded_color_mode(img)
+        to_grayscale = profile.get('grayscale', True) and color_mode == 'gray'
+    _add_timing(timings, 'decode', started)
+
+    started = time.perf_counter()
+    # Convert to RGB if necessary (strips alpha channel, handles palette PNGs)
+    if to_grayscale:
+        mode = 'L'
+    elif img.mode in ('RGBA', 'P', 'LA'):
+        mode = 'RGB'
+    else:
+        mode = img.mode
+
+    if img.width * img.height > BAND_PIXELS and (mode != img.mode or img.width > max_width):
+        source, img = img, _convert_and_resize_in_bands(img, mode, max_width)
+        source.close()
+    else:
+        if mode != img.mode:
+            img = img.convert(mode)
+        # Resize: cap width at the top of the ladder
+        if img.width > max_width:
+            img = _resize_to_width(img, max_width)
+    _add_timing(timings, 'resize', started)
+
+    segments = []
+    # Each segment is a separate bitmap for the reader: first paint needs only
+    # the first one, and none exceeds mobile GPU texture limits.
+    for top, bottom in segment_bounds(img.height, profile.get('segment_height', 0)) or [(0, img.height)]:
+        tile = img if (top, bottom) == (0, img.height) else img.crop((0, top, img.width, bottom))
+        started = time.perf_counter()
+        main_jpeg = encode(tile, 'jpeg', quality)
+        _add_timing(timings, 'encode', started)
+        segments.append({
+            'data': main_jpeg,
+            'width': tile.width,
+            'height': tile.height,
+            'dominant_color': dominant_color(tile),
+            'placeholder': placeholder_data_uri(tile),
+            'derivatives': render_variants(tile, widths[:-1], formats, quality, main_jpeg=main_jpeg, timings=timings),
+        })
+        if tile is not img:
+            tile.close()
+
+    result = dict(segments[0], color_mode=color_mode, passthrough=False, timings=timings)
+    if len(segments) > 1:
+        result['segments'] = segments
+    img.close()
+    result['peak_rss'] = peak_rss_bytes()
+    return result
+
+
+# Process memory: transcoding pool workers live for one chapter, so their peak
+# is the chapter's; the ingesting process resets its own at the start.
+
+def reset_peak_rss():
+    """Reset this process' peak resident memory (Linux only); False if unsupported."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes():
+    """Peak resident memory of this process in bytes, or None if unknown."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+# Pool processes: spawned from the ingesting process, which is daemonic in a
+# Celery prefork worker. Defined here so the workers don't import Django.
+
+class _PoolProcess(multiprocessing.get_context('spawn').Process):
+    """Spawned process that may be started from a daemonic process."""
+
+    def start(self):
+        # multiprocessing refuses children to daemonic processes; the pool
+        # workers are daemonic themselves and exit with it (see watch_parent)
+        config = multiprocessing.current_process()._config
+        daemon = config.pop('daemon', None)
+        try:
+            super().start()
+        finally:
+            if daemon is not None:
+                config['daemon'] = daemon
+
+
+class _PoolContext(type(multiprocessing.get_context('spawn'))):
+    Process = _PoolProcess
+
+
+def pool_context():
+    """'spawn' multiprocessing context usable from Celery prefork children."""
+    return _PoolContext()
+
+
+def watch_parent(parent_pid):
+    """
+    Pool worker initializer: exit once the ingesting process is gone (e.g.
+    killed by the task's hard time limit) instead of lingering as an orphan.
+    """
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(1)
+
+    threading.Thread(target=watch, daemon=True).start()
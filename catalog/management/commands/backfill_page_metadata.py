@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from catalog.models import Page, Series, cover_placeholder
+from catalog.services import backfill_page_metadata
+
+class Command(BaseCommand):
+    help = 'Records the dimensions, byte size, dominant colour and placeholder of existing pages and covers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chapter', type=int, help='Only pages of this chapter ID')
+        parser.add_argument('--series', type=int, help='Only pages of this series ID')
+        parser.add_argument('--limit', type=int, help='Process at most N pages')
+
+    def handle(self, *args, **options):
+        missing = (
+            Q(width__isnull=True) | Q(height__isnull=True) | Q(file_size__isnull=True)
+            | Q(dominant_color='') | Q(placeholder='')
+        )
+        # The blob is loaded per page: it may have been filled by a previous page
+        pages = Page.objects.filter(missing).order_by('id')
+        covers = Series.objects.exclude(cover='').exclude(cover__isnull=True).filter(cover_placeholder='')
+
+        if options['chapter']:
+            pages = pages.filter(chapter_id=options['chapter'])
+            covers = covers.none()
+        if options['series']:
+            pages = pages.filter(chapter__series_id=options['series'])
+            covers = covers.filter(pk=options['series'])
+        if options['limit']:
+            pages = pages[:options['limit']]
+
+        processed = 0
+        failed = 0
+        for page in pages.iterator(chunk_size=200):
+            try:
+                backfill_page_metadata(page)
+                processed += 1
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"  FAILED: page {page.id} ({page}): {e}"))
+
+        cover_count = 0
+        for series in covers.iterator(chunk_size=200):
+            try:
+                series.cover.open('rb')
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"  FAILED: cover of {series} (ID: {series.id}): {e}"))
+                continue
+            try:
+                placeholder = cover_placeholder(series.cover)
+            finally:
+                series.cover.close()
+            if placeholder:
+                # update(): save() would also bump updated_at, the catalogue's ordering
+                Series.objects.filter(pk=series.pk).update(cover_placeholder=placeholder)
+                cover_count += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. {processed} pages updated, {failed} failed, {cover_count} cover placeholders."
+        ))
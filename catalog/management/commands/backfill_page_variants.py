@@ -0,0 +1,77 @@
+import hashlib
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from catalog.models import BackfillCursor, Page
+from catalog.services import generate_page_variants, get_page_profile
+from catalog.imaging import profile_key, supported_formats
+
+# Pages checked between two cursor saves
+CURSOR_STEP = 200
+
+class Command(BaseCommand):
+    help = 'Generates missing responsive widths and WebP/AVIF variants for existing pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chapter', type=int, help='Only pages of this chapter ID')
+        parser.add_argument('--series', type=int, help='Only pages of this series ID')
+        parser.add_argument('--formats', help='Comma-separated extra formats (default: PAGE_EXTRA_FORMATS)')
+        parser.add_argument('--limit', type=int, help='Process at most N pages')
+        parser.add_argument('--restart', action='store_true', help='Ignore the saved cursor and start over')
+
+    def handle(self, *args, **options):
+        profile = get_page_profile()
+        if options['formats']:
+            profile['formats'] = tuple(f.strip() for f in options['formats'].split(',') if f.strip())
+
+        formats = supported_formats(profile['formats'])
+        skipped = set(profile['formats']) - set(formats)
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"Unsupported by this Pillow build, skipped: {', '.join(sorted(skipped))}"))
+        profile['formats'] = formats
+
+        # Pages without derivatives at all, or missing one of the requested formats
+        missing = Q(derivatives__isnull=True)
+        for fmt in formats:
+            missing |= ~Q(derivatives__format=fmt)
+        pages = Page.objects.filter(missing).distinct().select_related('chapter__series').order_by('id')
+
+        # Some pages legitimately keep missing a variant (WebP not smaller than
+        # the JPEG, page narrower than every width) and still match: a cursor
+        # per profile and scope makes repeated runs move on instead of redoing them
+        scope = ''
+        if options['chapter']:
+            pages = pages.filter(chapter_id=options['chapter'])
+            scope += f":chapter{options['chapter']}"
+        if options['series']:
+            pages = pages.filter(chapter__series_id=options['series'])
+            scope += f":series{options['series']}"
+        key = hashlib.sha256(profile_key(profile).encode()).hexdigest()[:16]
+        cursor, _created = BackfillCursor.objects.get_or_create(name=f"backfill_page_variants:{key}{scope}")
+        position = 0 if options['restart'] else cursor.position
+        if position:
+            self.stdout.write(f"Resuming after page ID {position}")
+        pages = pages.filter(pk__gt=position)
+        if options['limit']:
+            pages = pages[:options['limit']]
+
+        processed = 0
+        created = 0
+        checked = 0
+        try:
+            for page in pages.iterator(chunk_size=200):
+                try:
+                    created += generate_page_variants(page, profile)
+                    processed += 1
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"  FAILED: page {page.id} ({page}): {e}"))
+                # Failed pages are reported and passed too (--restart checks them again)
+                position = page.id
+                checked += 1
+                if checked % CURSOR_STEP == 0:
+                    cursor.position = position
+                    cursor.save(update_fields=['position', 'updated_at'])
+        finally:
+            cursor.position = position
+            cursor.save(update_fields=['position', 'updated_at'])
+
+        self.stdout.write(self.style.SUCCESS(f"Done. {processed} pages processed, {created} variants created."))
@@ -0,0 +1,133 @@
+import json
+import os
+import resource
+import shutil
+import tempfile
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from catalog.benchmarks import CHAPTER_FORMATS, rar_available, synthetic_pages, write_chapter
+from catalog.models import Series, Chapter, PageBlob
+from catalog.services import FileProcessor
+
+STAGES = ('read', 'decode', 'resize', 'encode', 'store', 'db')
+
+EXTRACTORS = {
+    'cbz': '_extract_from_zip',
+    'epub': '_extract_from_zip',
+    'pdf': '_extract_from_pdf',
+    'cbr': '_extract_from_rar',
+}
+
+
+def _peak_rss_mb(who):
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks chapter ingestion on synthetic chapters (offline, local FileSystemStorage)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=30, help='Pages per chapter (default: 30)')
+        parser.add_argument('--width', type=int, default=1600, help='Source page width (default: 1600)')
+        parser.add_argument('--height', type=int, default=2400, help='Source page height (default: 2400)')
+        parser.add_argument('--mode', choices=['gray', 'color', 'mixed'], default='mixed',
+                            help='Page colours (default: mixed, one colour page in four)')
+        parser.add_argument('--page-format', choices=['JPEG', 'PNG'], default='JPEG',
+                            help='Format of the pages inside the archives (default: JPEG)')
+        parser.add_argument('--formats', default=','.join(CHAPTER_FORMATS),
+                            help='Comma-separated chapter formats (default: cbz,epub,pdf,cbr)')
+        parser.add_argument('--workers', type=int, help='Override PAGE_TRANSCODE_WORKERS')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+        parser.add_argument('--i-know', action='store_true',
+                            help='Run without DEBUG: a series, its pages and blobs are created in, then '
+                                 'deleted from, the configured database')
+
+    def handle(self, *args, **options):
+        # Files go to a throwaway local storage, but rows to the configured database
+        if not settings.DEBUG and not options['i_know']:
+            raise CommandError(
+                "benchmark_ingestion writes to and deletes from the configured database: "
+                "run it with DEBUG on a development database, or pass --i-know"
+            )
+        formats = [f.strip() for f in options['formats'].split(',') if f.strip()]
+        unknown = set(formats) - set(CHAPTER_FORMATS)
+        if unknown:
+            raise CommandError(f"Unknown formats: {', '.join(sorted(unknown))}")
+        if 'cbr' in formats and not rar_available():
+            self.stderr.write(self.style.WARNING("'rar' not found, skipping cbr"))
+            formats.remove('cbr')
+
+        work_dir = tempfile.mkdtemp(prefix='ingest-bench-')
+        media_dir = os.path.join(work_dir, 'media')
+        overrides = {
+            'MEDIA_ROOT': media_dir,
+            'STORAGES': {
+                'default': {
+                    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                    'OPTIONS': {'location': media_dir},
+                },
+                'staticfiles': {
+                    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+                },
+            },
+        }
+        if options['workers']:
+            overrides['PAGE_TRANSCODE_WORKERS'] = options['workers']
+
+        results = []
+        series = None
+        blob_ids = set(PageBlob.objects.values_list('id', flat=True))
+        try:
+            with override_settings(**overrides):
+                series = Series.objects.create(title=f"Benchmark {os.path.basename(work_dir)}")
+                for n, chapter_format in enumerate(formats):
+                    results.append(self._run(series, n, chapter_format, work_dir, options))
+        finally:
+            if series is not None:
+                series.delete()
+            # Blobs created by the run (distinct seeds per format: nothing else references them)
+            PageBlob.objects.filter(ref_count=0).exclude(id__in=blob_ids).delete()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            split = ', '.join(f"{stage} {result['stages'][stage]:.2f}s" for stage in STAGES)
+            self.stdout.write(
+                f"{result['format']:>5}: {result['pages']} pages in {result['seconds']:.2f}s "
+                f"({result['pages_per_second']:.1f} pages/s), "
+                f"peak RSS {result['peak_rss_mb']:.0f} MB (workers {result['peak_worker_rss_mb']:.0f} MB)"
+            )
+            self.stdout.write(f"       {split}")
+        self.stdout.write(self.style.SUCCESS("Done."))
+
+    def _run(self, series, n, chapter_format, work_dir, options):
+        path = os.path.join(work_dir, f"chapter_{n + 1}.{chapter_format}")
+        pages = synthetic_pages(
+            options['pages'], options['width'], options['height'], mode=options['mode'],
+            page_format=options['page_format'],
+            # Distinct content per format, so no run reuses another one's blobs
+            seed=n * options['pages'],
+        )
+        write_chapter(path, chapter_format, pages)
+
+        chapter = Chapter.objects.create(series=series, number=n + 1)
+        processor = FileProcessor()
+        started = time.perf_counter()
+        getattr(processor, EXTRACTORS[chapter_format])(chapter, path)
+        seconds = time.perf_counter() - started
+
+        saved = chapter.page_count
+        return {
+            'format': chapter_format,
+            'pages': saved,
+            'seconds': round(seconds, 3),
+            'pages_per_second': round(saved / seconds, 2) if seconds else 0,
+            'peak_rss_mb': round(_peak_rss_mb(resource.RUSAGE_SELF), 1),
+            'peak_worker_rss_mb': round(_peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+            'stages': {stage: round(processor.stage_timings.get(stage, 0.0), 3) for stage in STAGES},
+        }
@@ -1,45 +1,185 @@
-
+import hashlib
+import multiprocessing
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from django.core.management.base import BaseCommand
-from catalog.models import Chapter
-from catalog.services import FileProcessor
+from django.db.models import Exists, OuterRef, Q
+from catalog.models import BackfillCursor, Chapter, Page, Series
+from catalog.services import FileProcessor, get_page_profile, rebuild_chapter_source
+from catalog.imaging import profile_key
+
+
+def _init_worker():
+    import django
+    from django.conf import settings
+    django.setup()
+    # The command's processes are the parallelism: transcode pages in-process
+    settings.PAGE_TRANSCODE_WORKERS = 1
+
+
+def _process_chapter(chapter_id):
+    """
+    Re-extract one chapter; returns (chapter_id, success, page count). Chapters
+    whose source was deleted after ingestion are re-encoded from their stored pages.
+    """
+    chapter = Chapter.objects.select_related('series').get(pk=chapter_id)
+    if not chapter.source_file and not rebuild_chapter_source(chapter):
+        return chapter_id, False, 0
+    success = FileProcessor().process_chapter(chapter)
+    return chapter_id, success, chapter.page_count
+
 
 class Command(BaseCommand):
-    help = 'Extracts pages/images from chapter source files (PDF, CBZ, EPUB)'
+    help = 'Extracts pages/images from chapter source files (PDF, CBZ, EPUB), in parallel and resumably'
 
     def add_arguments(self, parser):
         parser.add_argument('--pk', type=int, help='Process a specific chapter by ID')
         parser.add_argument('--all', action='store_true', help='Process all chapters with source files')
-        parser.add_argument('--force', action='store_true', help='Reprocess chapters even if they have pages')
+        parser.add_argument('--force', action='store_true',
+                            help='Reprocess chapters even if they have pages (from the stored pages when the source is gone)')
+        parser.add_argument('--stale-profile', action='store_true',
+                            help='Also reprocess chapters whose pages were encoded with another image profile '
+                                 '(from the stored pages when the source is gone)')
+        parser.add_argument('--workers', type=int, default=1, help='Chapters processed in parallel (processes)')
+        parser.add_argument('--batch-size', type=int, default=20, help='Chapters per cursor step (default: 20)')
+        parser.add_argument('--limit', type=int, help='Process at most N chapters in this run')
+        parser.add_argument('--restart', action='store_true', help='Ignore the saved cursor and start over')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the chapters that would be processed')
 
     def handle(self, *args, **options):
-        processor = FileProcessor()
-        
-        chapters_query = Chapter.objects.exclude(source_file='')
-        
+        chapters_query = Chapter.objects.all()
+
         if options['pk']:
             chapters_query = chapters_query.filter(pk=options['pk'])
         elif not options['all']:
             self.stdout.write(self.style.WARNING("Please specify --pk or --all"))
             return
 
-        total = chapters_query.count()
-        self.stdout.write(f"Found {total} chapters to check...")
-        
-        processed_count = 0
-        
-        for chapter in chapters_query:
-            # Skip if already has pages, unless force
-            if chapter.pages.exists() and not options['force']:
-                self.stdout.write(f"Skipping Chapter #{chapter.number} (Pages exist)")
-                continue
-
-            self.stdout.write(f"Processing Chapter #{chapter.number} (ID: {chapter.id})...")
-            success = processor.process_chapter(chapter)
-            
-            if success:
-                processed_count += 1
-                self.stdout.write(self.style.SUCCESS(f"  SUCCESS: Extracted {chapter.pages.count()} pages."))
+        chapters_query, mode = self._select(chapters_query, options)
+
+        # Single chapter runs don't move the saved cursor
+        cursor = None
+        position = 0
+        if not options['pk']:
+            name = f"extract_pages:{mode}"
+            if options['dry_run']:
+                cursor = BackfillCursor.objects.filter(name=name).first()
             else:
-                self.stdout.write(self.style.ERROR(f"  FAILED: Could not process chapter."))
+                cursor, _created = BackfillCursor.objects.get_or_create(name=name)
+            if cursor is not None and not options['restart']:
+                position = cursor.position
+
+        total = chapters_query.filter(pk__gt=position).count()
+        if options['limit']:
+            total = min(total, options['limit'])
+        resume = f" (resuming after chapter ID {position})" if position else ""
+        self.stdout.write(f"Found {total} chapters to process{resume}...")
+
+        if options['dry_run']:
+            self._dry_run(chapters_query, position, total)
+            return
+
+        workers = max(1, options['workers'])
+        executor = None
+        if workers > 1:
+            # 'spawn': no forked DB connections or threads in the workers
+            executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+
+        started = time.perf_counter()
+        done = processed = pages = 0
+        failed = []
+        try:
+            for batch in self._batches(chapters_query, position, options['batch_size'], total):
+                results = executor.map(_process_chapter, batch) if executor else map(_process_chapter, batch)
+                for chapter_id, success, page_count in results:
+                    done += 1
+                    if success:
+                        processed += 1
+                        pages += page_count
+                    else:
+                        failed.append(chapter_id)
+                        self.stdout.write(self.style.ERROR(f"  FAILED: chapter {chapter_id}"))
+
+                # The whole batch is done: resume after it next time
+                if cursor is not None:
+                    cursor.position = batch[-1]
+                    cursor.save(update_fields=['position', 'updated_at'])
+                self._report(done, total, processed, pages, time.perf_counter() - started)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        # Complete pass: the next run in this mode starts over
+        if cursor is not None and not chapters_query.filter(pk__gt=cursor.position).exists():
+            cursor.delete()
+
+        if failed:
+            self.stdout.write(self.style.WARNING(f"Failed chapters: {', '.join(map(str, failed))}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Processed {processed} chapters ({len(failed)} failed), {pages} pages "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
+
+    def _select(self, chapters_query, options):
+        """
+        Apply the selection mode; returns (queryset, mode name used for the cursor).
+        Chapters without pages need their source file; the others can be
+        re-encoded from their stored pages.
+        """
+        has_source = ~Q(source_file='') & Q(source_file__isnull=False)
+        has_pages = Exists(Page.objects.filter(chapter=OuterRef('pk')))
+        if options['force']:
+            return chapters_query.filter(has_source | has_pages), 'force'
+
+        if not options['stale_profile']:
+            return chapters_query.filter(has_source & ~has_pages), 'missing'
+
+        # Profiles differ by series type (webtoons keep colour, long strips are segmented)
+        types_by_key = defaultdict(list)
+        for series_type, _label in Series.TYPE_CHOICES:
+            types_by_key[profile_key(get_page_profile(Series(type=series_type)))].append(series_type)
+
+        def _stale(key):
+            return Exists(Page.objects.filter(chapter=OuterRef('pk')).filter(Q(blob__isnull=True) | ~Q(blob__profile=key)))
+
+        stale = Q()
+        for key, types in types_by_key.items():
+            stale |= Q(series__type__in=types) & _stale(key)
+        # The cursor name follows the profiles, hashed to fit BackfillCursor.name
+        keys = hashlib.sha256(':'.join(sorted(types_by_key)).encode()).hexdigest()[:16]
+        return chapters_query.filter((has_source & ~has_pages) | stale), f"stale:{keys}"
+
+    @staticmethod
+    def _batches(chapters_query, position, batch_size, total):
+        """Keyset iteration over chapter IDs (no OFFSET, no long-lived cursor)."""
+        remaining = total
+        while remaining > 0:
+            batch = list(
+                chapters_query.filter(pk__gt=position).order_by('pk')
+                .values_list('pk', flat=True)[:min(batch_size, remaining)]
+            )
+            if not batch:
+                return
+            yield batch
+            position = batch[-1]
+            remaining -= len(batch)
+
+    def _dry_run(self, chapters_query, position, total):
+        listed = 0
+        for batch in self._batches(chapters_query, position, 200, total):
+            for chapter in Chapter.objects.filter(pk__in=batch).select_related('series').order_by('pk'):
+                self.stdout.write(f"  Chapter #{chapter.number} of {chapter.series.title} (ID: {chapter.id})")
+                listed += 1
+        self.stdout.write(self.style.WARNING(f"Dry run: {listed} chapters would be processed."))
 
-        self.stdout.write(self.style.SUCCESS(f"Done. Processed {processed_count} chapters."))
+    def _report(self, done, total, processed, pages, seconds):
+        rate = done / seconds if seconds else 0
+        eta = f", ETA {(total - done) / rate / 60:.1f} min" if rate and done < total else ""
+        self.stdout.write(
+            f"[{done}/{total}] {processed} ok, {pages} pages, "
+            f"{rate * 60:.1f} chapters/min, {pages / seconds if seconds else 0:.1f} pages/s{eta}"
+        )
@@ -0,0 +1,45 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+from django.db.models.deletion import ProtectedError
+from django.utils import timezone
+from catalog.models import PageBlob
+
+class Command(BaseCommand):
+    help = 'Deletes shared page images that no page references anymore'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=int, default=24,
+                            help='Keep unreferenced blobs this long so re-uploads can still reuse them (default: 24)')
+        parser.add_argument('--recount', action='store_true', help='Recompute reference counts from the pages first')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            fixed = 0
+            for blob in PageBlob.objects.annotate(actual=Count('pages')).iterator():
+                if blob.actual != blob.ref_count:
+                    PageBlob.objects.filter(pk=blob.pk).update(ref_count=blob.actual)
+                    fixed += 1
+            self.stdout.write(f"{fixed} reference counts fixed.")
+
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        unreferenced = PageBlob.objects.filter(ref_count=0).filter(
+            Q(released_at__lt=cutoff) | Q(released_at__isnull=True, created_at__lt=cutoff)
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"Dry run: {unreferenced.count()} blobs would be deleted."))
+            return
+
+        deleted = 0
+        for blob in unreferenced.iterator():
+            try:
+                # post_delete removes the files
+                blob.delete()
+                deleted += 1
+            except ProtectedError:
+                # Referenced again since the count was read (re-ingest in progress)
+                continue
+
+        self.stdout.write(self.style.SUCCESS(f"Done. {deleted} unreferenced blobs deleted."))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.10 on 2026-10-18 07:34
+
+import catalog.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_chapter_is_premium_series_nsfw'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Hauteur (px)'),
+        ),
+        migrations.AddField(
+            model_name='page',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Largeur (px)'),
+        ),
+        migrations.CreateModel(
+            name='PageDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('width', models.PositiveIntegerField(verbose_name='Largeur (px)')),
+                ('height', models.PositiveIntegerField(verbose_name='Hauteur (px)')),
+                ('image', models.ImageField(upload_to=catalog.models.page_derivative_upload_path, verbose_name='Image')),
+                ('page', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='derivatives', to='catalog.page', verbose_name='Page')),
+            ],
+            options={
+                'verbose_name': 'Déclinaison de page',
+                'verbose_name_plural': 'Déclinaisons de pages',
+                'ordering': ['page', 'width'],
+                'unique_together': {('page', 'width')},
+            },
+        ),
+    ]
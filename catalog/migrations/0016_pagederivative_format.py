@@ -0,0 +1,26 @@
+# Generated by Django 5.2.10 on 2026-10-18 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0015_page_derivatives'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='pagederivative',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='pagederivative',
+            name='format',
+            field=models.CharField(choices=[('jpeg', 'JPEG'), ('webp', 'WebP'), ('avif', 'AVIF')], default='jpeg', max_length=10, verbose_name='Format'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='pagederivative',
+            unique_together={('page', 'width', 'format')},
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.10 on 2026-10-18 07:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0016_pagederivative_format'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_hash', models.CharField(max_length=64, verbose_name='Empreinte de la source (SHA-256)')),
+                ('profile', models.CharField(max_length=100, verbose_name="Profil d'encodage")),
+                ('image', models.ImageField(upload_to='pages/', verbose_name='Image')),
+                ('width', models.PositiveIntegerField(blank=True, null=True, verbose_name='Largeur (px)')),
+                ('height', models.PositiveIntegerField(blank=True, null=True, verbose_name='Hauteur (px)')),
+                ('variants', models.JSONField(blank=True, default=list, verbose_name='Déclinaisons')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de références')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('released_at', models.DateTimeField(blank=True, null=True, verbose_name='Dernière libération')),
+            ],
+            options={
+                'verbose_name': 'Image de page partagée',
+                'verbose_name_plural': 'Images de pages partagées',
+                'unique_together': {('source_hash', 'profile')},
+            },
+        ),
+        migrations.AddField(
+            model_name='page',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='pages', to='catalog.pageblob', verbose_name='Image partagée'),
+        ),
+    ]
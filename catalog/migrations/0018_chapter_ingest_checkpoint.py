@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-18 07:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0017_page_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='ingest_checkpoint',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Dernière page importée'),
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='ingest_fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name="Empreinte de la source en cours d'import"),
+        ),
+    ]
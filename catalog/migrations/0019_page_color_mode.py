@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-18 07:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0018_chapter_ingest_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='color_mode',
+            field=models.CharField(blank=True, choices=[('gray', 'Noir et blanc'), ('color', 'Couleur')], max_length=5, verbose_name='Mode couleur'),
+        ),
+        migrations.AddField(
+            model_name='pageblob',
+            name='color_mode',
+            field=models.CharField(blank=True, choices=[('gray', 'Noir et blanc'), ('color', 'Couleur')], max_length=5, verbose_name='Mode couleur'),
+        ),
+    ]
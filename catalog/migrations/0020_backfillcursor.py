@@ -0,0 +1,26 @@
+# Generated by Django 5.2.10 on 2026-10-18 08:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0019_page_color_mode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackfillCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=150, unique=True, verbose_name='Nom')),
+                ('position', models.PositiveBigIntegerField(default=0, verbose_name='Dernier ID traité')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Mis à jour le')),
+            ],
+            options={
+                'verbose_name': 'Curseur de rattrapage',
+                'verbose_name_plural': 'Curseurs de rattrapage',
+            },
+        ),
+    ]
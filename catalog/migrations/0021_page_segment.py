@@ -0,0 +1,35 @@
+# Generated by Django 5.2.10 on 2026-10-18 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0020_backfillcursor'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='page',
+            options={'ordering': ['chapter', 'page_number', 'segment'], 'verbose_name': 'Page', 'verbose_name_plural': 'Pages'},
+        ),
+        migrations.AlterUniqueTogether(
+            name='page',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='page',
+            name='segment',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Segment'),
+        ),
+        migrations.AddField(
+            model_name='pageblob',
+            name='segment_count',
+            field=models.PositiveSmallIntegerField(default=1, verbose_name='Nombre de segments'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='page',
+            unique_together={('chapter', 'page_number', 'segment')},
+        ),
+    ]
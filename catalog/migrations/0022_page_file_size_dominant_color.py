@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-18 08:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0021_page_segment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='dominant_color',
+            field=models.CharField(blank=True, max_length=7, verbose_name='Couleur dominante'),
+        ),
+        migrations.AddField(
+            model_name='page',
+            name='file_size',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Taille (octets)'),
+        ),
+        migrations.AddField(
+            model_name='pageblob',
+            name='dominant_color',
+            field=models.CharField(blank=True, max_length=7, verbose_name='Couleur dominante'),
+        ),
+        migrations.AddField(
+            model_name='pageblob',
+            name='file_size',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Taille (octets)'),
+        ),
+    ]
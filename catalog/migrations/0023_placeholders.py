@@ -0,0 +1,28 @@
+# Generated by Django 5.2.10 on 2026-10-18 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0022_page_file_size_dominant_color'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='placeholder',
+            field=models.TextField(blank=True, verbose_name='Aperçu basse qualité'),
+        ),
+        migrations.AddField(
+            model_name='pageblob',
+            name='placeholder',
+            field=models.TextField(blank=True, verbose_name='Aperçu basse qualité'),
+        ),
+        migrations.AddField(
+            model_name='series',
+            name='cover_placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='Aperçu de la couverture'),
+        ),
+    ]
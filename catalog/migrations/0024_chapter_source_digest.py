@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0023_placeholders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='source_digest',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='Empreinte du fichier importé'),
+        ),
+    ]
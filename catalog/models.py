@@ -4,9 +4,13 @@ from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
+from django.utils import timezone
+import logging
 import os
 import shutil
 
+logger = logging.getLogger(__name__)
+
 def page_image_upload_path(instance, filename):
     """
     Génère un chemin logique pour les images de pages :
@@ -17,6 +21,53 @@ def page_image_upload_path(instance, filename):
     return f'scans_pages/{series_slug}/chapter_{chapter_num}/{filename}'
 
 
+def page_derivative_upload_path(instance, filename):
+    """
+    Chemin des déclinaisons responsives d'une page :
+    scans_pages/<series_slug>/chapter_<number>/w<width>/<filename>
+    """
+    series_slug = instance.page.chapter.series.slug
+    chapter_num = instance.page.chapter.number
+    return f'scans_pages/{series_slug}/chapter_{chapter_num}/w{instance.width}/{filename}'
+
+
+# Content-addressed page images are shared between pages: per-page delete
+# signals leave them alone, unreferenced blobs are removed by `gc_page_blobs`.
+PAGE_BLOB_PREFIX = 'pages/'
+
+
+def page_blob_path(key, suffix):
+    """
+    Chemin adressé par contenu d'une image de page partagée :
+    pages/<ab>/<cd>/<key><suffix>, où <key> est le hash de l'image source et du
+    profil d'encodage (ex. suffixe '.jpg', ou '/w480.webp' pour une déclinaison).
+    """
+    return f'{PAGE_BLOB_PREFIX}{key[:2]}/{key[2:4]}/{key}{suffix}'
+
+
+def is_page_blob_path(name):
+    return bool(name) and name.startswith(PAGE_BLOB_PREFIX)
+
+
+def cover_placeholder(cover):
+    """Aperçu inline (data URI) d'une couverture, ou '' si l'image est illisible."""
+    from .imaging import placeholder_from_source
+
+    try:
+        cover.seek(0)
+        return placeholder_from_source(cover)
+    except Exception as e:
+        logger.warning(f"Could not build the cover placeholder of {cover.name}: {e}")
+        return ''
+    finally:
+        cover.seek(0)
+
+
+# Detected colour mode of a page image (grayscale pages are stored as 1-channel JPEGs)
+COLOR_MODE_CHOICES = [
+    ('gray', 'Noir et blanc'),
+    ('color', 'Couleur'),
+]
 
 
 class Genre(models.Model):
@@ -57,6 +108,8 @@ class Series(models.Model):
     slug = models.SlugField(max_length=200, unique=True, blank=True)
     description = models.TextField(blank=True, verbose_name="Description")
     cover = models.ImageField(upload_to='covers/', blank=True, null=True, verbose_name="Couverture")
+    # Tiny inline preview of the cover (data URI), shown until the cover loads
+    cover_placeholder = models.TextField(blank=True, editable=False, verbose_name="Aperçu de la couverture")
     
     # Métadonnées
     type = models.CharField(max_length=20, choices=TYPE_CHOICES, default='manga', verbose_name="Type")
@@ -103,6 +156,11 @@ class Series(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        if not self.cover:
+            self.cover_placeholder = ''
+        elif not self.cover._committed:
+            # New cover upload: preview it before it is stored
+            self.cover_placeholder = cover_placeholder(self.cover)
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -132,6 +190,14 @@ class Chapter(models.Model):
     title = models.CharField(max_length=200, blank=True, verbose_name="Titre")
     source_file = models.FileField(upload_to='scans/', blank=True, null=True, verbose_name="Fichier Source")
     is_premium = models.BooleanField(default=False, verbose_name="Chapitre Premium")
+
+    # Ingestion checkpoint: set while pages are being extracted, cleared once done.
+    # A retry on the same source file resumes after the last committed page.
+    ingest_fingerprint = models.CharField(max_length=64, blank=True, default='', editable=False, verbose_name="Empreinte de la source en cours d'import")
+    ingest_checkpoint = models.PositiveIntegerField(default=0, editable=False, verbose_name="Dernière page importée")
+    # Whole-file digest of the chunked upload the pages come from: re-uploading
+    # the same file is skipped (see FileProcessor._ingest)
+    source_digest = models.CharField(max_length=64, blank=True, default='', editable=False, verbose_name="Empreinte du fichier importé")
     
     created_at = models.DateTimeField(auto_now_add=True)
     @property
@@ -139,6 +205,11 @@ class Chapter(models.Model):
         """Checks if the source file is a PDF."""
         return self.source_file and self.source_file.name.lower().endswith('.pdf')
 
+    @property
+    def page_count(self):
+        """Nombre de pages logiques (les segments d'une même page comptent pour une)."""
+        return self.pages.filter(segment=0).count()
+
     def __str__(self):
         return f"{self.series.title} - Chapitre {self.number}"
     
@@ -149,6 +220,39 @@ class Chapter(models.Model):
         unique_together = ['series', 'number']
 
 
+class PageBlob(models.Model):
+    """
+    Image de page déjà encodée (et ses déclinaisons), stockée une seule fois sous
+    le hash de son contenu et partagée par toutes les pages issues de la même
+    image source avec le même profil d'encodage.
+    """
+    source_hash = models.CharField(max_length=64, verbose_name="Empreinte de la source (SHA-256)")
+    profile = models.CharField(max_length=100, verbose_name="Profil d'encodage")
+    image = models.ImageField(upload_to=PAGE_BLOB_PREFIX, verbose_name="Image")
+    width = models.PositiveIntegerField(null=True, blank=True, verbose_name="Largeur (px)")
+    height = models.PositiveIntegerField(null=True, blank=True, verbose_name="Hauteur (px)")
+    color_mode = models.CharField(max_length=5, choices=COLOR_MODE_CHOICES, blank=True, verbose_name="Mode couleur")
+    file_size = models.PositiveIntegerField(null=True, blank=True, verbose_name="Taille (octets)")
+    dominant_color = models.CharField(max_length=7, blank=True, verbose_name="Couleur dominante")
+    placeholder = models.TextField(blank=True, verbose_name="Aperçu basse qualité")
+    # [{'format', 'width', 'height', 'name'}, ...] for the PageDerivative rows of referencing pages
+    variants = models.JSONField(default=list, blank=True, verbose_name="Déclinaisons")
+    ref_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de références")
+    # Tall strips are cut into segments: the first segment's blob records how
+    # many there are (the others are keyed by `segment_source_hash`)
+    segment_count = models.PositiveSmallIntegerField(default=1, verbose_name="Nombre de segments")
+    created_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(null=True, blank=True, verbose_name="Dernière libération")
+
+    def __str__(self):
+        return f"{self.source_hash[:12]} ({self.profile}, {self.ref_count} réf.)"
+
+    class Meta:
+        verbose_name = "Image de page partagée"
+        verbose_name_plural = "Images de pages partagées"
+        unique_together = ['source_hash', 'profile']
+
+
 class Page(models.Model):
     """
     Représente une page d'un chapitre.
@@ -160,21 +264,127 @@ class Page(models.Model):
         verbose_name="Chapitre"
     )
     page_number = models.PositiveIntegerField(verbose_name="Numéro de page")
+    # A very tall strip (webtoon) is stored as consecutive segments of the same
+    # page, rendered back to back by the reader
+    segment = models.PositiveSmallIntegerField(default=0, verbose_name="Segment")
     image = models.ImageField(
         upload_to=page_image_upload_path,
         verbose_name="Image"
     )
+    width = models.PositiveIntegerField(null=True, blank=True, verbose_name="Largeur (px)")
+    height = models.PositiveIntegerField(null=True, blank=True, verbose_name="Hauteur (px)")
+    color_mode = models.CharField(max_length=5, choices=COLOR_MODE_CHOICES, blank=True, verbose_name="Mode couleur")
+    # Known before the image loads: the reader reserves the page's space and
+    # paints this colour as its placeholder
+    file_size = models.PositiveIntegerField(null=True, blank=True, verbose_name="Taille (octets)")
+    dominant_color = models.CharField(max_length=7, blank=True, verbose_name="Couleur dominante")
+    # Tiny inline preview (data URI) shown under the page while it downloads
+    placeholder = models.TextField(blank=True, verbose_name="Aperçu basse qualité")
+    blob = models.ForeignKey(
+        PageBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='pages',
+        verbose_name="Image partagée"
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
+        if self.segment:
+            return f"{self.chapter} - Page {self.page_number} ({self.segment + 1})"
         return f"{self.chapter} - Page {self.page_number}"
+
+    def _derivatives_of(self, fmt):
+        return sorted((d for d in self.derivatives.all() if d.format == fmt), key=lambda d: d.width)
+
+    @property
+    def srcset(self):
+        """
+        Valeur `srcset` JPEG (déclinaisons + image principale), ou '' si la page
+        n'a pas de déclinaisons. Utiliser prefetch_related('derivatives').
+        """
+        derivatives = self._derivatives_of('jpeg')
+        if not derivatives or not self.width:
+            return ''
+        candidates = [f"{d.image.url} {d.width}w" for d in derivatives]
+        candidates.append(f"{self.image.url} {self.width}w")
+        return ', '.join(candidates)
+
+    @property
+    def sources(self):
+        """
+        Sources `<picture>` des formats plus légers que le JPEG, du plus compact
+        au moins compact : liste de {'type', 'srcset'}. Un format n'est proposé
+        que s'il existe en pleine largeur, sinon les grands écrans recevraient
+        une image trop petite.
+        """
+        sources = []
+        for fmt, mime_type in (('avif', 'image/avif'), ('webp', 'image/webp')):
+            derivatives = self._derivatives_of(fmt)
+            if derivatives and derivatives[-1].width == self.width:
+                srcset = ', '.join(f"{d.image.url} {d.width}w" for d in derivatives)
+                sources.append({'type': mime_type, 'srcset': srcset})
+        return sources
     
     class Meta:
         verbose_name = "Page"
         verbose_name_plural = "Pages"
-        ordering = ['chapter', 'page_number']
-        unique_together = ['chapter', 'page_number']
+        ordering = ['chapter', 'page_number', 'segment']
+        unique_together = ['chapter', 'page_number', 'segment']
+
+
+class PageDerivative(models.Model):
+    """
+    Déclinaison d'une page : largeur plus petite que l'image principale (servie via
+    `srcset` aux écrans étroits) et/ou format plus léger (WebP/AVIF via `<picture>`).
+    """
+    FORMAT_CHOICES = [
+        ('jpeg', 'JPEG'),
+        ('webp', 'WebP'),
+        ('avif', 'AVIF'),
+    ]
+
+    page = models.ForeignKey(
+        Page,
+        on_delete=models.CASCADE,
+        related_name='derivatives',
+        verbose_name="Page"
+    )
+    width = models.PositiveIntegerField(verbose_name="Largeur (px)")
+    height = models.PositiveIntegerField(verbose_name="Hauteur (px)")
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='jpeg', verbose_name="Format")
+    image = models.ImageField(
+        upload_to=page_derivative_upload_path,
+        verbose_name="Image"
+    )
+
+    def __str__(self):
+        return f"{self.page} - {self.width}px ({self.format})"
+
+    class Meta:
+        verbose_name = "Déclinaison de page"
+        verbose_name_plural = "Déclinaisons de pages"
+        ordering = ['page', 'width']
+        unique_together = ['page', 'width', 'format']
+
+
+class BackfillCursor(models.Model):
+    """
+    Position d'une commande de rattrapage (dernier ID traité), pour reprendre
+    là où un passage précédent s'est arrêté.
+    """
+    name = models.CharField(max_length=150, unique=True, verbose_name="Nom")
+    position = models.PositiveBigIntegerField(default=0, verbose_name="Dernier ID traité")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Mis à jour le")
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+    class Meta:
+        verbose_name = "Curseur de rattrapage"
+        verbose_name_plural = "Curseurs de rattrapage"
 
 
 class Favorite(models.Model):
@@ -239,12 +449,39 @@ def auto_delete_chapter_assets_on_delete(sender, instance, **kwargs):
 @receiver(post_delete, sender=Page)
 def auto_delete_page_image_on_delete(sender, instance, **kwargs):
     """Deletes the specific page image file, directory cleanup handled by Chapter/Series delete."""
-    if instance.image:
+    if instance.blob_id:
+        # Shared image: release the reference, the file is kept for re-ingests
+        PageBlob.objects.filter(pk=instance.blob_id, ref_count__gt=0).update(
+            ref_count=models.F('ref_count') - 1,
+            released_at=timezone.now(),
+        )
+        return
+    if instance.image and not is_page_blob_path(instance.image.name):
         try:
             instance.image.delete(save=False)
         except Exception:
             pass
 
+@receiver(post_delete, sender=PageDerivative)
+def auto_delete_page_derivative_on_delete(sender, instance, **kwargs):
+    """Deletes the resized image file of a page derivative."""
+    if instance.image and not is_page_blob_path(instance.image.name):
+        try:
+            instance.image.delete(save=False)
+        except Exception:
+            pass
+
+@receiver(post_delete, sender=PageBlob)
+def auto_delete_page_blob_files_on_delete(sender, instance, **kwargs):
+    """Deletes the shared image and its variants once the blob itself is deleted."""
+    storage = instance.image.storage
+    for name in [instance.image.name] + [v.get('name') for v in instance.variants]:
+        if name:
+            try:
+                storage.delete(name)
+            except Exception:
+                pass
+
 
 class Review(models.Model):
     """
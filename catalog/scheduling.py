@@ -0,0 +1,183 @@
+"""
+Fair-share dispatch of bulk chapter uploads.
+
+Bulk uploads are not sent to the broker all at once: their chapters wait in
+the database ('queued') and are dispatched a few at a time, round-robin across
+uploading admins first, then across series, so one 300-chapter import cannot
+starve the other uploaders. A bulk job keeps at most
+INGESTION_MAX_IN_FLIGHT_PER_JOB chapters in flight (INGESTION_MAX_IN_FLIGHT
+overall) and every finished chapter dispatches the next ones. A chapter in
+flight without progress for INGESTION_LEASE_SECONDS lost its task and is
+failed; a periodic dispatch (CELERY_BEAT_SCHEDULE) restarts a stalled queue.
+"""
+import logging
+import math
+import threading
+import uuid
+from collections import Counter, defaultdict, deque
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+IN_FLIGHT_STATUSES = ('dispatched', 'processing')
+
+_dispatching = threading.local()
+
+
+def enqueue_bulk_uploads(series_id, upload_ids):
+    """Queue the uploads of one bulk job; returns the job id."""
+    from administration.models import ChunkedUpload
+
+    job = uuid.uuid4()
+    now = timezone.now()
+    ChunkedUpload.objects.filter(upload_id__in=upload_ids).update(
+        status='queued', series_id=series_id, bulk_job=job, queued_at=now, updated_at=now,
+    )
+    return job
+
+
+def _fair_order(queued, user_load, series_load, job_room=None):
+    """
+    Yield queued uploads in fair-share order: the uploader with the fewest
+    chapters in flight goes first, then the series with the fewest, then the
+    oldest job. Each yielded upload counts as in flight for the next picks.
+    `job_room` caps the uploads yielded per job.
+    """
+    jobs = defaultdict(deque)
+    for upload in queued:
+        jobs[upload.bulk_job].append(upload)
+    if job_room is not None:
+        jobs = {job: uploads for job, uploads in jobs.items() if job_room[job] > 0}
+
+    while jobs:
+        job = min(jobs, key=lambda j: (
+            user_load[jobs[j][0].user_id], series_load[jobs[j][0].series_id],
+            jobs[j][0].queued_at, jobs[j][0].pk,
+        ))
+        upload = jobs[job].popleft()
+        user_load[upload.user_id] += 1
+        series_load[upload.series_id] += 1
+        if job_room is not None:
+            job_room[job] -= 1
+        if not jobs[job] or (job_room is not None and job_room[job] <= 0):
+            del jobs[job]
+        yield upload
+
+
+def _loads():
+    from administration.models import ChunkedUpload
+
+    in_flight = list(
+        ChunkedUpload.objects.filter(bulk_job__isnull=False, status__in=IN_FLIGHT_STATUSES)
+        .values_list('user_id', 'series_id', 'bulk_job')
+    )
+    return (
+        len(in_flight),
+        Counter(user_id for user_id, _series_id, _job in in_flight),
+        Counter(series_id for _user_id, series_id, _job in in_flight),
+        Counter(job for _user_id, _series_id, job in in_flight),
+    )
+
+
+def _expire_leases():
+    """Fail the bulk chapters in flight whose task died without releasing its slot."""
+    from administration.models import ChunkedUpload
+
+    now = timezone.now()
+    lost = ChunkedUpload.objects.filter(
+        bulk_job__isnull=False, status__in=IN_FLIGHT_STATUSES,
+        updated_at__lt=now - timezone.timedelta(seconds=settings.INGESTION_LEASE_SECONDS),
+    )
+    expired = lost.update(status='failed', updated_at=now)
+    if expired:
+        logger.warning(f"Bulk dispatch: {expired} chapter(s) in flight past their lease marked failed")
+    return expired
+
+
+def _queued():
+    from administration.models import ChunkedUpload
+
+    return ChunkedUpload.objects.filter(status='queued').order_by('queued_at', 'pk')
+
+
+def _dispatch_once():
+    from administration.models import ChunkedUpload
+    from catalog.tasks import task_process_chapter, ingestion_options, assembled_upload_path
+
+    _expire_leases()
+    total, user_load, series_load, job_load = _loads()
+    capacity = settings.INGESTION_MAX_IN_FLIGHT - total
+    if capacity <= 0:
+        return 0
+
+    per_job = settings.INGESTION_MAX_IN_FLIGHT_PER_JOB
+    job_room = defaultdict(lambda: per_job)
+    job_room.update({job: per_job - count for job, count in job_load.items()})
+
+    dispatched = 0
+    for upload in _fair_order(_queued(), user_load, series_load, job_room):
+        if dispatched >= capacity:
+            break
+        # Claim the row: a concurrent dispatcher skips the uploads already taken
+        if not ChunkedUpload.objects.filter(pk=upload.pk, status='queued').update(status='dispatched', updated_at=timezone.now()):
+            continue
+        temp_path = assembled_upload_path(upload)
+        if temp_path is None:
+            logger.error(f"Bulk process: temp file not found for upload {upload.upload_id}")
+            ChunkedUpload.objects.filter(pk=upload.pk).update(status='failed', updated_at=timezone.now())
+            continue
+        dispatched += 1
+        task_process_chapter.apply_async(
+            (upload.series_id, str(upload.upload_id), temp_path), {'interactive': False},
+            **ingestion_options(False)
+        )
+    return dispatched
+
+
+def dispatch_queued_uploads():
+    """
+    Dispatch queued bulk chapters up to the in-flight caps; returns how many
+    were sent. With eager Celery, dispatched chapters run (and finish) inside
+    this call: their own dispatch requests make the running loop go again
+    instead of recursing.
+    """
+    if getattr(_dispatching, 'active', False):
+        _dispatching.again = True
+        return 0
+    _dispatching.active = True
+    try:
+        dispatched = 0
+        while True:
+            _dispatching.again = False
+            dispatched += _dispatch_once()
+            if not _dispatching.again:
+                return dispatched
+    finally:
+        _dispatching.active = False
+
+
+def queue_positions():
+    """Map upload_id -> 1-based dispatch position of every queued upload."""
+    _total, user_load, series_load, _job_load = _loads()
+    return {
+        upload.upload_id: position
+        for position, upload in enumerate(_fair_order(_queued(), user_load, series_load), 1)
+    }
+
+
+def estimate_wait_seconds(position, sample_size=50):
+    """
+    Rough wait before the upload at `position` starts, from the average
+    extraction time of recent chapters; None without history.
+    """
+    from administration.models import ChunkedUpload
+
+    recent = ChunkedUpload.objects.filter(status='completed').exclude(ingest_metrics={}) \
+        .order_by('-created_at').values_list('ingest_metrics', flat=True)[:sample_size]
+    seconds = [metrics['seconds'] for metrics in recent if metrics.get('seconds')]
+    if not seconds:
+        return None
+    waves = math.ceil(position / max(1, settings.INGESTION_MAX_IN_FLIGHT))
+    return round(waves * sum(seconds) / len(seconds))
@@ -1,15 +1,23 @@
 import os
-import zipfile
 import shutil
 import tempfile
 import logging
-from io import BytesIO
+import multiprocessing
+import threading
+import hashlib
+import json
+import time
+from contextlib import closing
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 
 from django.core.files.base import ContentFile
 from django.conf import settings
-from PIL import Image
-import pypdf
+from django.db import transaction, close_old_connections
+from django.db.models import F, Max
+from django.utils import timezone
 
 # Try to import requests for downloading files if needed
 try:
@@ -17,37 +25,28 @@ try:
 except ImportError:
     requests = None
 
-try:
-    import rarfile
-    # Configure rarfile to find UnRAR.exe on Windows
-    import platform
-    if platform.system() == 'Windows':
-        _unrar_paths = [
-            r'C:\Program Files\WinRAR\UnRAR.exe',
-            r'C:\Program Files (x86)\WinRAR\UnRAR.exe',
-        ]
-        for _p in _unrar_paths:
-            if os.path.exists(_p):
-                rarfile.UNRAR_TOOL = _p
-                break
-    HAS_RARFILE = True
-except ImportError:
-    HAS_RARFILE = False
-
-from .models import Page, Chapter, Series
+from .models import Page, PageBlob, PageDerivative, Chapter, Series, page_blob_path, is_page_blob_path
 from .utils import extract_chapter_number
+from .imaging import (
+    transcode_page, render_variants, supported_formats, profile_key, check_pixel_budget,
+    dominant_color, placeholder_data_uri, peak_rss_bytes, reset_peak_rss, pool_context, watch_parent, ImageTooLarge,
+    DEFAULT_WIDTHS, JPEG_QUALITY, FORMAT_EXTENSIONS, DEFAULT_MAX_PIXELS, DOMINANT_SAMPLE_SIZE,
+)
+from .archives import (
+    HAS_RARFILE, rarfile, ZipPageSource, RarPageSource, PdfPageSource,
+    prefetch, source_fingerprint, open_page_source, open_source_file,
+)
 
 logger = logging.getLogger(__name__)
+metrics_logger = logging.getLogger('catalog.metrics')
 
-def process_single_chapter_from_temp(series_id, temp_file_path, upload_id=None):
+def get_chapter_for_file(series, filename):
     """
-    Processes a single chapter file from temp_uploads and links it to a series.
-    Returns the Chapter object.
+    Get or create the chapter of `series` numbered after `filename`.
+    Raises ValueError when no chapter number can be extracted.
     """
-    series = Series.objects.get(id=series_id)
-    filename = os.path.basename(temp_file_path)
     chapter_num = extract_chapter_number(filename)
-    
+
     if chapter_num is None:
         raise ValueError(f"Impossible d'extraire le numéro de chapitre du fichier : {filename}")
 
@@ -77,6 +76,15 @@ def process_single_chapter_from_temp(series_id, temp_file_path, upload_id=None):
                 counter += 1
             else:
                 raise
+    return chapter
+
+def process_single_chapter_from_temp(series_id, temp_file_path, upload_id=None):
+    """
+    Processes a single chapter file from temp_uploads and links it to a series.
+    Returns the Chapter object.
+    """
+    series = Series.objects.get(id=series_id)
+    chapter = get_chapter_for_file(series, os.path.basename(temp_file_path))
 
     # Optimized Pipeline: Process DIRECTLY from the temp path to avoid double/triple I/O writes
     processor = FileProcessor(upload_id=upload_id)
@@ -84,6 +92,111 @@ def process_single_chapter_from_temp(series_id, temp_file_path, upload_id=None):
     
     return chapter
 
+# Archives whose pages can be read independently by range. Solid RAR archives
+# would be decompressed in full by every range task, so CBR stays single-task.
+FANOUT_EXTENSIONS = ('.cbz', '.zip', '.epub', '.pdf')
+
+def plan_page_ranges(temp_file_path):
+    """
+    Split a chapter file into [(start, stop)] page ranges for parallel
+    ingestion, or return None when it stays a single task: fan-out disabled
+    (PAGE_FANOUT_THRESHOLD = 0), unsupported format, or fewer pages than the threshold.
+    """
+    threshold = getattr(settings, 'PAGE_FANOUT_THRESHOLD', 0)
+    if not threshold or os.path.splitext(temp_file_path)[1].lower() not in FANOUT_EXTENSIONS:
+        return None
+    with closing(open_page_source(temp_file_path)) as source:
+        total = len(source)
+    if total < threshold:
+        return None
+    size = max(1, getattr(settings, 'PAGE_FANOUT_RANGE_SIZE', 50))
+    return [(start, min(start + size, total)) for start in range(0, total, size)]
+
+def prepare_fanout_chapter(series_id, temp_file_path, upload_id, total):
+    """
+    Create (or reset) the chapter of a fanned-out upload before its range
+    tasks run: previous pages are removed and the progress counters reset.
+    """
+    from administration.models import ChunkedUpload
+
+    series = Series.objects.get(id=series_id)
+    chapter = get_chapter_for_file(series, os.path.basename(temp_file_path))
+    chapter.pages.all().delete()
+    # Range tasks do not use the single-task checkpoint
+    Chapter.objects.filter(pk=chapter.pk).update(ingest_fingerprint='', ingest_checkpoint=0, source_digest='')
+    if upload_id:
+        ChunkedUpload.objects.filter(upload_id=upload_id).update(
+            total_files_to_process=total, processed_files=0, ingest_metrics={},
+        )
+    return chapter
+
+def merge_ingest_metrics(range_metrics, seconds):
+    """
+    Combine the metrics of a chapter's range tasks: counters and stage times
+    are summed, throughput is computed on the fan-out's wall time and the
+    peak memory is the largest of the ranges'.
+    """
+    merged, stages = Counter(), Counter()
+    peak_rss = 0
+    for metrics in range_metrics:
+        stages.update(metrics.get('stages', {}))
+        merged.update({
+            key: value for key, value in metrics.items()
+            if key not in ('chapter_id', 'seconds', 'pages_per_second', 'stages', 'peak_rss_bytes')
+        })
+        peak_rss = max(peak_rss, metrics.get('peak_rss_bytes') or 0)
+    return {
+        'chapter_id': range_metrics[0]['chapter_id'] if range_metrics else None,
+        'seconds': round(seconds, 3),
+        'pages_per_second': round(merged['pages_saved'] / seconds, 2) if seconds else 0,
+        **merged,
+        # Ranges run in separate processes: the worst one is the chapter's peak
+        'peak_rss_bytes': peak_rss or None,
+        'ranges': len(range_metrics),
+        'stages': {stage: round(value, 3) for stage, value in stages.items()},
+    }
+
+def finalize_fanout_chapter(chapter_id, upload_id, range_metrics, seconds):
+    """
+    Check a fanned-out chapter once all its ranges ran: page numbers must be
+    contiguous (unreadable pages leave gaps, like single-task ingestion, and
+    are reported), the series' chapter count is refreshed, the upload's digest
+    recorded on the chapter (unchanged re-uploads are skipped, like after a
+    single-task ingestion) and the merged metrics are stored on the upload.
+    Returns (chapter, missing page numbers).
+    """
+    from administration.models import ChunkedUpload
+
+    chapter = Chapter.objects.select_related('series').get(pk=chapter_id)
+    upload_digest = ''
+    if upload_id:
+        upload_digest = ChunkedUpload.objects.filter(upload_id=upload_id).values_list('file_digest', flat=True).first() or ''
+    if upload_digest and chapter.pages.exists():
+        chapter.source_digest = upload_digest
+        Chapter.objects.filter(pk=chapter.pk).update(source_digest=upload_digest)
+    numbers = set(chapter.pages.values_list('page_number', flat=True))
+    total = max(numbers, default=0)
+    if range_metrics:
+        total = max(total, sum(metrics.get('pages_total', 0) for metrics in range_metrics))
+    missing = sorted(set(range(1, total + 1)) - numbers)
+    if missing:
+        logger.warning(f"{chapter}: {len(missing)} missing pages after fan-out: {missing[:20]}")
+
+    series = chapter.series
+    series.chapters_count = series.chapters.count()
+    series.save(update_fields=['chapters_count'])
+
+    metrics = merge_ingest_metrics(range_metrics, seconds)
+    metrics['pages_missing'] = len(missing)
+    if upload_id:
+        ChunkedUpload.objects.filter(upload_id=upload_id).update(ingest_metrics=metrics)
+    metrics_logger.info(json.dumps({
+        'event': 'chapter_ingested',
+        'upload_id': str(upload_id) if upload_id else None,
+        **metrics,
+    }))
+    return chapter, missing
+
 def bulk_create_chapters_from_folder(series, files):
     """
     Takes a list of uploaded files (from request.FILES.getlist),
@@ -126,10 +239,607 @@ def bulk_create_chapters_from_folder(series, files):
                 
     return processed_count
 
+# Series types whose long strips are cut into segments (PAGE_SEGMENT_HEIGHT)
+SEGMENTED_SERIES_TYPES = ('webtoon', 'manhwa')
+
+
+def get_page_profile(series=None):
+    """
+    Image profile handed to `transcode_page`, built from settings.
+    Webtoons keep RGB even for B&W strips (grayscale encoding off); webtoon
+    and manhwa strips taller than PAGE_SEGMENT_HEIGHT are split into segments.
+    """
+    segmented = series is not None and series.type in SEGMENTED_SERIES_TYPES
+    return {
+        'widths': tuple(getattr(settings, 'PAGE_IMAGE_WIDTHS', DEFAULT_WIDTHS)),
+        'quality': getattr(settings, 'PAGE_JPEG_QUALITY', JPEG_QUALITY),
+        'formats': tuple(getattr(settings, 'PAGE_EXTRA_FORMATS', ())),
+        'passthrough': getattr(settings, 'PAGE_JPEG_PASSTHROUGH', True),
+        'grayscale': getattr(settings, 'PAGE_GRAYSCALE_ENCODING', True)
+                     and not (series is not None and series.type == 'webtoon'),
+        'segment_height': getattr(settings, 'PAGE_SEGMENT_HEIGHT', 0) if segmented else 0,
+        'max_pixels': getattr(settings, 'PAGE_MAX_DECODED_PIXELS', DEFAULT_MAX_PIXELS),
+    }
+
+
+def segment_source_hash(source_hash, segment):
+    """Content key of one segment of a source image (the first one keeps the source's)."""
+    if not segment:
+        return source_hash
+    return hashlib.sha256(f"{source_hash}#segment{segment}".encode()).hexdigest()
+
+
+class PageTranscodePool:
+    """
+    Runs `transcode_page` in a process pool and hands results back in page order,
+    so the caller keeps doing persistence and progress updates sequentially.
+    Falls back to in-process transcoding when a pool can't be used.
+    """
+
+    def __init__(self, workers=None, profile=None):
+        if workers is None:
+            workers = getattr(settings, 'PAGE_TRANSCODE_WORKERS', 1)
+        self.workers = max(1, int(workers))
+        self.profile = profile or get_page_profile()
+        self._executor = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            try:
+                # 'spawn' avoids forking a process that may hold threads or DB connections;
+                # the workers also start from daemonic Celery prefork children
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=pool_context(),
+                    initializer=watch_parent,
+                    initargs=(os.getpid(),),
+                )
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not start page transcoding pool, transcoding in-process: {e}")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        return False
+
+    def _disable(self, reason):
+        logger.warning(f"Page transcoding pool unavailable, continuing in-process: {reason}")
+        executor, self._executor = self._executor, None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, image_data):
+        if self._executor is None:
+            return None
+        try:
+            return self._executor.submit(transcode_page, image_data, self.profile)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._disable(e)
+            return None
+
+    def _collect(self, index, image_data, filename, future):
+        try:
+            if future is not None and self._executor is not None:
+                try:
+                    return index, filename, image_data, future.result(), None
+                except BrokenProcessPool as e:
+                    self._disable(e)
+            return index, filename, image_data, transcode_page(image_data, self.profile), None
+        except Exception as e:
+            return index, filename, image_data, None, e
+
+    def map(self, sources):
+        """
+        Transcode (index, image_data, filename) sources.
+        Yields (index, filename, image_data, result, error) in source order,
+        keeping at most two pages per worker in flight to bound memory.
+        """
+        pending = deque()
+        for index, image_data, filename in sources:
+            pending.append((index, image_data, filename, self._submit(image_data)))
+            window = self.workers * 2 if self._executor is not None else 1
+            while len(pending) >= window:
+                yield self._collect(*pending.popleft())
+        while pending:
+            yield self._collect(*pending.popleft())
+
+
+_upload_executor = None
+_upload_executor_lock = threading.Lock()
+
+
+def get_upload_executor():
+    """
+    Process-wide thread pool used to upload page images to the default storage.
+    Kept alive between chapters so its threads reuse the same storage
+    connection pool (botocore keeps 10 connections per client by default).
+    """
+    global _upload_executor
+    with _upload_executor_lock:
+        if _upload_executor is None:
+            workers = max(1, getattr(settings, 'PAGE_UPLOAD_WORKERS', 8))
+            _upload_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='page-upload')
+        return _upload_executor
+
+
+class PageBatchWriter:
+    """
+    Persists pages in batches: images are uploaded concurrently from the upload
+    thread pool, then the Page rows of a batch are inserted with one bulk_create.
+    `on_flush(saved_count)` is called after every batch (progress reporting).
+
+    Pages added with a `source_hash` are stored content-addressed as a shared
+    PageBlob; `find_blobs()` + `add_blob()` reuse an already ingested image
+    without encoding or uploading anything.
+
+    The segments of a page are added in order with `segment`/`segment_count`
+    and always land in the same batch, so the checkpoint never splits a page.
+    """
+
+    def __init__(self, chapter, batch_size=None, on_flush=None, profile=None):
+        self.chapter = chapter
+        self.batch_size = max(1, batch_size or getattr(settings, 'PAGE_DB_BATCH_SIZE', 50))
+        self.on_flush = on_flush
+        self.saved_count = 0
+        self.reused_count = 0
+        self.last_page_number = 0
+        # Set once a page failed to be stored: later pages don't move the checkpoint
+        self._checkpoint_stalled = False
+        self.storage = Page._meta.get_field('image').storage
+        self.profile_key = profile_key(profile or get_page_profile())
+        # Seconds spent in storage calls (summed over upload threads) and in the DB
+        self.timings = Counter()
+        self.bytes_stored = 0
+        self._timings_lock = threading.Lock()
+        self._pending = []
+        self._segment_counts = {}
+        self._blob_uploads = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+    def _add_timing(self, stage, started):
+        with self._timings_lock:
+            self.timings[stage] += time.perf_counter() - started
+
+    def _timed_store(self, func, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._add_timing('store', started)
+
+    def _upload(self, instance, filename, data):
+        field = instance.image.field
+        name = field.generate_filename(instance, filename)
+        self.bytes_stored += len(data)
+        return get_upload_executor().submit(
+            self._timed_store, self.storage.save, name, ContentFile(data), max_length=field.max_length
+        )
+
+    def _upload_blob_file(self, name, data):
+        # Content-addressed: an in-batch duplicate shares the first upload (no
+        # storage probe, the PageBlob rows tell which content is already stored)
+        if name in self._blob_uploads:
+            return self._blob_uploads[name]
+        self.bytes_stored += len(data)
+        future = get_upload_executor().submit(self._timed_store, self.storage.save, name, ContentFile(data))
+        self._blob_uploads[name] = future
+        return future
+
+    def _blob_key(self, source_hash):
+        return hashlib.sha256(f"{source_hash}:{self.profile_key}".encode()).hexdigest()
+
+    def find_blob(self, source_hash):
+        """The shared image already ingested for this source and profile, or None."""
+        return PageBlob.objects.filter(source_hash=source_hash, profile=self.profile_key).first()
+
+    def find_blobs(self, source_hash):
+        """
+        The shared images of every segment already ingested for this source
+        and profile, in order, or None unless they are all there.
+        """
+        first = self.find_blob(source_hash)
+        if first is None or first.segment_count <= 1:
+            return [first] if first is not None else None
+        hashes = [segment_source_hash(source_hash, i) for i in range(1, first.segment_count)]
+        others = {
+            blob.source_hash: blob
+            for blob in PageBlob.objects.filter(profile=self.profile_key, source_hash__in=hashes)
+        }
+        if len(others) < len(hashes):
+            return None
+        return [first] + [others[h] for h in hashes]
+
+    def _queue(self, entry, segment, segment_count):
+        self._pending.append(entry)
+        # Only flush once the page's last segment is queued
+        if segment + 1 >= segment_count and len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def add(self, page_number, filename, data, width=None, height=None, derivatives=(), source_hash=None, color_mode='',
+            segment=0, segment_count=1, dominant_color='', placeholder=''):
+        """
+        Queue a page image (and its resized derivatives) for upload;
+        flushes once a full batch is pending.
+        """
+        page = Page(
+            chapter=self.chapter, page_number=page_number, segment=segment,
+            width=width, height=height, color_mode=color_mode or '',
+            file_size=len(data), dominant_color=dominant_color or '', placeholder=placeholder or '',
+        )
+        if source_hash and not segment:
+            self._segment_counts[source_hash] = segment_count
+        base = os.path.splitext(filename)[0]
+        key = self._blob_key(source_hash) if source_hash else None
+        uploads = []
+        for derivative in derivatives:
+            fmt = derivative.get('format', 'jpeg')
+            instance = PageDerivative(page=page, width=derivative['width'], height=derivative['height'], format=fmt)
+            if key:
+                name = page_blob_path(key, f"/w{derivative['width']}{FORMAT_EXTENSIONS[fmt]}")
+                future = self._upload_blob_file(name, derivative['data'])
+            else:
+                future = self._upload(instance, base + FORMAT_EXTENSIONS[fmt], derivative['data'])
+            uploads.append((instance, future))
+        if key:
+            future = self._upload_blob_file(page_blob_path(key, os.path.splitext(filename)[1]), data)
+        else:
+            future = self._upload(page, filename, data)
+        self._queue((page, future, uploads, source_hash), segment, segment_count)
+
+    def _blob_derivatives(self, page, blob):
+        return [
+            PageDerivative(page=page, width=v['width'], height=v['height'], format=v['format'], image=v['name'])
+            for v in blob.variants
+        ]
+
+    def add_blob(self, page_number, blob, segment=0, segment_count=1):
+        """Queue a page backed by an already stored PageBlob (no upload)."""
+        page = Page(
+            chapter=self.chapter, page_number=page_number, segment=segment,
+            width=blob.width, height=blob.height, color_mode=blob.color_mode,
+            file_size=blob.file_size, dominant_color=blob.dominant_color, placeholder=blob.placeholder,
+            image=blob.image.name, blob=blob,
+        )
+        uploads = [(instance, None) for instance in self._blob_derivatives(page, blob)]
+        if not segment:
+            self.reused_count += 1
+        self._queue((page, None, uploads, None), segment, segment_count)
+
+    def _discard(self, page, derivatives):
+        for instance in [page] + derivatives:
+            # Shared files belong to their PageBlob
+            if page.blob_id and is_page_blob_path(instance.image.name):
+                continue
+            try:
+                self.storage.delete(instance.image.name)
+            except Exception:
+                pass
+
+    def _register_blobs(self, saved):
+        """
+        Create the PageBlob rows of newly uploaded content-addressed pages and
+        link the pages to them. When another ingest registered the same source
+        first, its files win and ours are dropped.
+        """
+        blobs = {}
+        for page, derivatives, source_hash in saved:
+            if source_hash and source_hash not in blobs:
+                blobs[source_hash] = PageBlob(
+                    source_hash=source_hash, profile=self.profile_key,
+                    segment_count=self._segment_counts.get(source_hash, 1),
+                    image=page.image.name, width=page.width, height=page.height, color_mode=page.color_mode,
+                    file_size=page.file_size, dominant_color=page.dominant_color, placeholder=page.placeholder,
+                    variants=[
+                        {'format': d.format, 'width': d.width, 'height': d.height, 'name': d.image.name}
+                        for d in derivatives
+                    ],
+                )
+        if not blobs:
+            return saved
+
+        PageBlob.objects.bulk_create(blobs.values(), ignore_conflicts=True)
+        stored = {
+            blob.source_hash: blob
+            for blob in PageBlob.objects.filter(profile=self.profile_key, source_hash__in=list(blobs))
+        }
+        linked = []
+        for page, derivatives, source_hash in saved:
+            blob = stored.get(source_hash) if source_hash else None
+            if blob is not None:
+                shared = {blob.image.name} | {v['name'] for v in blob.variants}
+                for instance in [page] + derivatives:
+                    if instance.image.name not in shared:
+                        try:
+                            self.storage.delete(instance.image.name)
+                        except Exception:
+                            pass
+                page.blob = blob
+                page.image.name = blob.image.name
+                page.color_mode = blob.color_mode
+                page.file_size, page.dominant_color = blob.file_size, blob.dominant_color
+                page.placeholder = blob.placeholder
+                derivatives = self._blob_derivatives(page, blob)
+            linked.append((page, derivatives, source_hash))
+        return linked
+
+    def _retain_blobs(self, pages):
+        counts = Counter(page.blob_id for page in pages if page.blob_id)
+        by_count = defaultdict(list)
+        for blob_id, count in counts.items():
+            by_count[count].append(blob_id)
+        for count, blob_ids in by_count.items():
+            PageBlob.objects.filter(pk__in=blob_ids).update(ref_count=F('ref_count') + count)
+
+    def flush(self):
+        """Wait for the pending uploads and insert their Page and PageDerivative rows."""
+        pending, self._pending = self._pending, []
+        saved = []
+        for page, future, uploads, source_hash in pending:
+            if future is not None:
+                try:
+                    page.image.name = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to upload page {page.page_number} of {self.chapter}: {e}")
+                    continue
+            derivatives = []
+            for instance, derivative_future in uploads:
+                if derivative_future is None:
+                    derivatives.append(instance)
+                    continue
+                try:
+                    instance.image.name = derivative_future.result()
+                    derivatives.append(instance)
+                except Exception as e:
+                    # The page still works without this width
+                    logger.warning(f"Failed to upload {instance.width}px {instance.format} derivative of page {page.page_number}: {e}")
+            saved.append((page, derivatives, source_hash))
+        if not saved:
+            self._checkpoint_stalled = self._checkpoint_stalled or bool(pending)
+            return
+
+        db_started = time.perf_counter()
+        # Close stale DB connections (important on long-running tasks)
+        close_old_connections()
+        saved = self._register_blobs(saved)
+        # Pages, derivatives and the caller's checkpoint (on_flush) commit together
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    Page.objects.bulk_create([page for page, _, _ in saved])
+            except Exception as e:
+                # Fall back to row-by-row inserts so one bad row doesn't drop the whole batch
+                logger.warning(f"Bulk insert failed for {self.chapter}, inserting pages one by one: {e}")
+                kept = []
+                for page, derivatives, source_hash in saved:
+                    try:
+                        page.pk = None
+                        with transaction.atomic():
+                            page.save()
+                        kept.append((page, derivatives, source_hash))
+                    except Exception as row_error:
+                        logger.error(f"Failed to save page {page.page_number} of {self.chapter}: {row_error}")
+                        self._discard(page, derivatives)
+                saved = kept
+
+            derivative_rows = []
+            for page, derivatives, _ in saved:
+                for instance in derivatives:
+                    # Re-assign now that the page has a primary key
+                    instance.page = page
+                    derivative_rows.append(instance)
+            if derivative_rows:
+                PageDerivative.objects.bulk_create(derivative_rows)
+            self._retain_blobs([page for page, _, _ in saved])
+
+            # Counted in logical pages: segments belong to their page
+            self.saved_count += sum(1 for page, _, _ in saved if not page.segment)
+            # Pending pages are flushed in page order: the checkpoint moves up to
+            # the first page not stored, and no further (resuming redoes it)
+            stored = {id(page) for page, _, _ in saved}
+            for entry in pending:
+                if self._checkpoint_stalled:
+                    break
+                if id(entry[0]) not in stored:
+                    self._checkpoint_stalled = True
+                    break
+                self.last_page_number = max(self.last_page_number, entry[0].page_number)
+            if self.on_flush:
+                self.on_flush(self.saved_count)
+        self._add_timing('db', db_started)
+
+
+def generate_page_variants(page, profile=None):
+    """
+    Backfill the responsive widths and extra formats of an existing page from its
+    stored main image. Only (width, format) pairs the page doesn't have yet are
+    created. Variants of a page backed by a PageBlob are stored next to the
+    shared image, recorded on the blob and given to every page sharing it.
+    Returns the number of derivatives created for the page.
+    """
+    from io import BytesIO
+    from PIL import Image
+
+    profile = profile or get_page_profile(page.chapter.series)
+    blob = page.blob
+    existing = set(page.derivatives.values_list('width', 'format'))
+    if blob is not None:
+        existing |= {(v['width'], v['format']) for v in blob.variants}
+
+    page.image.open('rb')
+    try:
+        img = Image.open(BytesIO(page.image.read()))
+        img.load()
+    finally:
+        page.image.close()
+
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    if not page.width:
+        page.width, page.height = img.size
+        page.save(update_fields=['width', 'height'])
+
+    widths = sorted(set(profile['widths']))[:-1]
+    variants = render_variants(img, widths, supported_formats(profile.get('formats', ())), profile['quality'])
+    img.close()
+
+    if blob is not None:
+        return _add_blob_variants(blob, page, [v for v in variants if (v['width'], v['format']) not in existing])
+
+    base = os.path.splitext(os.path.basename(page.image.name))[0]
+    created = 0
+    for variant in variants:
+        if (variant['width'], variant['format']) in existing:
+            continue
+        derivative = PageDerivative(page=page, width=variant['width'], height=variant['height'], format=variant['format'])
+        derivative.image.save(base + FORMAT_EXTENSIONS[variant['format']], ContentFile(variant['data']), save=True)
+        created += 1
+    return created
+
+
+def _add_blob_variants(blob, page, variants):
+    """
+    Store new variants of a shared image under its content address, persist
+    them on the blob and create the missing PageDerivative rows of every page
+    referencing it. Returns the number of rows created for `page`.
+    """
+    storage = PageBlob._meta.get_field('image').storage
+    key = os.path.splitext(os.path.basename(blob.image.name))[0]
+    for variant in variants:
+        name = page_blob_path(key, f"/w{variant['width']}{FORMAT_EXTENSIONS[variant['format']]}")
+        name = storage.save(name, ContentFile(variant['data']))
+        blob.variants.append({'format': variant['format'], 'width': variant['width'], 'height': variant['height'], 'name': name})
+    if variants:
+        blob.save(update_fields=['variants'])
+
+    have = defaultdict(set)
+    for page_id, width, fmt in PageDerivative.objects.filter(page__blob=blob).values_list('page_id', 'width', 'format'):
+        have[page_id].add((width, fmt))
+    rows = [
+        PageDerivative(page_id=page_id, width=v['width'], height=v['height'], format=v['format'], image=v['name'])
+        for page_id in blob.pages.values_list('pk', flat=True)
+        for v in blob.variants
+        if (v['width'], v['format']) not in have[page_id]
+    ]
+    PageDerivative.objects.bulk_create(rows)
+    return sum(1 for row in rows if row.page_id == page.pk)
+
+
+PAGE_METADATA_FIELDS = ['width', 'height', 'file_size', 'dominant_color', 'placeholder']
+
+
+def backfill_page_metadata(page):
+    """
+    Fill the dimensions, byte size, dominant colour and placeholder of an
+    existing page (and of its PageBlob) from its stored main image. Pages of
+    a blob that already has them are filled without reading the image.
+    """
+    from io import BytesIO
+    from PIL import Image
+
+    blob = page.blob
+    if blob is not None and all(getattr(blob, field) for field in PAGE_METADATA_FIELDS):
+        for field in PAGE_METADATA_FIELDS:
+            setattr(page, field, getattr(blob, field))
+    else:
+        page.image.open('rb')
+        try:
+            data = page.image.read()
+        finally:
+            page.image.close()
+        with Image.open(BytesIO(data)) as img:
+            page.width, page.height = img.size
+            # JPEGs: DCT-scaled decode, the colour needs a few pixels only
+            img.draft('RGB', DOMINANT_SAMPLE_SIZE)
+            page.dominant_color = dominant_color(img)
+            page.placeholder = placeholder_data_uri(img)
+        page.file_size = len(data)
+        if blob is not None:
+            for field in PAGE_METADATA_FIELDS:
+                setattr(blob, field, getattr(page, field))
+            blob.save(update_fields=PAGE_METADATA_FIELDS)
+    page.save(update_fields=PAGE_METADATA_FIELDS)
+
+
+def _stored_page_image(segments):
+    """Bytes and extension of a stored page, its segments stitched back together."""
+    from io import BytesIO
+    from PIL import Image
+
+    datas = []
+    for segment in segments:
+        segment.image.open('rb')
+        try:
+            datas.append(segment.image.read())
+        finally:
+            segment.image.close()
+    if len(datas) == 1:
+        return datas[0], os.path.splitext(segments[0].image.name)[1].lower()
+
+    images = [Image.open(BytesIO(data)) for data in datas]
+    strip = Image.new('RGB', (max(img.width for img in images), sum(img.height for img in images)), 'white')
+    top = 0
+    for img in images:
+        strip.paste(img.convert('RGB'), (0, top))
+        top += img.height
+        img.close()
+    buffer = BytesIO()
+    # Lossless: the strip is re-encoded by the ingestion anyway
+    strip.save(buffer, format='PNG')
+    return buffer.getvalue(), '.png'
+
+
+def rebuild_chapter_source(chapter):
+    """
+    Rebuild a chapter's source file (a CBZ of its stored page images, tall strips
+    stitched back from their segments) once the original was deleted after
+    ingestion, so the chapter can be re-encoded with another image profile.
+    Pages already encoded are decoded again: expect some generation loss.
+    Returns False when the chapter has no pages.
+    """
+    import zipfile
+    from itertools import groupby
+    from django.core.files import File
+
+    pages = list(chapter.pages.order_by('page_number', 'segment'))
+    if not pages:
+        return False
+
+    base_temp_dir = os.path.join(getattr(settings, 'MEDIA_ROOT', tempfile.gettempdir()), 'manga_temp_uploads')
+    os.makedirs(base_temp_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=base_temp_dir, suffix='.cbz')
+    os.close(fd)
+    try:
+        with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_STORED) as zf:
+            for page_number, segments in groupby(pages, key=lambda page: page.page_number):
+                data, ext = _stored_page_image(list(segments))
+                zf.writestr(f"{page_number:05d}{ext}", data)
+        # Stored like an uploaded source: an interrupted re-encode resumes from it
+        with open(temp_path, 'rb') as f:
+            chapter.source_file.save(f"chapter_{chapter.pk}_rebuilt.cbz", File(f), save=True)
+    finally:
+        os.unlink(temp_path)
+    logger.info(f"Rebuilt the source of {chapter} from {len(pages)} stored pages")
+    return True
+
+
 class FileProcessor:
     def __init__(self, upload_id=None):
         self.supported_extensions = {'.pdf', '.cbz', '.cbr', '.zip', '.epub'}
         self.upload_id = upload_id
+        # Seconds per ingestion stage (read, decode, resize, encode, store, db),
+        # summed over pages: transcoding stages add up across pool workers
+        self.stage_timings = Counter()
+        # Byte and page counters of the last chapter, and its metrics summary
+        self.counters = Counter()
+        self.peak_rss = 0
+        self.metrics = {}
 
     def process_chapter(self, chapter):
         """
@@ -182,12 +892,12 @@ class FileProcessor:
             elif ext in ['.jpg', '.jpeg', '.png', '.webp']:
                 # If single image, just save it.
                 with open(temp_path, 'rb') as f:
-                    page_count = chapter.pages.count()
+                    page_count = chapter.page_count
                     self._save_page_image(chapter, f.read(), page_count + 1, os.path.basename(chapter.source_file.name))
                 result = True
             
             if result:
-                logger.info(f"Successfully processed {chapter}. Total pages: {chapter.pages.count()}")
+                logger.info(f"Successfully processed {chapter}. Total pages: {chapter.page_count}")
                 
                 # Delete source file after successful processing to save space
                 if chapter.source_file:
@@ -228,11 +938,11 @@ class FileProcessor:
             elif ext in ['.cbz', '.zip', '.epub']:
                 self._extract_from_zip(chapter, file_path)
             elif ext in ['.jpg', '.jpeg', '.png', '.webp']:
-                with open(file_path, 'rb') as f:
-                    page_count = chapter.pages.count()
+                with open_source_file(file_path) as f:
+                    page_count = chapter.page_count
                     self._save_page_image(chapter, f.read(), page_count + 1, os.path.basename(file_path))
 
-            logger.info(f"Successfully processed {chapter}. Total pages: {chapter.pages.count()}")
+            logger.info(f"Successfully processed {chapter}. Total pages: {chapter.page_count}")
             
             # Delete source file after successful processing to save space
             if chapter.source_file:
@@ -248,121 +958,290 @@ class FileProcessor:
             logger.error(f"Error processing {chapter} from path: {e}")
             return False
 
-    def _process_and_save_pages(self, chapter, tasks, file_path=None, archive_type=None):
-        """Process page creations sequentially with per-image error handling."""
-        from django.db.models import F
-        from django.db import close_old_connections
+    def _process_and_save_pages(self, chapter, source, start=0, stop=None):
+        """
+        Stream pages from an open page source, transcode them in the process pool
+        and persist them in page order through a PageBatchWriter. The first
+        `start` pages are already stored (resumed ingestion) and are skipped.
+        Each committed batch advances the chapter's ingestion checkpoint.
+
+        With `stop`, only pages [start, stop) are ingested (one range of a
+        fanned-out chapter): other ranges run concurrently, so progress is
+        incremented instead of set and neither the checkpoint nor the upload's
+        metrics are written.
+        """
         from administration.models import ChunkedUpload
 
+        started = time.perf_counter()
+        self._reset_counters()
+        ranged = stop is not None
+
         # Initialize total count
-        if self.upload_id:
-            ChunkedUpload.objects.filter(upload_id=self.upload_id).update(total_files_to_process=len(tasks), processed_files=0)
+        total = len(source) if not ranged else min(stop, len(source)) - start
+        upload_qs = ChunkedUpload.objects.filter(upload_id=self.upload_id) if self.upload_id else None
+        if upload_qs is not None and not ranged:
+            upload_qs.update(total_files_to_process=total, processed_files=start)
+        reported = [0]
+
+        def _on_flush(saved_count):
+            # One progress write per batch instead of one per page (it also renews
+            # the bulk scheduling lease); runs in the batch's transaction, so the
+            # checkpoint matches the rows
+            if ranged:
+                if upload_qs is not None:
+                    upload_qs.update(
+                        processed_files=F('processed_files') + saved_count - reported[0], updated_at=timezone.now(),
+                    )
+                reported[0] = saved_count
+                return
+            Chapter.objects.filter(pk=chapter.pk).update(ingest_checkpoint=writer.last_page_number)
+            if upload_qs is not None:
+                upload_qs.update(processed_files=start + saved_count, updated_at=timezone.now())
 
-        saved_count = 0
-        failed_count = 0
+        # Written by the prefetch thread only, merged once it has stopped
+        read_timings, read_counters = Counter(), Counter()
+
+        def _hashed(pages):
+            # Runs in the prefetch thread (hashlib releases the GIL on large buffers)
+            pages = iter(pages)
+            while True:
+                started = time.perf_counter()
+                try:
+                    i, image_data, filename = next(pages)
+                except StopIteration:
+                    return
+                source_hash = hashlib.sha256(image_data).hexdigest()
+                read_timings['read'] += time.perf_counter() - started
+                read_counters['bytes_read'] += len(image_data)
+                yield i, image_data, filename, source_hash
 
-        for args in tasks:
+        source_hashes = {}
+        reused = {}
+
+        def _check(stream):
+            # Runs in the prefetch thread: oversized images are refused from
+            # their header, before the entry is even read
             try:
-                # Close stale DB connections before each iteration (important on long-running tasks)
-                close_old_connections()
-
-                # Extract image data
-                if archive_type == 'zip':
-                    i, inner_filename, filename = args
-                    with zipfile.ZipFile(file_path, 'r') as zf:
-                        with zf.open(inner_filename) as f:
-                            image_data = f.read()
-                elif archive_type == 'rar':
-                    i, inner_filename, filename = args
-                    with rarfile.RarFile(file_path, 'r') as rf:
-                        with rf.open(inner_filename) as f:
-                            image_data = f.read()
-                elif archive_type == 'pdf':
-                    i, page_num, img_idx, filename = args
-                    reader = pypdf.PdfReader(file_path)
-                    image_data = reader.pages[page_num].images[img_idx].data
-                else:
-                    i, image_data, filename = args
+                check_pixel_budget(stream, profile)
+            except ImageTooLarge:
+                read_counters['pages_too_large'] += 1
+                raise
 
-                # Save page (uploads to R2 + saves to DB atomically)
-                self._save_page_image(chapter, image_data, i + 1, filename)
-                saved_count += 1
+        def _to_transcode(pages):
+            # Pages whose source was already ingested reuse the stored blob:
+            # no encoding, no upload, only new rows.
+            for i, image_data, filename, source_hash in pages:
+                blobs = writer.find_blobs(source_hash)
+                if blobs is not None:
+                    reused[i] = blobs
+                    continue
+                source_hashes[i] = source_hash
+                yield i, image_data, filename
+
+        def _add_reused(before=None):
+            # Keep the writer fed in page order so the checkpoint never skips a page
+            for index in sorted(k for k in reused if before is None or k < before):
+                blobs = reused.pop(index)
+                for segment, blob in enumerate(blobs):
+                    writer.add_blob(index + 1, blob, segment=segment, segment_count=len(blobs))
+
+        # Archive reads run one step ahead in a background thread (bounded buffer)
+        prefetch_size = getattr(settings, 'PAGE_PREFETCH_SIZE', 4)
+        profile = get_page_profile(chapter.series)
+        with PageTranscodePool(profile=profile) as pool, \
+                PageBatchWriter(chapter, on_flush=_on_flush, profile=profile) as writer:
+            prefetched = prefetch(_hashed(source.pages(start, stop, check=_check)), prefetch_size)
+            pages = _to_transcode(prefetched)
+            for i, filename, image_data, result, error in pool.map(pages):
+                _add_reused(before=i)
+                source_hash = source_hashes.pop(i, None)
+                if isinstance(error, ImageTooLarge):
+                    # Stored raw, it would be just as impossible to display
+                    logger.error(f"Page {i + 1} of {chapter} refused: {error}")
+                    self.counters['pages_too_large'] += 1
+                elif error is not None:
+                    # Fallback: save raw data if compression fails
+                    logger.warning(f"Image compression failed for page {i + 1}, saving raw: {error}")
+                    writer.add(i + 1, filename, image_data)
+                else:
+                    self._add_transcoded(writer, i + 1, filename, result, source_hash)
 
                 # Free memory immediately
-                del image_data
+                del image_data, result
+            _add_reused()
+            # Joins the prefetch thread
+            prefetched.close()
+        self.stage_timings.update(writer.timings)
+        self.stage_timings.update(read_timings)
+        self.counters.update(read_counters)
 
-            except Exception as e:
-                failed_count += 1
-                page_idx = args[0] if args else '?'
-                logger.error(f"Failed to process page {page_idx} of {chapter}: {e}")
-                # Continue to next image — don't let one failure kill the whole chapter
-                continue
+        saved_count = writer.saved_count if ranged else start + writer.saved_count
+        # Includes pages that could not even be read from the archive
+        failed_count = total - saved_count
+
+        logger.info(
+            f"Finished processing {chapter}{f' pages {start + 1}-{stop}' if ranged else ''}: "
+            f"{saved_count} saved ({writer.reused_count} reused), {failed_count} failed out of {total}"
+        )
+        if ranged:
+            self._record_metrics(
+                chapter, None, time.perf_counter() - started, writer,
+                event='range_ingested', pages_total=total,
+            )
+        else:
+            self._record_metrics(
+                chapter, upload_qs, time.perf_counter() - started, writer,
+                pages_total=total, pages_resumed=start,
+            )
 
-        # Final progress update for this chapter (ONE write instead of 50+)
-        if self.upload_id:
-            ChunkedUpload.objects.filter(upload_id=self.upload_id).update(processed_files=saved_count)
+    def process_page_range(self, chapter, file_path, start, stop):
+        """
+        Ingest pages [start, stop) of a chapter file (one fan-out subtask).
+        Pages of the range left by a previous attempt are replaced, so the
+        task can be retried. Returns the range's metrics.
+        """
+        chapter.pages.filter(page_number__gt=start, page_number__lte=stop).delete()
+        with closing(open_page_source(file_path)) as source:
+            self._process_and_save_pages(chapter, source, start=start, stop=stop)
+        return self.metrics
 
+    def _reset_counters(self, **counters):
+        """Start a new chapter's metrics (the peak memory starts from here too)."""
+        self.stage_timings, self.counters = Counter(), Counter(counters)
+        self.peak_rss = 0
+        reset_peak_rss()
 
-        logger.info(f"Finished processing {chapter}: {saved_count} saved, {failed_count} failed out of {len(tasks)}")
+    def _record_metrics(self, chapter, upload_qs, seconds, writer, event='chapter_ingested', **counters):
+        """
+        Summarize the chapter's stage timings and counters: kept on
+        `self.metrics`, persisted on the ChunkedUpload and emitted as one JSON
+        log line on the 'catalog.metrics' logger (for log-based graphs).
+        'peak_rss_bytes' is the highest peak memory of this process and of the
+        transcoding workers.
+        """
+        self.counters.update(counters)
+        self.counters.update(
+            pages_saved=writer.saved_count,
+            pages_reused=writer.reused_count,
+            bytes_stored=writer.bytes_stored,
+        )
+        self.metrics = {
+            'chapter_id': chapter.pk,
+            'seconds': round(seconds, 3),
+            'pages_per_second': round(writer.saved_count / seconds, 2) if seconds else 0,
+            **self.counters,
+            'peak_rss_bytes': max(self.peak_rss, peak_rss_bytes() or 0) or None,
+            'stages': {stage: round(value, 3) for stage, value in self.stage_timings.items()},
+        }
+        if upload_qs is not None:
+            upload_qs.update(ingest_metrics=self.metrics)
+        metrics_logger.info(json.dumps({
+            'event': event,
+            'upload_id': str(self.upload_id) if self.upload_id else None,
+            **self.metrics,
+        }))
 
-    def _save_page_image(self, chapter, image_data, page_number, filename):
-        """Compress, resize, and save a page image to R2."""
-        try:
-            img = Image.open(BytesIO(image_data))
-            # Free the raw data immediately
-            del image_data
+    def _ingest(self, chapter, file_path, source):
+        """
+        Extract the pages of an open source into `chapter`, resuming from the
+        chapter's ingestion checkpoint when a previous attempt on the same file
+        (same fingerprint) stopped midway; otherwise the chapter's pages are replaced.
+        """
+        upload_digest = self._upload_digest()
+        if upload_digest and chapter.source_digest == upload_digest and chapter.pages.exists():
+            # Same file as the chapter's pages come from (e.g. a re-uploaded folder)
+            logger.info(f"{chapter} is unchanged since its last import, skipped")
+            return
+        # The upload's full digest when there is one, else a sampled fingerprint
+        fingerprint = upload_digest or source_fingerprint(file_path)
+        start = 0
+        if chapter.ingest_fingerprint == fingerprint and chapter.ingest_checkpoint:
+            # Only trust the checkpoint for pages that are still there
+            start = chapter.pages.filter(page_number__lte=chapter.ingest_checkpoint).aggregate(
+                last=Max('page_number')
+            )['last'] or 0
+        if start:
+            logger.info(f"Resuming {chapter} after page {start}")
+            chapter.pages.filter(page_number__gt=start).delete()
+        else:
+            chapter.pages.all().delete()
+        chapter.ingest_fingerprint, chapter.ingest_checkpoint, chapter.source_digest = fingerprint, start, ''
+        Chapter.objects.filter(pk=chapter.pk).update(
+            ingest_fingerprint=fingerprint, ingest_checkpoint=start, source_digest='',
+        )
 
-            # Convert to RGB if necessary (strips alpha channel, handles palette PNGs)
-            if img.mode in ('RGBA', 'P', 'LA'):
-                img = img.convert('RGB')
+        self._process_and_save_pages(chapter, source, start=start)
 
-            # Resize: cap width at 1400px (standard manga reader width)
-            MAX_WIDTH = 1400
-            if img.width > MAX_WIDTH:
-                ratio = MAX_WIDTH / img.width
-                new_height = int(img.height * ratio)
-                img = img.resize((MAX_WIDTH, new_height), Image.LANCZOS)
+        chapter.ingest_fingerprint, chapter.ingest_checkpoint, chapter.source_digest = '', 0, upload_digest
+        Chapter.objects.filter(pk=chapter.pk).update(
+            ingest_fingerprint='', ingest_checkpoint=0, source_digest=upload_digest,
+        )
 
-            # Compress to JPEG at 82% quality (~200-400KB per page)
-            buffer = BytesIO()
-            img.save(buffer, format='JPEG', quality=82, optimize=True)
-            img.close()
+    def _upload_digest(self):
+        """Whole-file digest of the chunked upload being ingested, or ''."""
+        from administration.models import ChunkedUpload
 
-            compressed_data = buffer.getvalue()
-            buffer.close()
+        if not self.upload_id:
+            return ''
+        return ChunkedUpload.objects.filter(upload_id=self.upload_id).values_list('file_digest', flat=True).first() or ''
 
-            # Force .jpg extension
-            base = os.path.splitext(filename)[0]
-            filename = f"{base}.jpg"
+    @staticmethod
+    def _jpeg_filename(filename, segment=0):
+        """Force .jpg extension on a page filename (suffixed per segment)."""
+        base = os.path.splitext(filename)[0]
+        if segment:
+            return f"{base}_s{segment:02d}.jpg"
+        return f"{base}.jpg"
 
-            page = Page(chapter=chapter, page_number=page_number)
-            page.image.save(filename, ContentFile(compressed_data), save=True)
+    def _add_transcoded(self, writer, page_number, filename, result, source_hash):
+        """Queue a `transcode_page` result: the page, or each of its segments."""
+        self.stage_timings.update(result['timings'])
+        self.peak_rss = max(self.peak_rss, result.get('peak_rss') or 0)
+        self.counters['pages_passthrough'] += result['passthrough']
+        segments = result.get('segments') or [result]
+        self.counters['pages_segmented'] += len(segments) > 1
+        for segment, image in enumerate(segments):
+            writer.add(
+                page_number, self._jpeg_filename(filename, segment), image['data'],
+                width=image['width'], height=image['height'], derivatives=image['derivatives'],
+                source_hash=segment_source_hash(source_hash, segment) if source_hash else None,
+                color_mode=result['color_mode'], segment=segment, segment_count=len(segments),
+                dominant_color=image.get('dominant_color', ''), placeholder=image.get('placeholder', ''),
+            )
 
-            del compressed_data
-            return page
+    def _save_page_image(self, chapter, image_data, page_number, filename):
+        """Compress, resize, and save a single page image (and its derivatives)."""
+        from administration.models import ChunkedUpload
 
-        except Exception as e:
-            # Fallback: save raw data if compression fails
-            logger.warning(f"Image compression failed for page {page_number}, saving raw: {e}")
-            page = Page(chapter=chapter, page_number=page_number)
-            page.image.save(filename, ContentFile(image_data if 'image_data' in dir() else b''), save=True)
-            return page
+        started = time.perf_counter()
+        self._reset_counters(bytes_read=len(image_data), pages_total=1)
+        source_hash = hashlib.sha256(image_data).hexdigest()
+        profile = get_page_profile(chapter.series)
+        with PageBatchWriter(chapter, profile=profile) as writer:
+            blobs = writer.find_blobs(source_hash)
+            if blobs is not None:
+                for segment, blob in enumerate(blobs):
+                    writer.add_blob(page_number, blob, segment=segment, segment_count=len(blobs))
+            else:
+                try:
+                    result = transcode_page(image_data, profile)
+                except ImageTooLarge as e:
+                    logger.error(f"Page {page_number} of {chapter} refused: {e}")
+                    self.counters['pages_too_large'] += 1
+                except Exception as e:
+                    # Fallback: save raw data if compression fails
+                    logger.warning(f"Image compression failed for page {page_number}, saving raw: {e}")
+                    writer.add(page_number, filename, image_data)
+                else:
+                    self._add_transcoded(writer, page_number, filename, result, source_hash)
+        self.stage_timings.update(writer.timings)
+        upload_qs = ChunkedUpload.objects.filter(upload_id=self.upload_id) if self.upload_id else None
+        self._record_metrics(chapter, upload_qs, time.perf_counter() - started, writer)
 
     def _extract_from_pdf(self, chapter, file_path):
         """Extract images from PDF files."""
-        chapter.pages.all().delete()
-        
-        reader = pypdf.PdfReader(file_path)
-        
-        tasks = []
-        count = 0 
-        for page_num, page in enumerate(reader.pages):
-            for img_idx, image_file_object in enumerate(page.images):
-                # Don't preload data. Pass coordinates to thread.
-                tasks.append((count, page_num, img_idx, image_file_object.name))
-                count += 1
-                
-        self._process_and_save_pages(chapter, tasks, file_path=file_path, archive_type='pdf')
+        with PdfPageSource(file_path) as source:
+            self._ingest(chapter, file_path, source)
 
     def _extract_from_rar(self, chapter, file_path):
         """Extract images from RAR/CBR archives."""
@@ -371,48 +1250,22 @@ class FileProcessor:
                 "Le paquet 'rarfile' est requis pour traiter les fichiers .cbr. "
                 "Installez-le avec: pip install rarfile"
             )
-        
-        chapter.pages.all().delete()
-        
+
+        source = RarPageSource(file_path)
         try:
-            with rarfile.RarFile(file_path, 'r') as rf:
-                image_files = [
-                    f for f in rf.namelist()
-                    if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))
-                    and not f.startswith('__MACOSX')
-                ]
-                
-                image_files.sort()
-                
-                tasks = []
-                for i, filename in enumerate(image_files):
-                    clean_name = os.path.basename(filename)
-                    # Don't preload data into memory
-                    tasks.append((i, filename, clean_name))
-                        
-                self._process_and_save_pages(chapter, tasks, file_path=file_path, archive_type='rar')
+            source.open()
         except rarfile.BadRarFile:
             # Some .cbr files are actually ZIP-compressed (mislabeled)
             logger.warning(f"CBR file {file_path} is not a valid RAR, trying as ZIP...")
             self._extract_from_zip(chapter, file_path)
+            return
+
+        try:
+            self._ingest(chapter, file_path, source)
+        finally:
+            source.close()
 
     def _extract_from_zip(self, chapter, file_path):
         """Extract images from ZIP/CBZ/EPUB archives."""
-        chapter.pages.all().delete()
-        
-        with zipfile.ZipFile(file_path, 'r') as zf:
-            image_files = [
-                f for f in zf.namelist() 
-                if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))
-                and not f.startswith('__MACOSX')
-            ]
-            
-            image_files.sort()
-            
-            tasks = []
-            for i, filename in enumerate(image_files):
-                clean_name = os.path.basename(filename)
-                # Don't preload data into memory
-                tasks.append((i, filename, clean_name))
-                    
-            self._process_and_save_pages(chapter, tasks, file_path=file_path, archive_type='zip')
+        with ZipPageSource(file_path) as source:
+            self._ingest(chapter, file_path, source)
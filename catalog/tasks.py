@@ -1,13 +1,115 @@
 import os
+import shutil
+import time
 import logging
-from celery import shared_task
-from catalog.services import process_single_chapter_from_temp
+from celery import shared_task, chord
+from django.conf import settings
+from django.utils import timezone
+from catalog.archives import source_exists
+from catalog.services import (
+    process_single_chapter_from_temp, plan_page_ranges, prepare_fanout_chapter, finalize_fanout_chapter,
+)
 
 logger = logging.getLogger(__name__)
 
 
+def ingestion_options(interactive):
+    """
+    apply_async() options for ingestion tasks. Interactive work (an admin
+    waiting on a single chapter) goes to its own queue with a higher priority,
+    so it overtakes a queued bulk backlog; see CELERY_TASK_ROUTES.
+    """
+    if interactive:
+        return {'queue': 'ingestion-interactive', 'priority': settings.INGESTION_PRIORITY_INTERACTIVE}
+    return {'queue': 'ingestion-bulk', 'priority': settings.INGESTION_PRIORITY_BULK}
+
+
+def is_interactive_upload(chapter_count):
+    return chapter_count <= settings.INGESTION_INTERACTIVE_MAX_CHAPTERS
+
+
+def assembled_upload_path(upload):
+    """
+    Path of a chunked upload's file, or None when it is missing. The file may
+    only exist as its chunks, read in place (see catalog.archives.open_source_file).
+    """
+    import tempfile as tmpmod
+
+    base_dir = getattr(settings, 'MEDIA_ROOT', tmpmod.gettempdir())
+    base_temp_dir = os.path.join(base_dir, 'manga_temp_uploads')
+    safe_filename = os.path.basename(upload.filename)
+    temp_path = os.path.join(base_temp_dir, str(upload.upload_id), safe_filename)
+
+    if upload.storage_key:
+        # Uploaded to object storage: task_process_chapter downloads it there
+        return temp_path
+    if not source_exists(temp_path):
+        # Fallback for older flat structure
+        temp_path = os.path.join(base_temp_dir, safe_filename)
+    return temp_path if source_exists(temp_path) else None
+
+
+def _release_bulk_slot(upload_id):
+    """A bulk job's chapter is done (or gave up): dispatch the next queued ones."""
+    from administration.models import ChunkedUpload
+
+    if upload_id and ChunkedUpload.objects.filter(upload_id=upload_id, bulk_job__isnull=False).exists():
+        task_dispatch_queued_uploads.delay()
+
+
+def _delete_stored_upload(upload_id):
+    """Remove the object of a direct-to-storage upload once its chapter is done (or gave up)."""
+    from administration.models import ChunkedUpload
+    from administration.upload_service import DirectUploadService
+
+    upload = ChunkedUpload.objects.filter(upload_id=upload_id).exclude(storage_key='').first()
+    if upload is None:
+        return
+    try:
+        DirectUploadService.delete_stored(upload)
+    except Exception as exc:
+        logger.warning(f"Could not delete stored upload {upload.storage_key}: {exc}")
+
+
+def _cleanup_temp_file(temp_file_path, upload_id):
+    """Safely remove the temp file (or its upload chunks) and its parent folder if empty."""
+    if upload_id:
+        _delete_stored_upload(upload_id)
+    try:
+        if os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
+
+        # Attempt to delete the parent upload_id directory if empty
+        if upload_id:
+            parent_dir = os.path.dirname(temp_file_path)
+            if os.path.basename(parent_dir) == str(upload_id):
+                shutil.rmtree(os.path.join(parent_dir, 'chunks'), ignore_errors=True)
+                os.rmdir(parent_dir)
+    except OSError:
+        pass
+
+
+def _dispatch_page_ranges(series_id, upload_id, temp_file_path, ranges, interactive=False):
+    """
+    Fan a large chapter out into one task per page range, run in parallel by
+    the workers (the temp file must be on storage they all share), then
+    finalize it once every range is done. Subtasks keep the chapter's queue.
+    """
+    chapter = prepare_fanout_chapter(series_id, temp_file_path, upload_id, ranges[-1][1])
+    logger.info(f"Fanning out {chapter} into {len(ranges)} page ranges")
+    options = ingestion_options(interactive)
+    header = [
+        task_process_page_range.s(chapter.id, upload_id, temp_file_path, start, stop).set(**options)
+        for start, stop in ranges
+    ]
+    chord(header)(
+        task_finalize_chapter.s(chapter.id, upload_id, temp_file_path, time.time()).set(**options)
+    )
+    return chapter
+
+
 @shared_task(bind=True, max_retries=2, default_retry_delay=30)
-def task_process_chapter(self, series_id, upload_id, temp_file_path):
+def task_process_chapter(self, series_id, upload_id, temp_file_path, interactive=False):
     """
     Celery task to process a single chapter from a temp file.
     
@@ -15,6 +117,7 @@ def task_process_chapter(self, series_id, upload_id, temp_file_path):
         series_id: ID of the Series to attach the chapter to.
         upload_id: UUID string of ChunkedUpload record (can be None for single-file uploads).
         temp_file_path: Path to the temp file on disk.
+        interactive: Dispatched for an admin waiting on this chapter (queue of its fan-out subtasks).
     """
     from administration.models import ChunkedUpload
     from catalog.services import FileProcessor
@@ -34,49 +137,61 @@ def task_process_chapter(self, series_id, upload_id, temp_file_path):
         _cleanup_file()
         if reason:
             logger.error(f"Upload {upload_id} failed: {reason}")
+        _release_bulk_slot(upload_id)
 
     def _cleanup_file():
-        """Safely remove the temp file and its parent folder if empty."""
-        try:
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
-                
-            # Attempt to delete the parent upload_id directory if empty
-            if upload_id:
-                parent_dir = os.path.dirname(temp_file_path)
-                if os.path.basename(parent_dir) == str(upload_id):
-                    os.rmdir(parent_dir)
-        except OSError:
-            pass
+        _cleanup_temp_file(temp_file_path, upload_id)
 
     # Mark as processing immediately so the polling view knows we're active
     if upload and upload.status != 'processing':
         upload.status = 'processing'
         upload.save(update_fields=['status'])
 
+    # --- Direct-to-storage upload: fetch the object next to the other temp uploads ---
+    if upload and upload.storage_key and not source_exists(temp_file_path):
+        from administration.upload_service import DirectUploadService
+        try:
+            DirectUploadService.download(upload, temp_file_path)
+        except Exception as exc:
+            if self.request.retries >= self.max_retries:
+                _mark_failed(f"Could not download {upload.storage_key}: {exc}")
+                return
+            logger.warning(f"Download of {upload.storage_key} failed, retrying: {exc}")
+            raise self.retry(exc=exc)
+
     # --- Check file exists ---
-    if not os.path.exists(temp_file_path):
+    if not source_exists(temp_file_path):
         # Try safe filename fallback
-        from django.conf import settings
         import tempfile as tmpmod
         base_dir = getattr(settings, 'MEDIA_ROOT', tmpmod.gettempdir())
         base_temp_dir = os.path.join(base_dir, 'manga_temp_uploads')
         if upload:
             safe_filename = os.path.basename(upload.filename)
             alt_path = os.path.join(base_temp_dir, str(upload_id), safe_filename)
-            if not os.path.exists(alt_path):
+            if not source_exists(alt_path):
                 # Fallback purely in case it was stored without the upload_id directory
                 alt_path = os.path.join(base_temp_dir, safe_filename)
-            if os.path.exists(alt_path):
+            if source_exists(alt_path):
                 temp_file_path = alt_path
 
-    if not os.path.exists(temp_file_path):
+    if not source_exists(temp_file_path):
         _mark_failed(f"File not found: {temp_file_path}")
         return  # Don't retry — file won't magically appear
 
     # --- Process the chapter ---
     try:
         if upload:
+            try:
+                ranges = plan_page_ranges(temp_file_path)
+            except Exception as exc:
+                # Unreadable archive: the single-task path reports it as usual
+                logger.warning(f"Could not plan page ranges for {temp_file_path}: {exc}")
+                ranges = None
+            if ranges:
+                # Range tasks and the finalization task take over (status, cleanup)
+                _dispatch_page_ranges(series_id, upload_id, temp_file_path, ranges, interactive)
+                return
+
             chapter = process_single_chapter_from_temp(
                 series_id, temp_file_path, upload_id=upload_id
             )
@@ -84,6 +199,7 @@ def task_process_chapter(self, series_id, upload_id, temp_file_path):
             _cleanup_file()
             upload.status = 'completed'
             upload.save(update_fields=['status'])
+            _release_bulk_slot(upload_id)
         else:
             # Single-file upload: chapter already exists, just extract pages
             from catalog.models import Series
@@ -102,45 +218,91 @@ def task_process_chapter(self, series_id, upload_id, temp_file_path):
 
     except Exception as exc:
         logger.error(f"Celery task error for upload {upload_id}: {exc}")
-        if upload:
-            upload.status = 'failed'
-            upload.save(update_fields=['status'])
-        # Only clean up the file on FINAL retry (no more retries left)
+        # Only fail and clean up the file on FINAL retry (no more retries left)
         if self.request.retries >= self.max_retries:
-            _cleanup_file()
+            _mark_failed()
             return  # Give up
-        # Don't delete the file — retry needs it
+        # Don't delete the file — retry needs it, and the upload stays 'processing'
+        # so the temp janitor leaves it alone
+        raise self.retry(exc=exc)
+
+@shared_task(bind=True, max_retries=2, default_retry_delay=30)
+def task_process_page_range(self, chapter_id, upload_id, temp_file_path, start, stop):
+    """
+    Celery task ingesting pages [start, stop) of a fanned-out chapter.
+    Returns the range's metrics, merged by task_finalize_chapter.
+    """
+    from administration.models import ChunkedUpload
+    from catalog.models import Chapter
+    from catalog.services import FileProcessor
+
+    try:
+        chapter = Chapter.objects.select_related('series').get(pk=chapter_id)
+        return FileProcessor(upload_id=upload_id).process_page_range(chapter, temp_file_path, start, stop)
+    except Exception as exc:
+        logger.error(f"Celery range task error for chapter {chapter_id} pages {start + 1}-{stop}: {exc}")
+        if self.request.retries >= self.max_retries:
+            # The chord's finalization will not run: report the upload as failed
+            if upload_id:
+                ChunkedUpload.objects.filter(upload_id=upload_id).update(status='failed', updated_at=timezone.now())
+                _release_bulk_slot(upload_id)
+            raise
         raise self.retry(exc=exc)
 
+@shared_task
+def task_finalize_chapter(range_metrics, chapter_id, upload_id, temp_file_path, started_at):
+    """
+    Celery chord callback of a fanned-out chapter: checks page continuity,
+    refreshes the series' chapter count, stores the merged metrics and
+    completes the upload.
+    """
+    from administration.models import ChunkedUpload
+
+    chapter, missing = finalize_fanout_chapter(chapter_id, upload_id, range_metrics, time.time() - started_at)
+    status = 'completed' if chapter.pages.exists() else 'failed'
+    if upload_id:
+        ChunkedUpload.objects.filter(upload_id=upload_id).update(status=status, updated_at=timezone.now())
+    _cleanup_temp_file(temp_file_path, upload_id)
+    _release_bulk_slot(upload_id)
+    logger.info(
+        f"Celery processed chapter {chapter.number} in {len(range_metrics)} ranges "
+        f"({len(missing)} missing pages)"
+    )
+
+@shared_task
+def task_dispatch_queued_uploads():
+    """Celery task running the fair-share scheduler of bulk uploads."""
+    from catalog.scheduling import dispatch_queued_uploads
+
+    return dispatch_queued_uploads()
+
 @shared_task
 def task_bulk_process_chapters(series_id, upload_ids):
     """
     Celery task that loops through multiple upload_ids and dispatches individual processing tasks.
     Offloading the loop from the web server thread to the worker prevents DB locking issues.
+    Small uploads (INGESTION_INTERACTIVE_MAX_CHAPTERS) are dispatched at once as interactive work;
+    larger ones are queued for the fair-share scheduler (catalog.scheduling).
     """
-    import os
     from administration.models import ChunkedUpload
-    from django.conf import settings
-    import tempfile as tmpmod
+    from catalog.scheduling import enqueue_bulk_uploads, dispatch_queued_uploads
 
-    base_dir = getattr(settings, 'MEDIA_ROOT', tmpmod.gettempdir())
-    base_temp_dir = os.path.join(base_dir, 'manga_temp_uploads')
+    if not is_interactive_upload(len(upload_ids)):
+        enqueue_bulk_uploads(series_id, upload_ids)
+        dispatch_queued_uploads()
+        return
 
     for upload_id in upload_ids:
         try:
             upload = ChunkedUpload.objects.get(upload_id=upload_id)
-            
-            # Construct the path to the assembled file
-            safe_filename = os.path.basename(upload.filename)
-            temp_path = os.path.join(base_temp_dir, str(upload_id), safe_filename)
+            temp_path = assembled_upload_path(upload)
 
-            if not os.path.exists(temp_path):
-                # Fallback for older flat structure
-                temp_path = os.path.join(base_temp_dir, safe_filename)
-
-            if os.path.exists(temp_path):
+            if temp_path:
                 # Dispatch individual chapter task
-                task_process_chapter.delay(series_id, str(upload_id), temp_path)
+                task_process_chapter.apply_async(
+                    (series_id, str(upload_id), temp_path), {'interactive': True},
+                    **ingestion_options(True)
+                )
             else:
                 logger.error(f"Bulk process: temp file not found for upload {upload_id}")
                 upload.status = 'failed'
@@ -149,4 +311,3 @@ def task_bulk_process_chapters(series_id, upload_ids):
         except Exception as e:
             logger.error(f"Error dispatching bulk item {upload_id}: {e}")
             continue
-
@@ -0,0 +1,54 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.core.management import call_command, CommandError
+from catalog.benchmarks import synthetic_page, synthetic_pages, write_chapter
+from catalog.archives import ZipPageSource, PdfPageSource
+from catalog.models import Series, PageBlob
+from io import StringIO
+import json
+import os
+import shutil
+import tempfile
+
+
+class SyntheticChapterTests(SimpleTestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_pages_are_deterministic(self):
+        self.assertEqual(synthetic_page(300, 450, seed=3).tobytes(), synthetic_page(300, 450, seed=3).tobytes())
+        self.assertEqual(synthetic_page(300, 450, grayscale=True).mode, 'L')
+        self.assertEqual(synthetic_page(300, 450, grayscale=False).mode, 'RGB')
+
+    def test_archives_are_readable_by_page_sources(self):
+        pages = list(synthetic_pages(3, 300, 450))
+        for chapter_format, source_class in (('cbz', ZipPageSource), ('epub', ZipPageSource), ('pdf', PdfPageSource)):
+            path = write_chapter(os.path.join(self.work_dir, f"c.{chapter_format}"), chapter_format, pages)
+            with source_class(path) as source:
+                self.assertEqual(len(source), 3, chapter_format)
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_refuses_to_run_against_a_production_database(self):
+        with override_settings(DEBUG=False):
+            with self.assertRaises(CommandError):
+                call_command('benchmark_ingestion', pages=1, formats='cbz', stdout=StringIO())
+        self.assertFalse(Series.objects.exists())
+
+    @override_settings(DEBUG=True)
+    def test_reports_throughput_and_cleans_up(self):
+        out = StringIO()
+        call_command(
+            'benchmark_ingestion', pages=2, width=300, height=450, formats='cbz,pdf',
+            workers=1, json=True, stdout=out,
+        )
+
+        results = json.loads(out.getvalue())
+        self.assertEqual([r['format'] for r in results], ['cbz', 'pdf'])
+        self.assertEqual(results[0]['pages'], 2)
+        self.assertGreater(results[0]['pages_per_second'], 0)
+        self.assertGreater(results[0]['stages']['encode'], 0)
+        self.assertFalse(Series.objects.exists())
+        self.assertFalse(PageBlob.objects.exists())
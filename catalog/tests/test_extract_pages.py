@@ -0,0 +1,95 @@
+from django.test import TestCase, override_settings
+from django.core.files import File
+from django.core.management import call_command
+from catalog.models import Series, Chapter, Page, BackfillCursor
+from catalog.tests.test_services import make_zip
+from io import StringIO
+import os
+import shutil
+import tempfile
+
+TEST_MEDIA_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=TEST_MEDIA_DIR,
+    PAGE_TRANSCODE_WORKERS=1,
+    STORAGES={
+        "default": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+            "OPTIONS": {"location": TEST_MEDIA_DIR},
+        },
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+        },
+    }
+)
+class ExtractPagesCommandTests(TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.series = Series.objects.create(title="Backfill Series")
+        self.chapters = [self._chapter(number) for number in (1, 2, 3)]
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_MEDIA_DIR, ignore_errors=True)
+
+    def _chapter(self, number):
+        chapter = Chapter.objects.create(series=self.series, number=number)
+        path = make_zip(os.path.join(self.work_dir, f"chapter_{number}.cbz"), count=2, color=(number * 50, 20, 20))
+        with open(path, 'rb') as f:
+            chapter.source_file.save(os.path.basename(path), File(f), save=True)
+        return chapter
+
+    def _run(self, **options):
+        out = StringIO()
+        call_command('extract_pages', all=True, stdout=out, **options)
+        return out.getvalue()
+
+    def test_dry_run_lists_chapters_without_touching_them(self):
+        output = self._run(dry_run=True)
+
+        self.assertIn("Dry run: 3 chapters would be processed.", output)
+        self.assertFalse(Page.objects.exists())
+        self.assertFalse(BackfillCursor.objects.exists())
+
+    def test_resumes_from_the_saved_cursor(self):
+        output = self._run(limit=2, batch_size=1)
+        self.assertIn("[2/2]", output)
+        self.assertEqual(BackfillCursor.objects.get(name='extract_pages:missing').position, self.chapters[1].pk)
+
+        output = self._run(batch_size=1)
+        self.assertIn(f"resuming after chapter ID {self.chapters[1].pk}", output)
+        self.assertIn("Processed 1 chapters (0 failed), 2 pages", output)
+        self.assertEqual(Page.objects.count(), 6)
+
+    def test_stale_profile_reencodes_from_stored_pages(self):
+        self._run()
+        # Sources are deleted after extraction
+        self.assertFalse(Chapter.objects.exclude(source_file='').exclude(source_file__isnull=True).exists())
+        self.assertIn("Dry run: 0 chapters", self._run(stale_profile=True, dry_run=True))
+
+        with self.settings(PAGE_JPEG_QUALITY=70):
+            self.assertIn("Dry run: 3 chapters", self._run(stale_profile=True, dry_run=True))
+            output = self._run(stale_profile=True)
+            self.assertIn("Processed 3 chapters (0 failed), 6 pages", output)
+            self.assertIn("Dry run: 0 chapters", self._run(stale_profile=True, dry_run=True))
+
+        for chapter in Chapter.objects.all():
+            self.assertEqual(list(chapter.pages.values_list('page_number', flat=True).order_by('page_number')), [1, 2])
+            # The rebuilt source was deleted like an uploaded one
+            self.assertFalse(chapter.source_file)
+
+    def test_cursor_is_reset_after_a_complete_pass(self):
+        self._run(batch_size=1)
+        self.assertFalse(BackfillCursor.objects.exists())
+
+        output = self._run(force=True, batch_size=2)
+        self.assertIn("Processed 3 chapters (0 failed), 6 pages", output)
+        output = self._run(force=True, batch_size=2)
+        self.assertIn("Found 3 chapters to process...", output)
+        self.assertFalse(BackfillCursor.objects.exists())
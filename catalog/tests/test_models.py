@@ -1,6 +1,9 @@
 from django.test import TestCase, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from catalog.models import Series, Chapter, Page
+from io import BytesIO
+from PIL import Image
+import base64
 import os
 import tempfile
 import shutil
@@ -88,3 +91,23 @@ class CatalogModelDeleteTests(TestCase):
         
         # Verify file is deleted
         self.assertFalse(os.path.exists(path))
+
+    def test_series_cover_placeholder_follows_the_cover(self):
+        buffer = BytesIO()
+        Image.new('RGB', (300, 450), (30, 90, 200)).save(buffer, format='JPEG')
+        series = Series.objects.create(
+            title="Covered Series",
+            cover=SimpleUploadedFile('cover.jpg', buffer.getvalue(), content_type='image/jpeg'),
+        )
+
+        mime, data = series.cover_placeholder.split(';base64,')
+        self.assertIn(mime, ('data:image/webp', 'data:image/jpeg'))
+        with Image.open(BytesIO(base64.b64decode(data))) as preview:
+            self.assertLessEqual(preview.width, 20)
+        # The stored cover is complete despite being read for the preview
+        with Image.open(series.cover.path) as stored:
+            self.assertEqual(stored.size, (300, 450))
+
+        series.cover.delete(save=False)
+        series.save()
+        self.assertEqual(series.cover_placeholder, '')
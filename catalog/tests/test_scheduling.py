@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from administration.models import ChunkedUpload
+from catalog.models import Series
+from catalog.scheduling import enqueue_bulk_uploads, dispatch_queued_uploads, queue_positions
+from catalog.tasks import task_bulk_process_chapters
+from catalog.tests.test_services import make_zip
+from unittest import mock
+from datetime import timedelta
+import os
+import shutil
+import tempfile
+import uuid
+
+
+class FairShareSchedulingTests(TestCase):
+    def setUp(self):
+        self.media_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_dir, INGESTION_MAX_IN_FLIGHT=3, INGESTION_MAX_IN_FLIGHT_PER_JOB=2,
+            INGESTION_INTERACTIVE_MAX_CHAPTERS=1,
+        )
+        self.settings_override.enable()
+        User = get_user_model()
+        self.alice = User.objects.create_user(nickname='alice', email='alice@test.com', password='password', role_admin=True)
+        self.bob = User.objects.create_user(nickname='bob', email='bob@test.com', password='password', role_admin=True)
+        self.backlog = Series.objects.create(title="Backlog Series")
+        self.weekly = Series.objects.create(title="Weekly Series")
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_dir, ignore_errors=True)
+
+    def _uploads(self, user, count, zipped=False):
+        upload_ids = []
+        for number in range(1, count + 1):
+            upload = ChunkedUpload.objects.create(user=user, filename=f"chapter_{number}.cbz", total_chunks=1)
+            folder = os.path.join(self.media_dir, 'manga_temp_uploads', str(upload.upload_id))
+            os.makedirs(folder)
+            path = os.path.join(folder, upload.filename)
+            if zipped:
+                make_zip(path, count=2, color=(number * 40, 30, 30))
+            else:
+                open(path, 'wb').close()
+            upload_ids.append(str(upload.upload_id))
+        return upload_ids
+
+    def _dispatch(self):
+        with mock.patch('catalog.tasks.task_process_chapter.apply_async') as apply_async:
+            dispatch_queued_uploads()
+        return [call.args[0][1] for call in apply_async.call_args_list]
+
+    def test_dispatch_alternates_between_uploaders_within_caps(self):
+        alice_ids = self._uploads(self.alice, 5)
+        bob_ids = self._uploads(self.bob, 2)
+        enqueue_bulk_uploads(self.backlog.id, alice_ids)
+        enqueue_bulk_uploads(self.weekly.id, bob_ids)
+
+        self.assertEqual(self._dispatch(), [alice_ids[0], bob_ids[0], alice_ids[1]])
+        self.assertEqual(ChunkedUpload.objects.filter(status='dispatched').count(), 3)
+        # Global cap reached: nothing more until a chapter finishes
+        self.assertEqual(self._dispatch(), [])
+
+        positions = queue_positions()
+        self.assertEqual(positions[ChunkedUpload.objects.get(upload_id=bob_ids[1]).upload_id], 1)
+        self.assertEqual(len(positions), 4)
+
+        ChunkedUpload.objects.filter(upload_id=alice_ids[0]).update(status='completed')
+        self.assertEqual(self._dispatch(), [alice_ids[2]])
+
+    def test_bulk_job_is_processed_through_the_scheduler(self):
+        upload_ids = self._uploads(self.alice, 3, zipped=True)
+        with self.settings(INGESTION_MAX_IN_FLIGHT=1, PAGE_TRANSCODE_WORKERS=1):
+            task_bulk_process_chapters(self.backlog.id, upload_ids)
+
+        self.assertEqual(
+            list(ChunkedUpload.objects.filter(upload_id__in=upload_ids).values_list('status', flat=True)),
+            ['completed'] * 3,
+        )
+        self.assertEqual(self.backlog.chapters.count(), 3)
+
+    @override_settings(INGESTION_LEASE_SECONDS=3600)
+    def test_lost_chapters_release_their_slots(self):
+        alice_ids = self._uploads(self.alice, 4)
+        enqueue_bulk_uploads(self.backlog.id, alice_ids)
+        self.assertEqual(self._dispatch(), alice_ids[:2])
+        # Both workers were killed: the chapters never release their slots
+        ChunkedUpload.objects.filter(upload_id=alice_ids[0]).update(status='processing')
+        ChunkedUpload.objects.filter(upload_id__in=alice_ids[:2]).update(updated_at=timezone.now() - timedelta(hours=2))
+
+        # The periodic dispatch frees them
+        self.assertEqual(self._dispatch(), alice_ids[2:])
+        statuses = dict(ChunkedUpload.objects.values_list('upload_id', 'status'))
+        self.assertEqual([statuses[uuid.UUID(upload_id)] for upload_id in alice_ids], ['failed', 'failed', 'dispatched', 'dispatched'])
+
+    def test_dispatch_runs_periodically(self):
+        tasks = [entry['task'] for entry in settings.CELERY_BEAT_SCHEDULE.values()]
+        self.assertIn('catalog.tasks.task_dispatch_queued_uploads', tasks)
+
+    def test_progress_reports_queue_position(self):
+        alice_ids = self._uploads(self.alice, 4)
+        enqueue_bulk_uploads(self.backlog.id, alice_ids)
+        self._dispatch()
+
+        self.client.force_login(self.alice)
+        response = self.client.post(reverse('administration:upload_process_status'), {'upload_ids': ','.join(alice_ids)})
+        data = response.json()
+        self.assertEqual(data['status'], 'processing')
+        self.assertEqual((data['queued_chapters'], data['queue_position']), (2, 1))
+        self.assertIsNone(data['eta_seconds'])
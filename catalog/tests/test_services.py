@@ -0,0 +1,801 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+from catalog.models import Series, Chapter
+from django.contrib.auth import get_user_model
+from administration.models import ChunkedUpload
+from catalog.models import Page, PageBlob, is_page_blob_path
+from catalog.services import (
+    FileProcessor, PageTranscodePool, PageBatchWriter, generate_page_variants, plan_page_ranges, rebuild_chapter_source,
+)
+from catalog.archives import ZipPageSource, PdfPageSource, ConcatenatedReader, prefetch, materialize_source
+from catalog.imaging import transcode_page, estimate_jpeg_quality, segment_bounds, ImageTooLarge
+from django.core.management import call_command
+from unittest import mock
+from io import BytesIO, StringIO
+from PIL import Image, ImageChops, ImageDraw, ImageStat, JpegImagePlugin
+import math
+import json
+import multiprocessing
+import os
+import tempfile
+import shutil
+import zipfile
+import pypdf
+
+TEST_MEDIA_DIR = tempfile.mkdtemp()
+
+
+def transcode_in_daemon(results):
+    # Runs in a daemonic process, like a Celery prefork child
+    sources = [(i, make_image_bytes(), f"{i:03d}.png") for i in range(3)]
+    with PageTranscodePool(workers=2) as pool:
+        errors = [r[4] for r in pool.map(iter(sources))]
+        results.put((multiprocessing.current_process().daemon, pool._executor is not None, errors))
+
+
+def make_image_bytes(width=200, height=300, color=(200, 30, 30), fmt='PNG', **save_kwargs):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, format=fmt, **save_kwargs)
+    return buffer.getvalue()
+
+
+def make_line_art(width, height):
+    """Thin strokes on white, the worst case for downscaling artifacts."""
+    img = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(img)
+    for x in range(0, width, 37):
+        draw.line([(x, 0), (width - x, height)], fill=(20, 20, 20), width=3)
+    for y in range(0, height, 53):
+        draw.ellipse([y % width, y, y % width + 90, y + 60], outline=(90, 40, 40), width=3)
+    return img
+
+
+def psnr(a, b):
+    diff = ImageStat.Stat(ImageChops.difference(a, b))
+    mse = sum(rms ** 2 for rms in diff.rms) / len(diff.rms)
+    return 10 * math.log10(255 ** 2 / mse) if mse else float('inf')
+
+
+def make_zip(path, count=5, **image_kwargs):
+    with zipfile.ZipFile(path, 'w') as zf:
+        for i in range(count):
+            zf.writestr(f"{i + 1:03d}.png", make_image_bytes(**image_kwargs))
+    return path
+
+
+def make_pdf(path, count=3, width=200, height=300):
+    images = [Image.new('RGB', (width, height), (i * 40, 80, 120)) for i in range(count)]
+    images[0].save(path, format='PDF', save_all=True, append_images=images[1:])
+    return path
+
+
+def split_into_chunks(path, chunk_size):
+    """Replace `path` by its upload chunks (chunks/part_N next to it), as left by a chunked upload."""
+    chunk_dir = os.path.join(os.path.dirname(path), 'chunks')
+    os.makedirs(chunk_dir)
+    with open(path, 'rb') as f:
+        index = 0
+        while data := f.read(chunk_size):
+            with open(os.path.join(chunk_dir, f"part_{index}"), 'wb') as part:
+                part.write(data)
+            index += 1
+    os.unlink(path)
+    return path
+
+
+@override_settings(
+    MEDIA_ROOT=TEST_MEDIA_DIR,
+    STORAGES={
+        "default": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+            "OPTIONS": {"location": TEST_MEDIA_DIR},
+        },
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+        },
+    }
+)
+class FileProcessorTests(TestCase):
+    def setUp(self):
+        self.series = Series.objects.create(title="Ingestion Series")
+        self.chapter = Chapter.objects.create(series=self.series, number=1)
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        shutil.rmtree(os.path.join(TEST_MEDIA_DIR, 'scans_pages'), ignore_errors=True)
+        shutil.rmtree(os.path.join(TEST_MEDIA_DIR, 'pages'), ignore_errors=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_MEDIA_DIR, ignore_errors=True)
+
+    def test_zip_pages_saved_in_order(self):
+        path = make_zip(os.path.join(self.work_dir, 'chapter_1.cbz'), count=6, width=1600, height=2400)
+
+        with self.settings(PAGE_TRANSCODE_WORKERS=2):
+            FileProcessor()._extract_from_zip(self.chapter, path)
+
+        pages = list(self.chapter.pages.order_by('page_number'))
+        self.assertEqual([p.page_number for p in pages], [1, 2, 3, 4, 5, 6])
+        self.assertTrue(pages[0].image.name.startswith('pages/'))
+        with Image.open(pages[0].image.path) as img:
+            self.assertEqual(img.format, 'JPEG')
+            self.assertEqual(img.width, 1400)
+        self.assertEqual((pages[0].width, pages[0].height), (1400, 2100))
+
+    def test_responsive_derivatives_created(self):
+        path = make_zip(os.path.join(self.work_dir, 'chapter_1.cbz'), count=2, width=1000, height=1500)
+
+        with self.settings(PAGE_IMAGE_WIDTHS=[480, 800, 1400], PAGE_EXTRA_FORMATS=[], PAGE_TRANSCODE_WORKERS=1):
+            FileProcessor()._extract_from_zip(self.chapter, path)
+
+        page = self.chapter.pages.prefetch_related('derivatives').get(page_number=1)
+        derivatives = list(page.derivatives.all())
+        self.assertEqual(page.sources, [])
+        self.assertEqual([(d.width, d.height) for d in derivatives], [(480, 720), (800, 1200)])
+        self.assertTrue(derivatives[0].image.name.endswith('/w480.jpg'))
+        with Image.open(derivatives[1].image.path) as img:
+            self.assertEqual(img.size, (800, 1200))
+        self.assertEqual(page.width, 1000)
+        self.assertTrue(page.srcset.endswith(f"{page.image.url} 1000w"))
+        self.assertEqual(page.srcset.count('w, '), 2)
+
+        # Shared files outlive the page until the blob is garbage-collected
+        derivative_path = derivatives[0].image.path
+        blob = page.blob
+        self.chapter.pages.all().delete()
+        self.assertTrue(os.path.exists(derivative_path))
+        blob.refresh_from_db()
+        blob.delete()
+        self.assertFalse(os.path.exists(derivative_path))
+
+    def test_chunked_upload_is_ingested_in_place(self):
+        path = make_zip(os.path.join(self.work_dir, 'chapter_1.cbz'), count=4)
+        split_into_chunks(path, 1000)
+
+        with self.settings(PAGE_TRANSCODE_WORKERS=1):
+            FileProcessor()._process_from_path(self.chapter, path)
+
+        self.assertEqual(self.chapter.pages.count(), 4)
+        # Read from the chunks, never assembled
+        self.assertFalse(os.path.exists(path))
+
+    def test_reuploaded_file_is_not_ingested_again(self):
+        user = get_user_model().objects.create_user(nickname='uploader', email='up@test.com', password='password')
+        path = make_zip(os.path.join(self.work_dir, 'chapter_1.cbz'), count=3)
+        uploads = [
+            ChunkedUpload.objects.create(user=user, filename='chapter_1.cbz', total_chunks=1, file_digest='ab' * 32)
+            for _ in range(2)
+        ]
+
+        with self.settings(PAGE_TRANSCODE_WORKERS=1):
+            FileProcessor(upload_id=uploads[0].upload_id)._extract_from_zip(self.chapter, path)
+            self.chapter.refresh_from_db()
+            self.assertEqual(self.chapter.source_digest, 'ab' * 32)
+            page_ids = list(self.chapter.pages.values_list('pk', flat=True))
+
+            FileProcessor(upload_id=uploads[1].upload_id)._extract_from_zip(self.chapter, path)
+
+        self.assertEqual(list(self.chapter.pages.values_list('pk', flat=True)), page_ids)
+
+    def test_webp_variants_offered_as_picture_sources(self):
+        path = make_zip(os.path.join(self.work_dir, 'chapter_1.cbz'), count=1, width=1000, height=1500)
+
+        with self.settings(PAGE_IMAGE_WIDTHS=[480, 1400], PAGE_EXTRA_FORMATS=['webp'], PAGE_TRANSCODE_WORKERS=1):
+            FileProcessor()._extract_from_zip(self.chapter, path)
+
+        page = self.chapter.pages.prefetch_related('derivatives').get(page_number=1)
+        webp = page.derivatives.filter(format='webp').order_by('width')
+        self.assertEqual([d.width for d in webp], [480, 1000])
+        self.assertTrue(webp[1].image.name.endswith('/w1000.webp'))
+        with Image.open(webp[1].image.path) as img:
+            self.assertEqual(img.format, 'WEBP')
+        self.assertEqual(page.sources[0]['type'], 'image/webp')
+        self.assertTrue(page.sources[0]['srcset'].endswith('/w1000.webp 1000w'))
+        # The JPEG srcset stays the fallback for browsers without WebP
+        self.assertNotIn('.webp', page.srcset)
+
+    def test_generate_page_variants_backfills_missing_pairs(self):
+        with PageBatchWriter(self.chapter) as writer:
+            writer.add(1, '001.jpg', make_image_bytes(width=1000, height=1500, fmt='JPEG'))
+        page = self.chapter.pages.get()
+        self.assertIsNone(page.width)
+
+        profile = {'widths': [480, 1400], 'quality': 82, 'formats': ('webp',)}
+        created = generate_page_variants(page, profile)
+
+        page.refresh_from_db()
+        self.assertEqual((page.width, page.height), (1000, 1500))
+        self.assertEqual(created, page.derivatives.count())
+        self.assertIn((480, 'jpeg'), set(page.derivatives.values_list('width', 'format')))
+        self.assertEqual(generate_page_variants(page, profile), 0)
+
+    def test_variant_backfill_does_not_redo_checked_pages(self):
+        # Narrower than every derivative width: it never gets a variant
+        with PageBatchWriter(self.chapter) as writer:
+            writer.add(1, '001.jpg', make_image_bytes(width=300, height=450, fmt='JPEG'))
+
+        with self.settings(PAGE_IMAGE_WIDTHS=[480, 1400], PAGE_EXTRA_FORMATS=[]), \
+                mock.patch('catalog.management.commands.backfill_page_variants.generate_page_variants',
+                           wraps=generate_page_variants) as generate:
+            out = StringIO()
+            call_command('backfill_page_variants', stdout=out)
+            self.assertIn("1 pages processed, 0 variants created", out.getvalue())
+            out = StringIO()
+            call_command('backfill_page_variants', stdout=out)
+            self.assertIn("0 pages processed", out.getvalue())
+            call_command('backfill_page_variants', restart=True, stdout=StringIO())
+
+        self.assertEqual(generate.call_count, 2)
+        self.assertFalse(self.chapter.pages.get().derivatives.exists())
+
+    def test_generate_page_variants_persists_blob_variants(self):
+        other = Chapter.objects.create(series=self.series, number=2)
+        data = make_image_bytes(width=1000, height=1500, fmt='JPEG')
+        for chapter in (self.chapter, other):
+            with PageBatchWriter(chapter) as writer:
+                writer.add(1, '001.jpg', data, width=1000, height=1500, source_hash='b' * 64)
+        blob = PageBlob.objects.get()
+        self.assertEqual(blob.variants, [])
+
+        profile = {'widths': [480, 1400], 'quality': 82, 'formats': ('webp',)}
+        created = generate_page_variants(self.chapter.pages.get(), profile)
+
+        blob.refresh_from_db()
+        self.assertEqual({(v['width'], v['format']) for v in blob.variants}, {(480, 'jpeg'), (480, 'webp'), (1000, 'webp')})
+        self.assertTrue(all(is_page_blob_path(v['name']) for v in blob.variants))
+        self.assertEqual(created, 3)
+        # The page sharing the blob got the variants too
+        shared = other.pages.get()
+        self.assertEqual(shared.derivatives.count(), 3)
+        self.assertEqual(generate_page_variants(shared, profile), 0)
+
+    def test_in_batch_duplicate_blobs_are_stored_once(self):
+        data = make_image_bytes(fmt='JPEG')
+        storage = Page._meta.get_field('image').storage
+        with mock.patch.object(storage, 'save', wraps=storage.save) as save:
+            with PageBatchWriter(self.chapter) as writer:
+                # Two pages of the same source in one batch share one upload
+                writer.add(1, '001.jpg', data, source_hash='c' * 64)
+                writer.add(2, '002.jpg', data, source_hash='c' * 64)
+
+        self.assertEqual(save.call_count, 1)
+        self.assertEqual(writer.bytes_stored, len(data))
+        blob = PageBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(set(self.chapter.pages.values_list('image', flat=True)), {blob.image.name})
+
+    def test_rebuilt_source_stitches_segments_back(self):
+        with PageBatchWriter(self.chapter) as writer:
+            writer.add(1, '001.png', make_image_bytes(width=200, height=300), segment=0, segment_count=2)
+            writer.add(1, '001.png', make_image_bytes(width=200, height=100), segment=1, segment_count=2)
+            writer.add(2, '002.jpg', make_image_bytes(fmt='JPEG'))
+
+        self.assertTrue(rebuild_chapter_source(self.chapter))
+
+        with zipfile.ZipFile(self.chapter.source_file.path) as zf:
+            self.assertEqual(zf.namelist(), ['00001.png', '00002.jpg'])
+            with Image.open(BytesIO(zf.read('00001.png'))) as strip:
+                self.assertEqual(strip.size, (200, 400))
+
+    def test_reingest_reuses_stored_blobs(self):
+        path = make_zip(os.path.join(self.work_dir, 'chapter_1.cbz'), count=3, width=1000, height=1500)
+        other = Chapter.objects.create(series=self.series, number=2)
+
+        with self.settings(PAGE_IMAGE_WIDTHS=[480, 1400], PAGE_TRANSCODE_WORKERS=1):
+            FileProcessor()._extract_from_zip(self.chapter, path)
+            blob = PageBlob.objects.get()
+            self.assertEqual(blob.ref_count, 3)
+
+            # Re-upload of the same chapter, then the same credit pages in another chapter
+            with mock.patch('catalog.services.transcode_page') as transcode:
+                FileProcessor()._extract_from_zip(self.chapter, path)
+                FileProcessor()._extract_from_zip(other, path)
+            transcode.assert_not_called()
+
+        blob.refresh_from_db()
+        self.assertEqual(PageBlob.objects.count(), 1)
+        self.assertEqual(blob.ref_count, 6)
+        page = other.pages.get(page_number=2)
+        self.assertEqual(page.image.name, blob.image.name)
+        self.assertEqual((page.width, page.height), (1000, 1500))
+        self.assertEqual(page.derivatives.count(), len(blob.variants))
+
+        other.pages.all().delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 3)
+        self.assertTrue(os.path.exists(blob.image.path))
+
+    def test_gc_deletes_only_expired_unreferenced_blobs(self):
+        with PageBatchWriter(self.chapter) as writer:
+            writer.add(1, '001.jpg', make_image_bytes(fmt='JPEG'), source_hash='a' * 64)
+        blob = PageBlob.objects.get()
+        self.chapter.pages.all().delete()
+
+        call_command('gc_page_blobs', stdout=StringIO())
+        self.assertTrue(PageBlob.objects.filter(pk=blob.pk).exists())
+
+        call_command('gc_page_blobs', grace_hours=0, stdout=StringIO())
+        self.assertFalse(PageBlob.objects.filter(pk=blob.pk).exists())
+        self.assertFalse(os.path.exists(os.path.join(TEST_MEDIA_DIR, blob.image.name)))
+
+    def test_interrupted_ingestion_resumes_from_checkpoint(self):
+        path = os.path.join(self.work_dir, 'chapter_1.cbz')
+        with zipfile.ZipFile(path, 'w') as zf:
+            for i in range(6):
+                zf.writestr(f"{i + 1:03d}.png", make_image_bytes(color=(i * 40, 10, 10)))
+
+        original_add = PageBatchWriter.add
+
+        def failing_add(writer, page_number, *args, **kwargs):
+            if page_number == 5:
+                raise RuntimeError("worker killed")
+            return original_add(writer, page_number, *args, **kwargs)
+
+        with self.settings(PAGE_DB_BATCH_SIZE=2, PAGE_TRANSCODE_WORKERS=1):
+            with mock.patch.object(PageBatchWriter, 'add', failing_add):
+                with self.assertRaises(RuntimeError):
+                    FileProcessor()._extract_from_zip(self.chapter, path)
+
+            self.chapter.refresh_from_db()
+            self.assertEqual(self.chapter.ingest_checkpoint, 4)
+            first_ids = list(self.chapter.pages.order_by('page_number').values_list('id', flat=True))
+            self.assertEqual(len(first_ids), 4)
+
+            with mock.patch('catalog.services.transcode_page', wraps=transcode_page) as transcode:
+                FileProcessor()._extract_from_zip(self.chapter, path)
+            self.assertEqual(transcode.call_count, 2)
+
+        pages = list(self.chapter.pages.order_by('page_number'))
+        self.assertEqual([p.page_number for p in pages], [1, 2, 3, 4, 5, 6])
+        self.assertEqual([p.id for p in pages[:4]], first_ids)
+        self.chapter.refresh_from_db()
+        self.assertEqual((self.chapter.ingest_fingerprint, self.chapter.ingest_checkpoint), ('', 0))
+
+    def test_checkpoint_stops_before_a_page_that_failed_to_upload(self):
+        storage = Page._meta.get_field('image').storage
+        original_save = storage.save
+
+        def failing_save(name, content, **kwargs):
+            if name.endswith('002.png'):
+                raise OSError("storage unavailable")
+            return original_save(name, content, **kwargs)
+
+        checkpoints = []
+        with mock.patch.object(storage, 'save', side_effect=failing_save):
+            with PageBatchWriter(self.chapter, batch_size=2) as writer:
+                writer.on_flush = lambda saved_count: checkpoints.append(writer.last_page_number)
+                for i in range(4):
+                    writer.add(i + 1, f"{i + 1:03d}.png", make_image_bytes())
+
+        self.assertEqual(sorted(self.chapter.pages.values_list('page_number', flat=True)), [1, 3, 4])
+        # Resuming must redo page 2: the checkpoint never moves past it
+        self.assertEqual(checkpoints, [1, 1])
+
+    def test_webtoon_pages_record_color_mode_but_keep_rgb(self):
+        self.series.type = 'webtoon'
+        self.series.save()
+        path = make_zip(os.path.join(self.work_dir, 'chapter_1.cbz'), count=1, color=(128, 128, 128))
+
+        FileProcessor()._extract_from_zip(self.chapter, path)
+
+        page = self.chapter.pages.get()
+        self.assertEqual(page.color_mode, 'gray')
+        with Image.open(page.image.path) as img:
+            self.assertEqual(img.mode, 'RGB')
+
+    def test_tall_webtoon_strips_are_stored_as_segments(self):
+        self.series.type = 'webtoon'
+        self.series.save()
+        path = os.path.join(self.work_dir, 'chapter_1.cbz')
+        with zipfile.ZipFile(path, 'w') as zf:
+            zf.writestr('001.png', make_image_bytes(width=400, height=2400))
+            zf.writestr('002.png', make_image_bytes(width=400, height=600, color=(20, 30, 200)))
+        other = Chapter.objects.create(series=self.series, number=2)
+
+        with self.settings(PAGE_SEGMENT_HEIGHT=1000, PAGE_IMAGE_WIDTHS=[1400], PAGE_DB_BATCH_SIZE=1,
+                           PAGE_TRANSCODE_WORKERS=1):
+            FileProcessor()._extract_from_zip(self.chapter, path)
+            with mock.patch('catalog.services.transcode_page') as transcode:
+                FileProcessor()._extract_from_zip(other, path)
+            transcode.assert_not_called()
+
+        for chapter in (self.chapter, other):
+            rows = list(chapter.pages.values_list('page_number', 'segment', 'height'))
+            self.assertEqual(rows, [(1, 0, 1000), (1, 1, 1400), (2, 0, 600)])
+            self.assertEqual(chapter.page_count, 2)
+        self.assertEqual(PageBlob.objects.get(height=1000).segment_count, 2)
+
+    def test_pages_record_size_and_dominant_color(self):
+        path = make_zip(os.path.join(self.work_dir, 'chapter_1.cbz'), count=2, color=(20, 40, 200))
+        other = Chapter.objects.create(series=self.series, number=2)
+
+        with self.settings(PAGE_TRANSCODE_WORKERS=1):
+            FileProcessor()._extract_from_zip(self.chapter, path)
+            FileProcessor()._extract_from_zip(other, path)
+
+        for page in Page.objects.all():
+            self.assertEqual(page.file_size, page.image.size)
+            self.assertEqual((page.width, page.height), (200, 300))
+            red, green, blue = (int(page.dominant_color[i:i + 2], 16) for i in (1, 3, 5))
+            self.assertTrue(red < 60 and green < 80 and blue > 160, page.dominant_color)
+            self.assertTrue(page.placeholder.startswith('data:image/'))
+            self.assertLess(len(page.placeholder), 1000)
+
+    def test_backfill_page_metadata_fills_legacy_pages(self):
+        path = make_zip(os.path.join(self.work_dir, 'chapter_1.cbz'), count=2, color=(250, 250, 250))
+        with self.settings(PAGE_TRANSCODE_WORKERS=1):
+            FileProcessor()._extract_from_zip(self.chapter, path)
+        Page.objects.update(width=None, height=None, file_size=None, dominant_color='', placeholder='')
+        PageBlob.objects.update(file_size=None, dominant_color='', placeholder='')
+
+        out = StringIO()
+        call_command('backfill_page_metadata', stdout=out)
+
+        self.assertIn("2 pages updated, 0 failed", out.getvalue())
+        for page in Page.objects.all():
+            self.assertEqual((page.width, page.height, page.file_size), (200, 300, page.image.size))
+            self.assertEqual(page.dominant_color, page.blob.dominant_color)
+            self.assertEqual(page.placeholder, page.blob.placeholder)
+            self.assertTrue(page.placeholder.startswith('data:image/'))
+            self.assertTrue(page.dominant_color.startswith('#f'))
+
+    def test_pages_over_the_pixel_budget_are_refused(self):
+        path = os.path.join(self.work_dir, 'chapter_1.cbz')
+        with zipfile.ZipFile(path, 'w') as zf:
+            zf.writestr('001.png', make_image_bytes())
+            zf.writestr('002.png', make_image_bytes(width=400, height=3000))
+            zf.writestr('003.png', make_image_bytes())
+
+        processor = FileProcessor()
+        with self.settings(PAGE_MAX_DECODED_PIXELS=1_000_000, PAGE_TRANSCODE_WORKERS=1), \
+                mock.patch('catalog.services.transcode_page', wraps=transcode_page) as transcode:
+            processor._extract_from_zip(self.chapter, path)
+
+        self.assertEqual(list(self.chapter.pages.values_list('page_number', flat=True)), [1, 3])
+        # Refused from the entry's header: never read nor decoded
+        self.assertEqual(transcode.call_count, 2)
+        self.assertEqual(processor.metrics['pages_too_large'], 1)
+        self.assertGreater(processor.metrics['peak_rss_bytes'], 0)
+
+    def test_transcode_pool_falls_back_to_raw_on_bad_image(self):
+        sources = [
+            (0, make_image_bytes(), 'a.png'),
+            (1, b'not an image', 'b.png'),
+            (2, make_image_bytes(), 'c.png'),
+        ]
+        with PageTranscodePool(workers=1) as pool:
+            results = list(pool.map(iter(sources)))
+
+        self.assertEqual([r[0] for r in results], [0, 1, 2])
+        self.assertIsNone(results[0][4])
+        self.assertIsNotNone(results[1][4])
+        self.assertEqual(results[1][2], b'not an image')
+
+    def test_transcode_pool_runs_in_daemonic_process(self):
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        process = context.Process(target=transcode_in_daemon, args=(results,), daemon=True)
+        process.start()
+        try:
+            daemon, pooled, errors = results.get(timeout=120)
+        finally:
+            process.join(10)
+
+        self.assertTrue(daemon)
+        self.assertTrue(pooled)
+        self.assertEqual(errors, [None, None, None])
+
+    def test_pdf_is_parsed_once(self):
+        path = make_pdf(os.path.join(self.work_dir, 'chapter_1.pdf'), count=4)
+
+        with mock.patch('catalog.archives.pypdf.PdfReader', wraps=pypdf.PdfReader) as reader_cls:
+            FileProcessor()._extract_from_pdf(self.chapter, path)
+
+        self.assertEqual(reader_cls.call_count, 1)
+        self.assertEqual(self.chapter.pages.count(), 4)
+
+    def test_pdf_images_are_decoded_once(self):
+        path = make_pdf(os.path.join(self.work_dir, 'chapter_1.pdf'), count=3)
+        get_image = pypdf.PageObject._get_image
+        with mock.patch.object(pypdf.PageObject, '_get_image', autospec=True, side_effect=get_image) as decode:
+            with PdfPageSource(path) as source:
+                self.assertEqual(len(source), 3)
+                self.assertEqual(decode.call_count, 0)
+                pages = list(source)
+
+        self.assertEqual(decode.call_count, 3)
+        self.assertEqual([index for index, _data, _name in pages], [0, 1, 2])
+        self.assertTrue(all(os.path.splitext(name)[1] for _index, _data, name in pages))
+
+    def test_batched_persistence_reports_progress(self):
+        user = get_user_model().objects.create_user(nickname='uploader', email='up@test.com', password='password')
+        upload = ChunkedUpload.objects.create(user=user, filename='chapter_1.cbz', total_chunks=1)
+        path = make_zip(os.path.join(self.work_dir, 'chapter_1.cbz'), count=5)
+
+        with self.settings(PAGE_DB_BATCH_SIZE=2, PAGE_TRANSCODE_WORKERS=1):
+            FileProcessor(upload_id=upload.upload_id)._extract_from_zip(self.chapter, path)
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.total_files_to_process, 5)
+        self.assertEqual(upload.processed_files, 5)
+        self.assertEqual(self.chapter.pages.count(), 5)
+
+    def test_ingestion_metrics_are_persisted_and_logged(self):
+        user = get_user_model().objects.create_user(nickname='uploader', email='up@test.com', password='password')
+        upload = ChunkedUpload.objects.create(user=user, filename='chapter_1.cbz', total_chunks=1)
+        path = make_zip(os.path.join(self.work_dir, 'chapter_1.cbz'), count=3)
+
+        with self.settings(PAGE_TRANSCODE_WORKERS=1), self.assertLogs('catalog.metrics', 'INFO') as logs:
+            FileProcessor(upload_id=upload.upload_id)._extract_from_zip(self.chapter, path)
+
+        upload.refresh_from_db()
+        metrics = upload.ingest_metrics
+        self.assertEqual(metrics['chapter_id'], self.chapter.pk)
+        self.assertEqual((metrics['pages_total'], metrics['pages_saved']), (3, 3))
+        with zipfile.ZipFile(path) as zf:
+            # Counted in the prefetch thread: every page's bytes, none lost
+            self.assertEqual(metrics['bytes_read'], sum(info.file_size for info in zf.infolist()))
+        self.assertGreater(metrics['bytes_stored'], 0)
+        self.assertTrue({'read', 'decode', 'encode', 'store', 'db'} <= set(metrics['stages']))
+
+        event = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(event['event'], 'chapter_ingested')
+        self.assertEqual(event['upload_id'], str(upload.upload_id))
+        self.assertEqual(event['pages_saved'], 3)
+
+    def test_large_chapter_fans_out_into_page_ranges(self):
+        from catalog.tasks import task_process_chapter
+
+        user = get_user_model().objects.create_user(nickname='uploader', email='up@test.com', password='password')
+        upload = ChunkedUpload.objects.create(user=user, filename='chapter_7.cbz', total_chunks=1, file_digest='cd' * 32)
+        path = make_zip(os.path.join(self.work_dir, 'chapter_7.cbz'), count=5)
+
+        with self.settings(PAGE_FANOUT_THRESHOLD=4, PAGE_FANOUT_RANGE_SIZE=2, PAGE_TRANSCODE_WORKERS=1):
+            self.assertEqual(plan_page_ranges(path), [(0, 2), (2, 4), (4, 5)])
+            task_process_chapter.delay(self.series.id, str(upload.upload_id), path)
+
+        chapter = self.series.chapters.get(number=7)
+        self.assertEqual(list(chapter.pages.order_by('page_number').values_list('page_number', flat=True)), [1, 2, 3, 4, 5])
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'completed')
+        self.assertEqual((upload.total_files_to_process, upload.processed_files), (5, 5))
+        self.assertEqual(upload.ingest_metrics['ranges'], 3)
+        self.assertEqual(upload.ingest_metrics['pages_saved'], 5)
+        self.assertEqual(upload.ingest_metrics['pages_missing'], 0)
+        # An unchanged re-upload of the chapter will be skipped
+        self.assertEqual(chapter.source_digest, 'cd' * 32)
+        self.series.refresh_from_db()
+        self.assertEqual(self.series.chapters_count, 2)
+        self.assertFalse(os.path.exists(path))
+
+    def test_small_chapter_is_not_split(self):
+        path = make_zip(os.path.join(self.work_dir, 'chapter_1.cbz'), count=3)
+        with self.settings(PAGE_FANOUT_THRESHOLD=4, PAGE_FANOUT_RANGE_SIZE=2):
+            self.assertIsNone(plan_page_ranges(path))
+        with self.settings(PAGE_FANOUT_THRESHOLD=0):
+            self.assertIsNone(plan_page_ranges(path))
+
+    def test_page_range_can_be_retried(self):
+        path = make_zip(os.path.join(self.work_dir, 'chapter_1.cbz'), count=5)
+        with self.settings(PAGE_TRANSCODE_WORKERS=1):
+            FileProcessor().process_page_range(self.chapter, path, 2, 4)
+            metrics = FileProcessor().process_page_range(self.chapter, path, 2, 4)
+
+        self.assertEqual(list(self.chapter.pages.order_by('page_number').values_list('page_number', flat=True)), [3, 4])
+        self.assertEqual((metrics['pages_total'], metrics['pages_saved']), (2, 2))
+
+    def test_batch_writer_keeps_valid_rows_on_conflict(self):
+        Page.objects.create(chapter=self.chapter, page_number=2, image='scans_pages/existing.jpg')
+
+        with PageBatchWriter(self.chapter, batch_size=10) as writer:
+            for number in (1, 2, 3):
+                writer.add(number, f"{number:03d}.jpg", make_image_bytes(fmt='JPEG'))
+
+        self.assertEqual(writer.saved_count, 2)
+        self.assertEqual(
+            list(self.chapter.pages.order_by('page_number').values_list('page_number', flat=True)),
+            [1, 2, 3],
+        )
+        self.assertFalse(os.path.exists(os.path.join(TEST_MEDIA_DIR, 'scans_pages', self.series.slug, 'chapter_1', '002.jpg')))
+
+
+class PageSourceTests(SimpleTestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_zip_source_lists_images_in_order(self):
+        path = os.path.join(self.work_dir, 'c.cbz')
+        with zipfile.ZipFile(path, 'w') as zf:
+            zf.writestr('b/002.png', b'2')
+            zf.writestr('b/001.png', b'1')
+            zf.writestr('__MACOSX/b/._001.png', b'x')
+            zf.writestr('notes.txt', b'x')
+
+        with ZipPageSource(path) as source:
+            self.assertEqual(len(source), 2)
+            self.assertEqual(list(source), [(0, b'1', '001.png'), (1, b'2', '002.png')])
+
+    def test_concatenated_reader_seeks_across_parts(self):
+        data = b'0123456789'
+        paths = []
+        for i, part in enumerate((data[:3], b'', data[3:8], data[8:])):
+            paths.append(os.path.join(self.work_dir, f"part_{i}"))
+            with open(paths[-1], 'wb') as f:
+                f.write(part)
+
+        with ConcatenatedReader(paths) as reader:
+            self.assertEqual(reader.read(), data)
+            reader.seek(2)
+            self.assertEqual(reader.read(5), b'23456')
+            self.assertEqual(reader.tell(), 7)
+            reader.seek(-4, os.SEEK_END)
+            self.assertEqual(reader.read(10), b'6789')
+            self.assertEqual(reader.read(1), b'')
+
+    def test_archives_are_read_from_upload_chunks(self):
+        os.makedirs(os.path.join(self.work_dir, 'zip'))
+        os.makedirs(os.path.join(self.work_dir, 'pdf'))
+        zip_path = make_zip(os.path.join(self.work_dir, 'zip', 'c.cbz'), count=3)
+        with ZipPageSource(zip_path) as source:
+            expected = list(source)
+        with open(zip_path, 'rb') as f:
+            zip_bytes = f.read()
+        split_into_chunks(zip_path, 500)
+        with ZipPageSource(zip_path) as source:
+            self.assertEqual(list(source), expected)
+
+        pdf_path = make_pdf(os.path.join(self.work_dir, 'pdf', 'c.pdf'), count=2)
+        split_into_chunks(pdf_path, 700)
+        with PdfPageSource(pdf_path) as source:
+            self.assertEqual(len(list(source)), 2)
+
+        # Readers needing a real path get the chunks assembled
+        self.assertEqual(materialize_source(zip_path), zip_path)
+        with open(zip_path, 'rb') as f:
+            self.assertEqual(f.read(), zip_bytes)
+
+    def test_prefetch_keeps_order_and_reraises(self):
+        self.assertEqual(list(prefetch(iter(range(20)), size=3)), list(range(20)))
+
+        def failing():
+            yield 1
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            list(prefetch(failing(), size=2))
+
+
+class TranscodePageTests(SimpleTestCase):
+    profile = {'widths': (480, 1400), 'quality': 82, 'formats': (), 'passthrough': True, 'grayscale': True}
+
+    def test_estimates_jpeg_quality_from_header(self):
+        for quality in (50, 75, 90):
+            with Image.open(BytesIO(make_image_bytes(fmt='JPEG', quality=quality))) as img:
+                self.assertAlmostEqual(estimate_jpeg_quality(img), quality, delta=2)
+
+    def test_optimized_jpeg_is_kept_byte_for_byte(self):
+        data = make_image_bytes(width=1000, height=1500, fmt='JPEG', quality=80)
+        result = transcode_page(data, self.profile)
+
+        self.assertEqual(result['color_mode'], 'color')
+        self.assertTrue(result['passthrough'])
+        self.assertEqual(result['data'], data)
+        self.assertEqual((result['width'], result['height']), (1000, 1500))
+        self.assertEqual([(d['format'], d['width']) for d in result['derivatives']], [('jpeg', 480)])
+
+    def test_jpeg_outside_profile_is_reencoded(self):
+        for data in (
+            make_image_bytes(width=1000, height=1500, fmt='JPEG', quality=95),
+            make_image_bytes(width=1600, height=2400, fmt='JPEG', quality=80),
+        ):
+            result = transcode_page(data, self.profile)
+            self.assertFalse(result['passthrough'])
+            self.assertNotEqual(result['data'], data)
+            self.assertLessEqual(result['width'], 1400)
+
+        data = make_image_bytes(width=1000, height=1500, fmt='JPEG', quality=80)
+        self.assertFalse(transcode_page(data, dict(self.profile, passthrough=False))['passthrough'])
+
+    def test_draft_downscaling_matches_full_decode_quality(self):
+        buffer = BytesIO()
+        make_line_art(2800, 4200).save(buffer, format='JPEG', quality=95)
+        data = buffer.getvalue()
+        profile = {'widths': (700,), 'quality': 82, 'formats': (), 'passthrough': True, 'grayscale': False}
+
+        draft = JpegImagePlugin.JpegImageFile.draft
+        decoded_sizes = []
+
+        def spy(img, mode, size):
+            draft(img, mode, size)
+            decoded_sizes.append(img.size)
+
+        with mock.patch.object(JpegImagePlugin.JpegImageFile, 'draft', spy), \
+                mock.patch('catalog.imaging.detect_color_mode', return_value='color'):
+            result = transcode_page(data, profile)
+        # Decoded at half scale, not at 2800px
+        self.assertEqual(decoded_sizes, [(1400, 2100)])
+
+        # Previous pipeline: full-resolution decode + LANCZOS, then the same JPEG encode
+        with Image.open(BytesIO(data)) as img:
+            reference = img.convert('RGB').resize((700, 1050), Image.LANCZOS)
+        baseline = BytesIO()
+        reference.save(baseline, format='JPEG', quality=82, optimize=True)
+
+        with Image.open(BytesIO(result['data'])) as out, Image.open(baseline) as old:
+            self.assertEqual(out.size, (700, 1050))
+            self.assertGreater(psnr(out.convert('RGB'), reference), psnr(old.convert('RGB'), reference) - 1.5)
+
+    def test_bw_pages_are_encoded_single_channel(self):
+        buffer = BytesIO()
+        make_line_art(1000, 1500).convert('L').convert('RGB').save(buffer, format='JPEG', quality=80)
+        result = transcode_page(buffer.getvalue(), self.profile)
+
+        self.assertEqual(result['color_mode'], 'gray')
+        # 3-channel B&W source no longer meets the profile: re-encoded as L
+        self.assertFalse(result['passthrough'])
+        with Image.open(BytesIO(result['data'])) as img:
+            self.assertEqual(img.mode, 'L')
+        with Image.open(BytesIO(result['derivatives'][0]['data'])) as img:
+            self.assertEqual(img.mode, 'L')
+
+        kept_rgb = transcode_page(buffer.getvalue(), dict(self.profile, grayscale=False))
+        self.assertEqual(kept_rgb['color_mode'], 'gray')
+        self.assertTrue(kept_rgb['passthrough'])
+
+    def test_segment_bounds_merge_short_tail(self):
+        self.assertEqual(segment_bounds(3000, 2048), [])
+        self.assertEqual(segment_bounds(5000, 2048), [(0, 2048), (2048, 5000)])
+        self.assertEqual(segment_bounds(5500, 2048), [(0, 2048), (2048, 4096), (4096, 5500)])
+        self.assertEqual(segment_bounds(20000, 0), [])
+
+    def test_tall_strip_is_split_after_resizing(self):
+        profile = dict(self.profile, segment_height=1000)
+        result = transcode_page(make_image_bytes(width=2800, height=7000, fmt='JPEG', quality=80), profile)
+
+        self.assertFalse(result['passthrough'])
+        self.assertEqual([(s['width'], s['height']) for s in result['segments']], [(1400, 1000)] * 3 + [(1400, 500)])
+        self.assertEqual(result['data'], result['segments'][0]['data'])
+        for segment in result['segments']:
+            self.assertEqual([d['width'] for d in segment['derivatives']], [480])
+            with Image.open(BytesIO(segment['data'])) as img:
+                self.assertEqual(img.size, (segment['width'], segment['height']))
+
+        short = transcode_page(make_image_bytes(width=1000, height=1500, fmt='JPEG', quality=80), profile)
+        self.assertNotIn('segments', short)
+        self.assertTrue(short['passthrough'])
+
+    def test_pixel_budget_counts_decoded_pixels(self):
+        with self.assertRaises(ImageTooLarge):
+            transcode_page(make_image_bytes(width=400, height=3000), dict(self.profile, max_pixels=1_000_000))
+
+        # A 2800px JPEG is decoded at half scale for a 700px profile
+        buffer = BytesIO()
+        make_line_art(2800, 4200).save(buffer, format='JPEG', quality=95)
+        profile = dict(self.profile, widths=(700,), max_pixels=3_000_000)
+        self.assertEqual(transcode_page(buffer.getvalue(), profile)['width'], 700)
+
+    def test_banded_resize_matches_whole_image(self):
+        buffer = BytesIO()
+        make_line_art(1600, 6000).convert('RGBA').save(buffer, format='PNG')
+        data = buffer.getvalue()
+        profile = dict(self.profile, grayscale=False)
+
+        whole = transcode_page(data, profile)
+        with mock.patch('catalog.imaging.BAND_PIXELS', 500_000):
+            banded = transcode_page(data, profile)
+
+        with Image.open(BytesIO(whole['data'])) as a, Image.open(BytesIO(banded['data'])) as b:
+            self.assertEqual(a.size, (1400, 5250))
+            self.assertEqual(b.size, a.size)
+            self.assertGreater(psnr(a.convert('RGB'), b.convert('RGB')), 40)
+
+    def test_colour_pages_keep_rgb(self):
+        result = transcode_page(make_image_bytes(width=600, height=900), self.profile)
+        self.assertEqual(result['color_mode'], 'color')
+        with Image.open(BytesIO(result['data'])) as img:
+            self.assertEqual(img.mode, 'RGB')
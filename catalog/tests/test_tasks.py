@@ -0,0 +1,84 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from administration.models import ChunkedUpload
+from catalog.models import Series
+from catalog.tasks import task_bulk_process_chapters, ingestion_options
+from config.celery import app
+from unittest import mock
+import os
+import shutil
+import tempfile
+
+
+class TaskRoutingTests(TestCase):
+    def setUp(self):
+        self.media_dir = tempfile.mkdtemp()
+        self.series = Series.objects.create(title="Routing Series")
+        self.user = get_user_model().objects.create_user(nickname='uploader', email='up@test.com', password='password')
+
+    def tearDown(self):
+        shutil.rmtree(self.media_dir, ignore_errors=True)
+
+    def _upload(self, number):
+        upload = ChunkedUpload.objects.create(user=self.user, filename=f"chapter_{number}.cbz", total_chunks=1)
+        folder = os.path.join(self.media_dir, 'manga_temp_uploads', str(upload.upload_id))
+        os.makedirs(folder)
+        open(os.path.join(folder, upload.filename), 'wb').close()
+        return str(upload.upload_id)
+
+    def _dispatched_options(self, upload_ids):
+        with override_settings(MEDIA_ROOT=self.media_dir), \
+                mock.patch('catalog.tasks.task_process_chapter.apply_async') as apply_async:
+            task_bulk_process_chapters(self.series.id, upload_ids)
+        return [(call.kwargs['queue'], call.kwargs['priority'], call.args[1]) for call in apply_async.call_args_list]
+
+    def test_tasks_are_routed_to_their_queue(self):
+        router = app.amqp.router
+        self.assertEqual(router.route({}, 'core.tasks.task_send_welcome_email')['queue'].name, 'email')
+        self.assertEqual(router.route({}, 'social.tasks.task_process_story_media')['queue'].name, 'media')
+        self.assertEqual(router.route({}, 'catalog.tasks.task_bulk_process_chapters')['queue'].name, 'ingestion-bulk')
+
+    def test_single_chapter_upload_is_interactive(self):
+        self.assertEqual(
+            self._dispatched_options([self._upload(1)]),
+            [('ingestion-interactive', 0, {'interactive': True})],
+        )
+
+    def test_bulk_upload_uses_bulk_queue_with_lower_priority(self):
+        with self.settings(INGESTION_MAX_IN_FLIGHT_PER_JOB=3, INGESTION_MAX_IN_FLIGHT=3):
+            options = self._dispatched_options([self._upload(n) for n in (1, 2, 3)])
+        self.assertEqual(options, [('ingestion-bulk', 6, {'interactive': False})] * 3)
+        self.assertGreater(ingestion_options(False)['priority'], ingestion_options(True)['priority'])
+
+    def test_direct_upload_is_downloaded_by_the_worker(self):
+        from administration.upload_service import DirectUploadService
+        from catalog.tasks import task_process_chapter, assembled_upload_path
+
+        upload = ChunkedUpload.objects.create(
+            user=self.user, filename='chapter_4.cbz', total_chunks=1, status='completed',
+            storage_key='uploads/x/chapter_4.cbz', storage_upload_id='mpu-1',
+        )
+
+        def download(upload, dest_path):
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            with open(dest_path, 'wb') as f:
+                f.write(b'archive')
+
+        def process(series_id, temp_file_path, upload_id=None):
+            with open(temp_file_path, 'rb') as f:
+                self.assertEqual(f.read(), b'archive')
+            return mock.Mock(number=4)
+
+        with override_settings(MEDIA_ROOT=self.media_dir, PAGE_FANOUT_THRESHOLD=0), \
+                mock.patch.object(DirectUploadService, 'download', side_effect=download), \
+                mock.patch.object(DirectUploadService, 'delete_stored') as delete_stored, \
+                mock.patch('catalog.tasks.process_single_chapter_from_temp', side_effect=process):
+            # Not on local disk: the dispatch trusts the worker to fetch it
+            temp_path = assembled_upload_path(upload)
+            self.assertFalse(os.path.exists(temp_path))
+            task_process_chapter(self.series.id, str(upload.upload_id), temp_path)
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'completed')
+        delete_stored.assert_called_once()
+        self.assertFalse(os.path.exists(temp_path))
@@ -59,7 +59,7 @@ def catalog_index(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
-    trending_series = Series.objects.only('id', 'title', 'cover', 'views_count').all().order_by('-views_count')[:5]
+    trending_series = Series.objects.only('id', 'title', 'cover', 'cover_placeholder', 'views_count').all().order_by('-views_count')[:5]
     
     return render(request, 'catalog/index.html', {
         'page_obj': page_obj,
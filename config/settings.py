@@ -297,7 +297,7 @@ SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'SAMEORIGIN'
 
 # Versioning for cache busting 
-STATIC_VERSION = '2.10.71'
+STATIC_VERSION = '2.10.76'
 
 # Admin bootstrap via secret passphrase on registration
 ADMIN_BOOTSTRAP_PASSPHRASE = config('ADMIN_BOOTSTRAP_PASSPHRASE', default='Nefe')
@@ -491,7 +491,7 @@ SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'SAMEORIGIN'
 
 # Versioning for cache busting 
-STATIC_VERSION = '2.10.71'
+STATIC_VERSION = '2.10.76'
 
 # Admin bootstrap via secret passphrase on registration
 ADMIN_BOOTSTRAP_PASSPHRASE = config('ADMIN_BOOTSTRAP_PASSPHRASE', default='Nefe')
@@ -520,6 +520,101 @@ CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 min hard limit per task
 CELERY_TASK_SOFT_TIME_LIMIT = 25 * 60  # 25 min soft limit (raises SoftTimeLimitExceeded)
 # Graceful fallback: if Celery/Redis unavailable, tasks run synchronously
 CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default='True', cast=bool)
+# Named queues, one worker profile each (see Procfile): heavy ingestion never
+# delays emails and story media, and single-chapter uploads skip bulk backlogs.
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_ROUTES = {
+    # Short scheduling task: must not wait behind chapters
+    'catalog.tasks.task_dispatch_queued_uploads': {'queue': 'default'},
+    # Default for ingestion; interactive dispatches override it (catalog.tasks.ingestion_options)
+    'catalog.tasks.*': {'queue': 'ingestion-bulk'},
+    'social.tasks.*': {'queue': 'media'},
+    'core.tasks.*': {'queue': 'email'},
+}
+# Redis priorities: 0 is the highest. 'priority' queue order makes a worker
+# started with -Q a,b drain queue a before taking anything from b.
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+CELERY_TASK_DEFAULT_PRIORITY = 5
+# Periodic tasks (run `celery -A config beat`, see Procfile)
+CELERY_BEAT_SCHEDULE = {
+    'cleanup-expired-uploads': {
+        'task': 'administration.tasks.task_cleanup_expired_uploads',
+        'schedule': 30 * 60,
+    },
+    # Frees the slots of lost chapters and restarts a stalled bulk queue
+    'dispatch-queued-uploads': {
+        'task': 'catalog.tasks.task_dispatch_queued_uploads',
+        'schedule': 5 * 60,
+    },
+}
+INGESTION_PRIORITY_INTERACTIVE = 0
+INGESTION_PRIORITY_BULK = 6
+# Uploads of at most this many chapters are interactive (an admin is waiting)
+INGESTION_INTERACTIVE_MAX_CHAPTERS = config('INGESTION_INTERACTIVE_MAX_CHAPTERS', default=1, cast=int)
+# Larger uploads are queued and dispatched fairly across admins and series
+# (catalog.scheduling): chapters in flight per bulk job, and overall
+INGESTION_MAX_IN_FLIGHT_PER_JOB = config('INGESTION_MAX_IN_FLIGHT_PER_JOB', default=2, cast=int)
+INGESTION_MAX_IN_FLIGHT = config('INGESTION_MAX_IN_FLIGHT', default=4, cast=int)
+# A chapter in flight with no progress for this long lost its task (worker killed,
+# hard time limit): it is failed and its slot freed (progress renews the lease)
+INGESTION_LEASE_SECONDS = config('INGESTION_LEASE_SECONDS', default=2 * CELERY_TASK_TIME_LIMIT, cast=int)
+
+# --- Chapter Ingestion ---
+# Processes used to decode/resize/encode pages in parallel (1 = in-process, no pool)
+PAGE_TRANSCODE_WORKERS = config('PAGE_TRANSCODE_WORKERS', default=os.cpu_count() or 1, cast=int)
+# Page width ladder: the largest width is the main image, smaller ones are srcset derivatives
+PAGE_IMAGE_WIDTHS = config('PAGE_IMAGE_WIDTHS', default='480,800,1400', cast=Csv(int))
+PAGE_JPEG_QUALITY = config('PAGE_JPEG_QUALITY', default=82, cast=int)
+# Keep source JPEGs that already fit the profile byte for byte instead of re-encoding them
+PAGE_JPEG_PASSTHROUGH = config('PAGE_JPEG_PASSTHROUGH', default=True, cast=bool)
+# Encode black-and-white pages as single-channel JPEGs (never applied to webtoons)
+PAGE_GRAYSCALE_ENCODING = config('PAGE_GRAYSCALE_ENCODING', default=True, cast=bool)
+# Lighter formats stored next to the JPEG and offered through <picture> (avif is slow to encode, opt-in)
+PAGE_EXTRA_FORMATS = config('PAGE_EXTRA_FORMATS', default='webp', cast=Csv())
+# Webtoon/manhwa strips taller than this (px, after resizing) are stored as
+# consecutive segments, each a bitmap within mobile GPU texture limits (0 disables)
+PAGE_SEGMENT_HEIGHT = config('PAGE_SEGMENT_HEIGHT', default=2048, cast=int)
+# Pages decoding to more pixels than this (after JPEG DCT scaling) are refused
+# from their header instead of being decoded: bounds a worker's memory (~3 bytes/px)
+PAGE_MAX_DECODED_PIXELS = config('PAGE_MAX_DECODED_PIXELS', default=100_000_000, cast=int)
+# Redis recording the chunks received by chunked uploads (one bitmap per upload,
+# no database query per chunk); empty keeps the bitmap on the ChunkedUpload row
+UPLOAD_REDIS_URL = config('UPLOAD_REDIS_URL', default='')
+# Seconds an unfinished upload's chunk bitmap is kept in Redis after its last chunk
+UPLOAD_CHUNK_TTL = config('UPLOAD_CHUNK_TTL', default=24 * 3600, cast=int)
+# Chapter archives uploaded by the browser straight to the bucket (S3 multipart
+# with presigned part URLs) instead of through the web workers. Needs
+# AWS_STORAGE_BUCKET_NAME and a bucket CORS rule allowing PUT from the admin origin
+UPLOAD_DIRECT_TO_STORAGE = config('UPLOAD_DIRECT_TO_STORAGE', default=False, cast=bool)
+UPLOAD_S3_PREFIX = config('UPLOAD_S3_PREFIX', default='uploads/')
+# Multipart part size (S3 minimum: 5 MB, at most 10000 parts per object)
+UPLOAD_S3_PART_SIZE = config('UPLOAD_S3_PART_SIZE', default=16 * 1024 * 1024, cast=int)
+UPLOAD_PRESIGNED_EXPIRY = config('UPLOAD_PRESIGNED_EXPIRY', default=6 * 3600, cast=int)
+# Temp upload disk (MEDIA_ROOT/manga_temp_uploads): new chunked uploads are
+# refused while they would exceed the quota (0 = no quota) or leave less free space than the floor
+UPLOAD_TEMP_QUOTA_MB = config('UPLOAD_TEMP_QUOTA_MB', default=0, cast=int)
+UPLOAD_MIN_FREE_MB = config('UPLOAD_MIN_FREE_MB', default=1024, cast=int)
+# Janitor (administration.tasks.task_cleanup_expired_uploads): uploads idle for this
+# many hours before being processed are abandoned; nothing is kept past the max age
+UPLOAD_ABANDONED_AFTER_HOURS = config('UPLOAD_ABANDONED_AFTER_HOURS', default=24, cast=int)
+UPLOAD_TEMP_MAX_AGE_HOURS = config('UPLOAD_TEMP_MAX_AGE_HOURS', default=7 * 24, cast=int)
+# Pages read ahead from the archive while the previous ones are processed
+PAGE_PREFETCH_SIZE = config('PAGE_PREFETCH_SIZE', default=4, cast=int)
+# Threads uploading page images to storage (keep <= 10, botocore's default connection pool size)
+PAGE_UPLOAD_WORKERS = config('PAGE_UPLOAD_WORKERS', default=8, cast=int)
+# Page rows inserted per bulk_create (also the progress update interval)
+PAGE_DB_BATCH_SIZE = config('PAGE_DB_BATCH_SIZE', default=50, cast=int)
+# Chapters with at least this many pages are split into page-range Celery
+# subtasks run in parallel across workers (0 disables the fan-out). Opt-in: the
+# range tasks read the upload's temp file, which must be on storage shared by
+# every ingestion worker host
+PAGE_FANOUT_THRESHOLD = config('PAGE_FANOUT_THRESHOLD', default=0, cast=int)
+# Pages per range subtask
+PAGE_FANOUT_RANGE_SIZE = config('PAGE_FANOUT_RANGE_SIZE', default=50, cast=int)
 
 LOGGING = {
     'version': 1,
@@ -44,7 +44,7 @@ def home_view(request):
             # 2. The user's current_page actually reached the last page.
             # This guards against stale 'completed=True' records from the old code
             # that auto-completed chapters on open.
-            total_pages = last_progress.chapter.pages.count()
+            total_pages = last_progress.chapter.page_count
             truly_finished = (
                 last_progress.completed 
                 and total_pages > 0 
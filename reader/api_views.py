@@ -36,7 +36,7 @@ def update_progress(request):
         
         # Déterminer si terminé
         # On récupère le nombre total de pages
-        total_pages = chapter.pages.count()
+        total_pages = chapter.page_count
         
         was_completed = progress.completed
         if not was_completed and total_pages > 0 and page >= total_pages:
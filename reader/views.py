@@ -104,7 +104,7 @@ def chap_view(request, series_slug=None, chapter_number=None):
                 return render(request, 'reader/paywall.html', {'chapter': chapter, 'STATIC_VERSION': settings.STATIC_VERSION, 'wallet': wallet})
 
     # Get pages if image-based
-    pages = chapter.pages.all().order_by('page_number')
+    pages = chapter.pages.prefetch_related('derivatives').order_by('page_number', 'segment')
     first_page = pages.first() if pages.exists() else None
     
     # Navigation
@@ -125,7 +125,7 @@ def chap_view(request, series_slug=None, chapter_number=None):
         # The chapter will only be re-completed when the API confirms the user
         # has truly reached the last page. XP is protected by the pre_save signal.
         if progress.completed:
-            total_pages = chapter.pages.count()
+            total_pages = chapter.page_count
             # Only reset if current_page hasn't actually reached the end
             # (this is the telltale sign of stale old data)
             if progress.current_page < total_pages:
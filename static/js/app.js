@@ -89,10 +89,29 @@ function _displayQuote(container, quote) {
     }, 200);
 }
 
+// ==========================================================================
+// LOW-QUALITY IMAGE PLACEHOLDERS
+// ==========================================================================
+// Images with an inline preview (.lqip) drop it once the real image is there
+// (load events don't bubble: listen in the capture phase)
+const _dropPlaceholder = (img) => {
+    img.style.backgroundImage = 'none';
+    img.classList.remove('lqip');
+};
+document.addEventListener('load', (event) => {
+    const img = event.target;
+    if (img.classList && img.classList.contains('lqip')) _dropPlaceholder(img);
+}, true);
+
 // ==========================================================================
 // INITIALIZATION
 // ==========================================================================
 document.addEventListener('DOMContentLoaded', () => {
+    // Images already loaded from the cache before this script ran
+    document.querySelectorAll('img.lqip').forEach(img => {
+        if (img.complete && img.naturalWidth) _dropPlaceholder(img);
+    });
+
     const wisdomContainer = document.getElementById('wisdom-container');
     if (wisdomContainer) {
         renderWisdom(false); // Respects 24h cooldown on page load
@@ -45,6 +45,38 @@ const MangaReader = (function () {
 
     // --- Méthodes Privées ---
 
+    // Lazy Load: swap data-srcset/data-src → srcset/src (srcset first so the
+    // browser picks the right width before starting the download)
+    const _loadImage = (img) => {
+        if (!img) return;
+        // Segmented strip (.reader-strip): load all of its segments
+        if (img.tagName !== 'IMG') {
+            img.querySelectorAll('img[data-src]').forEach(_loadImage);
+            return;
+        }
+        if (!img.dataset.src) return;
+        // <picture> sources (WebP/AVIF) must get their srcset before the <img> src
+        if (img.parentElement && img.parentElement.tagName === 'PICTURE') {
+            img.parentElement.querySelectorAll('source[data-srcset]').forEach(source => {
+                source.srcset = source.dataset.srcset;
+                source.removeAttribute('data-srcset');
+            });
+        }
+        if (img.dataset.srcset) {
+            img.srcset = img.dataset.srcset;
+            img.removeAttribute('data-srcset');
+        }
+        img.src = img.dataset.src;
+        img.classList.remove('lazy');
+        img.removeAttribute('data-src'); // Prevent re-loading
+    };
+
+    // Pages rendered with width/height attributes reserve their space before loading
+    const _hasStoredSize = (page) => {
+        const images = page.tagName === 'IMG' ? [page] : Array.from(page.querySelectorAll('img'));
+        return images.length > 0 && images.every(img => img.hasAttribute('width') && img.hasAttribute('height'));
+    };
+
     const _applySettings = () => {
         // Reset classes
         elements.container.classList.remove('mode-vertical', 'mode-paged', 'gapless');
@@ -101,20 +133,10 @@ const MangaReader = (function () {
             elements.pages[currentIndex].classList.add('active');
 
             // Force load current image if lazy
-            const img = elements.pages[currentIndex];
-            if (img.dataset.src) {
-                img.src = img.dataset.src;
-                img.classList.remove('lazy');
-                img.removeAttribute('data-src'); // Prevent re-loading
-            }
+            _loadImage(elements.pages[currentIndex]);
 
             // Preload next image
-            const nextIndex = currentIndex + 1;
-            if (elements.pages[nextIndex] && elements.pages[nextIndex].dataset.src) {
-                elements.pages[nextIndex].src = elements.pages[nextIndex].dataset.src;
-                elements.pages[nextIndex].classList.remove('lazy');
-                elements.pages[nextIndex].removeAttribute('data-src');
-            }
+            _loadImage(elements.pages[currentIndex + 1]);
         }
 
         // Scroll to top to ensure visibility
@@ -255,18 +277,14 @@ const MangaReader = (function () {
                 if (entry.isIntersecting) {
                     const img = entry.target;
 
-                    // Lazy Load: swap data-src → src
-                    if (img.dataset.src) {
-                        img.src = img.dataset.src;
-                        img.classList.remove('lazy');
-                        img.removeAttribute('data-src');
-                    }
+                    _loadImage(img);
 
                     // Track Progress — ONLY if the image is actually loaded (has src).
                     // This prevents zero-height collapsed lazy images from falsely
                     // triggering progress updates (especially for the last page).
                     if (!state.isRestoringScroll && state.readingMode !== 'paged' && state.chapterId && img.src) {
-                        const pageNum = elements.pages.indexOf(img) + 1;
+                        // A strip segment counts for the page (strip) it belongs to
+                        const pageNum = elements.pages.indexOf(img.closest('.reader-page')) + 1;
                         // Extra guard: only update if this page is near our current reading position
                         // (prevents wild jumps from layout shifts during initial load)
                         if (pageNum <= state.currentPage + 3) {
@@ -278,7 +296,8 @@ const MangaReader = (function () {
             });
         }, { rootMargin: "50% 0px -50% 0px" }); // Track when top of image crosses middle of screen
 
-        elements.pages.forEach(img => observer.observe(img));
+        // Segments are observed one by one: a strip loads as it scrolls into view
+        document.querySelectorAll('.manga-page').forEach(img => observer.observe(img));
     };
 
     // Debounced server sync (1 second) to avoid spamming API on fast scroll
@@ -357,23 +376,27 @@ const MangaReader = (function () {
 
         // Restore Scroll Position
         if (state.readingMode !== 'paged' && state.currentPage > 1) {
-            // Force load all preceding images immediately (slice is cleaner than a loop)
-            elements.pages.slice(0, state.currentPage).forEach(img => {
-                if (img.dataset.src) {
-                    img.src = img.dataset.src;
-                    img.classList.remove('lazy');
-                    img.removeAttribute('data-src');
-                }
-            });
-
-            // Need to wait for images to actually decode and push layout down
-            setTimeout(() => {
+            const preceding = elements.pages.slice(0, state.currentPage);
+            const scrollToCurrent = () => {
                 const targetPage = elements.pages[state.currentPage - 1];
                 if (targetPage) {
                     targetPage.scrollIntoView({ behavior: 'auto', block: 'start' });
                 }
                 setTimeout(() => { state.isRestoringScroll = false; }, 200); // Re-enable tracking after scroll finishes
-            }, 300);
+            };
+
+            if (preceding.every(_hasStoredSize)) {
+                // Every preceding page already has its final height: jump
+                // straight there, only the bookmarked page gets downloaded
+                _loadImage(elements.pages[state.currentPage - 1]);
+                scrollToCurrent();
+            } else {
+                // Force load all preceding images immediately (slice is cleaner than a loop)
+                preceding.forEach(_loadImage);
+
+                // Need to wait for images to actually decode and push layout down
+                setTimeout(scrollToCurrent, 300);
+            }
         } else {
             state.isRestoringScroll = false; // Normal reading
         }